@@ -6,129 +6,158 @@ This Flask API receives product data from the EcoShop browser extension
 and forwards it to the shopee_processor.py script for analysis.
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-import json
+from werkzeug.exceptions import RequestEntityTooLarge
+import functools
 import os
 import logging
+import threading
 from datetime import datetime, timezone 
-import re
 
 # Attempt to import the processor
 try:
-    from scripts.shopee_processor import process_shopee_product
+    from scripts.shopee_processor import (
+        get_product_analysis,
+        get_stored_product_response,
+        process_shopee_product,
+        process_shopee_products_batch,
+    )
+    from scripts import db
+    from scripts.near_duplicates import near_duplicate_index
+    from watch import create_task_document, stream_task_changes
+    from task_worker import TaskWorkerPool
     PROCESSOR_AVAILABLE = True
 except ImportError as e:
     PROCESSOR_AVAILABLE = False
     PROCESSOR_IMPORT_ERROR = str(e)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from scripts.hot_cache import get_cache_stats
+from scripts.mongo_pool import get_pool_stats
+from scripts.llm_scheduler import llm_scheduler
+from scripts.prompt_compaction import compaction_stats
+from scripts.payload import (
+    BATCH_MAX_BODY_BYTES,
+    REQUEST_MAX_BODY_BYTES,
+    PayloadError,
+    build_response_data,
+    format_batch_error_line,
+    format_batch_line,
+    format_task_text,
+    read_batch_request,
+    read_product_request,
+    response_etag,
 )
+from scripts.request_capture import request_capture, exception_record
+from scripts.logging_utils import LazyJson, configure_logging, log_event, set_request_id
+
+try:
+    from config import TASK_WORKER_COUNT, TASK_POLL_INTERVAL_SECONDS, TASK_STALE_AFTER_SECONDS
+except ImportError:
+    TASK_WORKER_COUNT = 4
+    TASK_POLL_INTERVAL_SECONDS = 1.0
+    TASK_STALE_AFTER_SECONDS = 300
+
+try:
+    from config import BATCH_MAX_ITEMS
+except ImportError:
+    BATCH_MAX_ITEMS = 60
+
+# Configure logging (LOG_LEVEL / LOG_FORMAT in config.py or the environment)
+configure_logging()
 logger = logging.getLogger('ecoshop_simplified_api')
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# --- MINIMAL LOGGING FOR EXTENSION REQUESTS ---
+# Reject oversize uploads before the body is read; payload.py still applies
+# each route's own limit (and the same limit after decompression)
+app.config['MAX_CONTENT_LENGTH'] = max(REQUEST_MAX_BODY_BYTES, BATCH_MAX_BODY_BYTES)
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_entity_too_large(e):
+    return jsonify({
+        'success': False,
+        'error': f"Request body exceeds {app.config['MAX_CONTENT_LENGTH']} bytes."
+    }), 413
+
+def requires_processor(view):
+    """Answers 503 instead of calling `view` when the processor could not be imported."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not PROCESSOR_AVAILABLE:
+            logger.error(f"Shopee Processor not available due to import error: {PROCESSOR_IMPORT_ERROR}")
+            return jsonify({
+                'success': False,
+                'error': 'Backend processor module is not available.',
+                'details': PROCESSOR_IMPORT_ERROR
+            }), 503
+        return view(*args, **kwargs)
+    return wrapper
+
+# --- REQUEST IDS AND MINIMAL LOGGING FOR EXTENSION REQUESTS ---
 @app.before_request
 def log_extension_payload():
-    # Log only for the specific endpoint we care about
-    if request.path == '/extract_and_rate':
-        payload_to_log = ""
-        if request.is_json:
-            try:
-                payload_to_log = json.dumps(request.get_json(silent=True) or {}, separators=(',', ':'))
-            except Exception as e:
-                payload_to_log = "[Could not parse JSON payload]"
-                logger.error(f"Error parsing JSON payload: {e}")
-        else:
-            try:
-                payload_to_log = request.get_data(as_text=True).strip()
-            except Exception as e:
-                payload_to_log = "[Could not decode text payload]"
-                logger.error(f"Error decoding text payload: {e}")
-        logger.info(f'EXT_PAYLOAD {request.path} ({request.content_type}): {payload_to_log[:1000]}...') # Log more of the payload
+    # Every log line for this request carries its ID; reuse the caller's if given
+    g.request_id = set_request_id(request.headers.get('X-Request-ID'))
+    g.request_started = datetime.now(timezone.utc)
+    # The payload itself is only logged at DEBUG, and only read if that level is on
+    if request.path == '/extract_and_rate' and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "EXT_PAYLOAD %s (%s): %s",
+            request.path, request.content_type, request.get_data(as_text=True).strip()[:1000],
+        )
+
+@app.after_request
+def log_request_summary(response):
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    if request.path != '/extract_and_rate':
+        return response
+    started = g.get('request_started')
+    log_event(
+        logger, logging.INFO, "request_completed",
+        method=request.method,
+        path=request.path,
+        status=response.status_code,
+        bytes_in=request.content_length or 0,
+        duration_ms=round((datetime.now(timezone.utc) - started).total_seconds() * 1000, 1) if started else None,
+    )
+    return response
 
 @app.route('/extract_and_rate', methods=['POST'])
+@requires_processor
 def extract_and_rate_product():
     """
     Main endpoint for browser extension.
-    Receives product info, writes it to entry.txt, and forwards to shopee_processor.
+    Receives product info, samples it into the request capture, and forwards to shopee_processor.
     """
-    logger.info(f"--- /extract_and_rate: NEW REQUEST ---")
-    entry_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'entry.txt')
-    
     raw_text_content = None
     product_url = None # Initialize product_url
 
     try:
-        # 1. Log raw request and write to entry.txt
-        raw_data_bytes = request.get_data()
-        try:
-            # Try to decode as UTF-8 first
-            raw_text_content = raw_data_bytes.decode('utf-8', errors='strict')
-            logger.info(f"Successfully decoded request body as UTF-8.")
-        except UnicodeDecodeError:
-            logger.warning("Failed to decode request body as UTF-8, trying 'latin-1' as fallback.")
-            try:
-                raw_text_content = raw_data_bytes.decode('latin-1', errors='replace') # Common fallback
-            except Exception as decode_err:
-                logger.error(f"Could not decode request body with any known encoding: {decode_err}")
-                # Write raw bytes to entry.txt if all decoding fails
-                with open(entry_file_path, 'wb') as f_bytes:
-                    f_bytes.write(b"Request Content-Type: " + request.content_type.encode('utf-8', 'replace') + b"\n")
-                    f_bytes.write(b"Request Headers:\n" + json.dumps(dict(request.headers), indent=2).encode('utf-8', 'replace') + b"\n\n")
-                    f_bytes.write(b"--- RAW BYTE CONTENT (DECODING FAILED) ---\n")
-                    f_bytes.write(raw_data_bytes)
-                logger.info(f"Raw request byte data written to {entry_file_path} due to decoding error.")
-                return jsonify({'success': False, 'error': 'Request body encoding error'}), 400
-
-        # Write decoded content (or indicate if it's None) to entry.txt
-        with open(entry_file_path, 'w', encoding='utf-8', errors='replace') as f:
-            f.write(f"Request Content-Type: {request.content_type}\n")
-            f.write(f"Request Headers:\n{json.dumps(dict(request.headers), indent=2)}\n\n")
-            f.write("--- RAW TEXT CONTENT (DECODED) ---\n")
-            if raw_text_content is not None:
-                f.write(raw_text_content)
-            else:
-                f.write("[No text content could be decoded or was empty]")
-        logger.info(f"Request data (decoded) written to {entry_file_path}")
-
-        # 2. Basic parsing for product_url from raw_text_content if it's plain text
-        # This is a simplified parsing, shopee_processor will do the detailed one.
-        if raw_text_content and 'text/plain' in request.content_type:
-            url_match = re.search(r"URL: (https?://[^\s]+)", raw_text_content)
-            if url_match:
-                product_url = url_match.group(1).strip()
-                logger.info(f"Parsed product_url from plain text: {product_url}")
-        elif request.is_json:
-            json_data = request.get_json(silent=True)
-            if json_data and isinstance(json_data, dict):
-                product_url = json_data.get('url')
-                if not raw_text_content: # If JSON was primary and no plain text sent
-                    raw_text_content = json_data.get('plainText') # As sent by some versions of extension
-                logger.info(f"Parsed product_url from JSON: {product_url}")
-
-
-        # 3. Check if processor is available
-        if not PROCESSOR_AVAILABLE:
-            logger.error(f"Shopee Processor not available due to import error: {PROCESSOR_IMPORT_ERROR}")
-            return jsonify({
-                'success': False, 
-                'error': 'Backend processor module is not available.',
-                'details': PROCESSOR_IMPORT_ERROR
-            }), 503 # Service Unavailable
+        # 1. Decode the request body: the structured payload (JSON or msgpack)
+        # or the plain-text dump, optionally gzip-compressed (see payload.py).
+        # shopee_processor does the detailed URL parsing.
+        product_url, raw_text_content = read_product_request(
+            request.get_data(), request.content_type, request.headers.get('Content-Encoding')
+        )
+        logger.debug("Parsed product_url from request: %s", product_url)
+
+        # 2. If sampled, queue the page text for debug capture.
+        # The capture is written by a background thread, never on this one.
+        request_capture.capture({
+            'event': 'request',
+            'path': request.path,
+            'request_id': g.request_id,
+            'content_type': request.content_type,
+            'headers': dict(request.headers),
+            'body': raw_text_content,
+        })
 
-        # 4. Forward to shopee_processor
+        # 3. Forward to shopee_processor
         start_time = datetime.now(timezone.utc)
-        logger.info(f"--- CALLING Shopee Processor ---")
-        logger.info(f"Passing to process_shopee_product - URL: {product_url or 'Not provided'}")
-        logger.info(f"Passing to process_shopee_product - Text Length: {len(raw_text_content) if raw_text_content else 0}")
-        
+
         # Ensure raw_text_content is not None before passing
         if raw_text_content is None:
             logger.error("Cannot call processor: raw_text_content is None after decoding attempts.")
@@ -147,69 +176,233 @@ def extract_and_rate_product():
             }), 500
         
         processing_time_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
-          # 5. Prepare and send response
-        # The structure of 'result' should match what the extension expects
-        # Based on previous logs, it seems shopee_processor returns a dict that can be directly used.
-          # Debug the score extraction - check all possible score field names
-        sustainability_score = processed_result.get('sustainability_score')
-        alt_score = processed_result.get('score')
-        default_score = processed_result.get('default_sustainability_score')
-        
-        logger.info(f"DEBUG: sustainability_score from processor: {sustainability_score}")
-        logger.info(f"DEBUG: alt score field: {alt_score}")
-        logger.info(f"DEBUG: default_sustainability_score: {default_score}")
-        logger.info(f"DEBUG: processed_result keys: {list(processed_result.keys())}")
-        
-        # Use the first available score, prioritizing sustainability_score
-        final_score = sustainability_score if sustainability_score is not None else (alt_score if alt_score is not None else (default_score if default_score is not None else 0))
-        logger.info(f"DEBUG: Final score being sent to frontend: {final_score}")
-        
-        final_response_data = {
-            'url': product_url or processed_result.get('url'), # Prioritize initially parsed URL
-            'brand': processed_result.get('brand', 'Unknown'),
-            'brand_name': processed_result.get('brand', 'Unknown'),  # For consistency with frontend
-            'name': processed_result.get('product_name', processed_result.get('name', 'Unknown')),
-            'category': processed_result.get('category', 'Unknown'),
-            'score': final_score,
-            'breakdown': processed_result.get('sustainability_breakdown', {}),
-            'sustainability_breakdown': processed_result.get('sustainability_breakdown', {}),  # For consistency
-            'recommendations': processed_result.get('recommendations', []),
-            'raw_llm_response': processed_result.get('raw_llm_response', None), # For debugging LLM
-            'processing_time_ms': processing_time_ms,
-            'timestamp': datetime.now(timezone.utc).isoformat() + 'Z'
-        }
+        # 4. Prepare and send response
+        final_response_data = build_response_data(processed_result, product_url, processing_time_ms)
         
-        logger.info(f"--- FINAL RESPONSE TO EXTENSION (from shopee_processor) ---")
-        logger.info(f"RESPONSE JSON: {json.dumps({'success': True, 'data': final_response_data}, indent=2)}")
-        
-        # Additional detailed logging for recommendations debugging
-        if final_response_data.get('recommendations'):
-            logger.info(f"=== RECOMMENDATIONS DETAILED LOGGING ===")
-            logger.info(f"Number of recommendations: {len(final_response_data['recommendations'])}")
-            for i, rec in enumerate(final_response_data['recommendations']):
-                logger.info(f"Recommendation {i+1}: {json.dumps(rec, indent=2, default=str)}")
-        else:
-            logger.info("=== NO RECOMMENDATIONS IN RESPONSE ===")
-            
+        # Recommendations are part of the response dump
+        logger.debug("RESPONSE JSON: %s", LazyJson({'success': True, 'data': final_response_data}))
         return jsonify({'success': True, 'data': final_response_data})
 
+    except PayloadError as e:
+        logger.warning(f"Rejected /extract_and_rate body: {e}")
+        return jsonify({'success': False, 'error': str(e)}), e.status
+
+    except RequestEntityTooLarge:
+        # Answered by request_entity_too_large, not as a server error
+        raise
+
     except Exception as e:
         logger.error(f"CRITICAL ERROR in /extract_and_rate: {str(e)}", exc_info=True)
-        # Also write the exception to entry.txt for easier debugging
+        # Always capture server exceptions, together with the body that caused them
+        record = exception_record(request.path)
+        record['body'] = raw_text_content
+        record['request_id'] = g.get('request_id')
+        request_capture.capture(record, force=True)
+
+        return jsonify({'success': False, 'error': f'An internal server error occurred: {str(e)}'}), 500
+
+@app.route('/batch_rate', methods=['POST'])
+@requires_processor
+def batch_rate():
+    """
+    Scores many products in one request, e.g. every card of a search results page.
+
+    Body: {"items": [{"url": ..., "plainText": ...}, ...]} (or a bare list), optionally gzip-compressed.
+    Streams one NDJSON line per item, {"index", "url", "success", "data"|"error"},
+    as soon as that item is ready: stored products first, LLM analyses as they finish.
+    """
+    try:
+        items = read_batch_request(request.get_data(), request.headers.get('Content-Encoding'))
+    except PayloadError as e:
+        logger.warning(f"Rejected /batch_rate body: {e}")
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    if items is None:
+        return jsonify({'success': False, 'error': 'Expected a JSON list of {url, plainText} items.'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'success': False, 'error': f'Too many items (maximum is {BATCH_MAX_ITEMS}).'}), 413
+
+    def generate():
+        start_time = datetime.now(timezone.utc)
+        completed = 0
         try:
-            with open(entry_file_path, 'a', encoding='utf-8') as f_err: # Append mode
-                f_err.write("\n\n--- SERVER EXCEPTION ---\n")
-                import traceback
-                f_err.write(traceback.format_exc())
-        except Exception as e_file_err:
-            logger.error(f"Could not write exception to entry.txt: {e_file_err}")
-            
+            for index, processed_result in process_shopee_products_batch(items):
+                processing_time_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
+                yield format_batch_line(index, items[index][0], processed_result, processing_time_ms)
+                completed += 1
+        except Exception as e:
+            # The status line is long gone; end the stream with an error record instead
+            logger.error(f"Batch rating failed after {completed} of {len(items)} items: {e}", exc_info=True)
+            yield format_batch_error_line(completed)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/score/<source_site>/<listing_id>', methods=['GET'])
+@requires_processor
+def get_score(source_site, listing_id):
+    """
+    The stored score, breakdown and recommendations of an analyzed listing,
+    without page text or an LLM call. The response carries an ETag; a request
+    whose If-None-Match still matches it gets an empty 304. A 404 means the
+    listing has not been scored yet and its page must go to /extract_and_rate.
+    """
+    start_time = datetime.now(timezone.utc)
+    try:
+        processed_result = get_stored_product_response(source_site, listing_id)
+    except Exception as e:
+        logger.error(f"Error looking up {source_site}:{listing_id}: {e}", exc_info=True)
         return jsonify({'success': False, 'error': f'An internal server error occurred: {str(e)}'}), 500
+    if not processed_result:
+        return jsonify({'success': False, 'status': 'not_found', 'error': 'This listing has not been scored yet.'}), 404
+
+    processing_time_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
+    data = build_response_data(processed_result, processed_result.get('source_url'), processing_time_ms)
+    etag = response_etag(data)
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({'success': True, 'status': 'found', 'data': data})
+    response.set_etag(etag, weak=True)
+    # Cacheable, but only after revalidation: the score changes on a rescore
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/score/<source_site>/<listing_id>/analysis', methods=['GET'])
+@requires_processor
+def get_score_analysis(source_site, listing_id):
+    """
+    The analysis texts of an analyzed listing, `{category: analysis}`, for the
+    extension's details page. Score responses leave them out; they are read
+    from the database only when asked for. ETag revalidation as for /score.
+    """
+    try:
+        analysis = get_product_analysis(source_site, listing_id)
+    except Exception as e:
+        logger.error(f"Error looking up the analysis of {source_site}:{listing_id}: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': f'An internal server error occurred: {str(e)}'}), 500
+    if analysis is None:
+        return jsonify({'success': False, 'status': 'not_found', 'error': 'This listing has not been scored yet.'}), 404
+
+    data = {'source_site': source_site, 'listing_id': listing_id, 'analysis': analysis}
+    etag = response_etag(data)
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify({'success': True, 'status': 'found', 'data': data})
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# --- ASYNCHRONOUS TASKS ---
+# POST /tasks queues an analysis and returns immediately; the extension then
+# follows the task with GET /watch/<task_id> (Server-Sent Events).
+_task_workers = None
+_task_workers_lock = threading.Lock()
+
+def get_task_workers():
+    """Creates and starts this process's worker pool on first use (after any gunicorn fork)."""
+    global _task_workers
+    if _task_workers is not None:
+        return _task_workers
+    with _task_workers_lock:
+        # Concurrent first requests must not each start a pool
+        if _task_workers is None:
+            task_workers = TaskWorkerPool(
+                db.get_tasks_collection(),
+                run_analysis_task,
+                num_workers=TASK_WORKER_COUNT,
+                poll_interval_seconds=TASK_POLL_INTERVAL_SECONDS,
+                stale_after_seconds=TASK_STALE_AFTER_SECONDS,
+            )
+            task_workers.start()
+            _task_workers = task_workers
+    return _task_workers
+
+def run_analysis_task(task: dict) -> dict:
+    """Task worker handler: runs the same pipeline as /extract_and_rate for one task."""
+    product_url = task.get('url')
+    raw_text = (task.get('metadata') or {}).get('raw_text') or ''
+    start_time = datetime.now(timezone.utc)
+    processed_result = process_shopee_product(url=product_url, raw_text=raw_text)
+    if not processed_result:
+        raise RuntimeError('Product analysis by shopee_processor failed.')
+    processing_time_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
+    return build_response_data(processed_result, product_url, processing_time_ms)
+
+@app.route('/tasks', methods=['POST'])
+@requires_processor
+def create_task():
+    """Queues a sustainability analysis and returns its task ID without waiting for the LLM."""
+    tasks_collection = db.get_tasks_collection()
+    if tasks_collection is None:
+        return jsonify({'success': False, 'error': 'Task queue is not available: database not connected.'}), 503
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'error': 'Expected a JSON object.'}), 400
+    product_url = payload.get('product_url') or payload.get('url')
+    if not product_url:
+        return jsonify({'success': False, 'error': 'Missing product_url.'}), 400
+
+    task = create_task_document(
+        product_name=payload.get('product_name'),
+        brand=payload.get('product_brand'),
+        price=payload.get('price'),
+        url=product_url,
+        task_type=payload.get('task_type', 'sustainability_analysis'),
+        raw_text=payload.get('plainText') or format_task_text(payload),
+    )
+    result = tasks_collection.insert_one(task)
+    task_id = str(result.inserted_id)
+    get_task_workers().notify()
+    logger.info(f"Queued task {task_id} for {product_url}")
+    return jsonify({'success': True, 'task_id': task_id, 'status': 'new'}), 202
+
+@app.route('/watch/<task_id>', methods=['GET'])
+def watch_task(task_id):
+    """Streams a task's status changes to the extension as Server-Sent Events."""
+    if not PROCESSOR_AVAILABLE or db.get_tasks_collection() is None:
+        return jsonify({'success': False, 'error': 'Task queue is not available.'}), 503
+    # Make sure this process drains tasks even if they were queued by another worker
+    get_task_workers()
+    # None: the process's shared client and the configured tasks collection
+    stream = stream_task_changes(None, None, None, task_id)
+    return Response(
+        stream_with_context(stream),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss/eviction counters for this worker's in-process hot cache."""
+    return jsonify({'success': True, 'data': get_cache_stats()})
+
+@app.route('/db/pool/stats', methods=['GET'])
+def db_pool_stats():
+    """Connection pool counters for this worker's MongoClient."""
+    return jsonify({'success': True, 'data': get_pool_stats()})
+
+@app.route('/llm/stats', methods=['GET'])
+def llm_stats():
+    """Estimated prompt tokens sent to and saved before the LLM, and the LLM scheduler's state, for this worker."""
+    return jsonify({'success': True, 'data': {
+        'prompt_compaction': compaction_stats.snapshot(),
+        'scheduler': llm_scheduler.stats(),
+    }})
+
+@app.route('/capture/stats', methods=['GET'])
+def capture_stats():
+    """Counters for this worker's sampled request capture."""
+    return jsonify({'success': True, 'data': request_capture.stats()})
 
 @app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS'])
 @app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS'])
 def catch_all(path):
-    logger.info(f"Catch-all route hit for path: {path}, method: {request.method}")
+    logger.debug("Catch-all route hit for path: %s, method: %s", path, request.method)
     return jsonify({"status": "EcoShop Simplified API is running. Use /extract_and_rate for analysis.", "path_requested": path}), 200
 
 if __name__ == '__main__':
@@ -220,6 +413,15 @@ if __name__ == '__main__':
         logger.error("The API will start, but /extract_and_rate will fail until this is resolved.")
     else:
         logger.info("`shopee_processor.py` imported successfully.")
+        if db.get_tasks_collection() is not None:
+            get_task_workers()
+        products_collection = db.get_products_collection()
+        if products_collection is not None:
+            # Otherwise loaded on the first cache miss (e.g. under gunicorn)
+            try:
+                near_duplicate_index.refresh(products_collection)
+            except Exception as e:
+                logger.warning(f"Could not load the near-duplicate index: {e}")
 
     port = int(os.environ.get('PORT', 5000))
     logger.info(f"EcoShop Simplified Flask app starting on host 0.0.0.0, port {port}")
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Async (ASGI) serving mode for the EcoShop API.
+
+Serves the same /extract_and_rate contract as app.py, but on asyncio:
+MongoDB is accessed through motor and Gemini through
+`generate_content_async`. A request waiting on the LLM is a suspended
+coroutine, not a blocked worker, so a single process can hold hundreds of
+them.
+
+Run with any ASGI server, e.g.:
+    hypercorn asgi:app --bind 0.0.0.0:5000
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+See benchmarks/bench_serving.py for a load comparison against app.py.
+"""
+
+from quart import Quart, g, jsonify, request
+from quart_cors import cors
+from werkzeug.exceptions import RequestEntityTooLarge
+import functools
+import os
+import logging
+from datetime import datetime, timezone
+
+# Attempt to import the processor
+try:
+    from scripts.async_processor import (
+        get_product_analysis_async,
+        get_stored_product_response_async,
+        load_near_duplicate_index,
+        process_shopee_product_async,
+        process_shopee_products_batch_async,
+    )
+    from scripts.async_db import ensure_async_indexes
+    PROCESSOR_AVAILABLE = True
+except ImportError as e:
+    PROCESSOR_AVAILABLE = False
+    PROCESSOR_IMPORT_ERROR = str(e)
+
+from scripts.hot_cache import get_cache_stats
+from scripts.mongo_pool import get_pool_stats
+from scripts.llm_scheduler import llm_scheduler
+from scripts.prompt_compaction import compaction_stats
+from scripts.payload import (
+    BATCH_MAX_BODY_BYTES,
+    REQUEST_MAX_BODY_BYTES,
+    PayloadError,
+    build_response_data,
+    format_batch_error_line,
+    format_batch_line,
+    read_batch_request,
+    read_product_request,
+    response_etag,
+)
+from scripts.request_capture import request_capture, exception_record
+from scripts.logging_utils import LazyJson, configure_logging, log_event, set_request_id
+
+try:
+    from config import BATCH_MAX_ITEMS
+except ImportError:
+    BATCH_MAX_ITEMS = 60
+
+# Configure logging (LOG_LEVEL / LOG_FORMAT in config.py or the environment)
+configure_logging()
+logger = logging.getLogger('ecoshop_async_api')
+
+# Initialize Quart app
+app = cors(Quart(__name__))  # Enable CORS for all routes
+
+# Reject oversize uploads before the body is read; payload.py still applies
+# each route's own limit (and the same limit after decompression)
+app.config['MAX_CONTENT_LENGTH'] = max(REQUEST_MAX_BODY_BYTES, BATCH_MAX_BODY_BYTES)
+
+@app.errorhandler(RequestEntityTooLarge)
+async def request_entity_too_large(e):
+    return jsonify({
+        'success': False,
+        'error': f"Request body exceeds {app.config['MAX_CONTENT_LENGTH']} bytes."
+    }), 413
+
+def requires_processor(view):
+    """Answers 503 instead of calling `view` when the processor could not be imported."""
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        if not PROCESSOR_AVAILABLE:
+            logger.error(f"Async processor not available due to import error: {PROCESSOR_IMPORT_ERROR}")
+            return jsonify({
+                'success': False,
+                'error': 'Backend processor module is not available.',
+                'details': PROCESSOR_IMPORT_ERROR
+            }), 503
+        return await view(*args, **kwargs)
+    return wrapper
+
+@app.before_serving
+async def warm_up():
+    if PROCESSOR_AVAILABLE:
+        # The sync app ensures indexes on first use of the database; nothing on the async path does
+        await ensure_async_indexes()
+        await load_near_duplicate_index()
+
+@app.before_request
+async def assign_request_id():
+    # Every log line for this request carries its ID; reuse the caller's if given
+    g.request_id = set_request_id(request.headers.get('X-Request-ID'))
+    g.request_started = datetime.now(timezone.utc)
+
+@app.after_request
+async def log_request_summary(response):
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    if request.path != '/extract_and_rate':
+        return response
+    started = g.get('request_started')
+    log_event(
+        logger, logging.INFO, "request_completed",
+        method=request.method,
+        path=request.path,
+        status=response.status_code,
+        bytes_in=request.content_length or 0,
+        duration_ms=round((datetime.now(timezone.utc) - started).total_seconds() * 1000, 1) if started else None,
+    )
+    return response
+
+@app.route('/extract_and_rate', methods=['POST'])
+@requires_processor
+async def extract_and_rate_product():
+    """Main endpoint for the browser extension (same contract as app.py)."""
+    raw_text_content = None
+    try:
+        product_url, raw_text_content = read_product_request(
+            await request.get_data(), request.content_type, request.headers.get('Content-Encoding')
+        )
+        request_capture.capture({
+            'event': 'request',
+            'path': request.path,
+            'request_id': g.request_id,
+            'content_type': request.content_type,
+            'headers': dict(request.headers),
+            'body': raw_text_content,
+        })
+
+        if raw_text_content is None:
+            return jsonify({'success': False, 'error': 'Failed to decode request content for processor.'}), 400
+
+        start_time = datetime.now(timezone.utc)
+        processed_result = await process_shopee_product_async(
+            url=product_url,
+            raw_text=raw_text_content
+        )
+        if not processed_result:
+            logger.warning("Product processing by async_processor failed or returned no data.")
+            return jsonify({
+                'success': False,
+                'error': 'Product analysis by shopee_processor failed.'
+            }), 500
+
+        processing_time_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
+        final_response_data = build_response_data(processed_result, product_url, processing_time_ms)
+        logger.debug("RESPONSE JSON: %s", LazyJson({'success': True, 'data': final_response_data}))
+        return jsonify({'success': True, 'data': final_response_data})
+
+    except PayloadError as e:
+        logger.warning(f"Rejected /extract_and_rate body: {e}")
+        return jsonify({'success': False, 'error': str(e)}), e.status
+
+    except RequestEntityTooLarge:
+        # Answered by request_entity_too_large, not as a server error
+        raise
+
+    except Exception as e:
+        logger.error(f"CRITICAL ERROR in /extract_and_rate: {str(e)}", exc_info=True)
+        record = exception_record(request.path)
+        record['body'] = raw_text_content
+        record['request_id'] = g.get('request_id')
+        request_capture.capture(record, force=True)
+        return jsonify({'success': False, 'error': f'An internal server error occurred: {str(e)}'}), 500
+
+@app.route('/batch_rate', methods=['POST'])
+@requires_processor
+async def batch_rate():
+    """Scores many products in one request, streamed as NDJSON (same contract as app.py)."""
+    try:
+        items = read_batch_request(await request.get_data(), request.headers.get('Content-Encoding'))
+    except PayloadError as e:
+        logger.warning(f"Rejected /batch_rate body: {e}")
+        return jsonify({'success': False, 'error': str(e)}), e.status
+    if items is None:
+        return jsonify({'success': False, 'error': 'Expected a JSON list of {url, plainText} items.'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'success': False, 'error': f'Too many items (maximum is {BATCH_MAX_ITEMS}).'}), 413
+
+    async def generate():
+        start_time = datetime.now(timezone.utc)
+        completed = 0
+        try:
+            async for index, processed_result in process_shopee_products_batch_async(items):
+                processing_time_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
+                yield format_batch_line(index, items[index][0], processed_result, processing_time_ms).encode('utf-8')
+                completed += 1
+        except Exception as e:
+            # The status line is long gone; end the stream with an error record instead
+            logger.error(f"Batch rating failed after {completed} of {len(items)} items: {e}", exc_info=True)
+            yield format_batch_error_line(completed).encode('utf-8')
+
+    return generate(), 200, {
+        'Content-Type': 'application/x-ndjson',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    }
+
+@app.route('/score/<source_site>/<listing_id>', methods=['GET'])
+@requires_processor
+async def get_score(source_site, listing_id):
+    """Stored score of an analyzed listing with ETag revalidation (same contract as app.py)."""
+    start_time = datetime.now(timezone.utc)
+    try:
+        processed_result = await get_stored_product_response_async(source_site, listing_id)
+    except Exception as e:
+        logger.error(f"Error looking up {source_site}:{listing_id}: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': f'An internal server error occurred: {str(e)}'}), 500
+    if not processed_result:
+        return jsonify({'success': False, 'status': 'not_found', 'error': 'This listing has not been scored yet.'}), 404
+
+    processing_time_ms = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
+    data = build_response_data(processed_result, processed_result.get('source_url'), processing_time_ms)
+    etag = response_etag(data)
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class('', status=304)
+    else:
+        response = jsonify({'success': True, 'status': 'found', 'data': data})
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/score/<source_site>/<listing_id>/analysis', methods=['GET'])
+@requires_processor
+async def get_score_analysis(source_site, listing_id):
+    """Analysis texts of an analyzed listing for the details page (same contract as app.py)."""
+    try:
+        analysis = await get_product_analysis_async(source_site, listing_id)
+    except Exception as e:
+        logger.error(f"Error looking up the analysis of {source_site}:{listing_id}: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': f'An internal server error occurred: {str(e)}'}), 500
+    if analysis is None:
+        return jsonify({'success': False, 'status': 'not_found', 'error': 'This listing has not been scored yet.'}), 404
+
+    data = {'source_site': source_site, 'listing_id': listing_id, 'analysis': analysis}
+    etag = response_etag(data)
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class('', status=304)
+    else:
+        response = jsonify({'success': True, 'status': 'found', 'data': data})
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/cache/stats', methods=['GET'])
+async def cache_stats():
+    """Hit/miss/eviction counters for this process's in-process hot cache."""
+    return jsonify({'success': True, 'data': get_cache_stats()})
+
+
+@app.route('/db/pool/stats', methods=['GET'])
+async def db_pool_stats():
+    """Connection pool counters for this process's MongoDB clients."""
+    return jsonify({'success': True, 'data': get_pool_stats()})
+
+
+@app.route('/llm/stats', methods=['GET'])
+async def llm_stats():
+    """Estimated prompt tokens sent to and saved before the LLM, and the LLM scheduler's state, for this process."""
+    return jsonify({'success': True, 'data': {
+        'prompt_compaction': compaction_stats.snapshot(),
+        'scheduler': llm_scheduler.stats(),
+    }})
+
+
+@app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS'])
+@app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'OPTIONS'])
+async def catch_all(path):
+    return jsonify({"status": "EcoShop async API is running. Use /extract_and_rate for analysis.", "path_requested": path}), 200
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5000))
+    logger.info(f"EcoShop async app starting on host 0.0.0.0, port {port}")
+    app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Memory and per-request benchmark for the compact breakdown (scorer.Breakdown).
+
+Builds N stored product documents as MongoDB returns them (three analysis
+texts of --analysis-chars characters each, a NEAR_DUP_NUM_PERM MinHash
+signature, fresh key strings per document as the BSON decoder makes them)
+and compares two hot caches of them:
+
+  - full documents with dict breakdowns, as cached before;
+  - the documents as read with PRODUCT_RESPONSE_PROJECTION (no analysis
+    texts, no signature) with a compact `Breakdown`, as cached now.
+
+For each it reports the memory the filled cache holds (tracemalloc) and the
+time of a cache hit as served: `product_cache.get` (a deep copy) and
+`finalize_product_response`, which scores the product and shapes the
+breakdown for the response. No database is involved.
+
+    python benchmarks/bench_breakdown.py
+    python benchmarks/bench_breakdown.py --products 10000 --analysis-chars 1200
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RATINGS = ['Excellent', 'Good', 'Neutral', 'Poor', 'Unknown']
+WORDS = "recycled cotton blend polyester brand certified packaging durable repairable shipping factory".split()
+
+
+def stored_document(index: int, analysis_chars: int, num_perm: int, rng: random.Random) -> dict:
+    from scripts.scorer import BREAKDOWN_CATEGORIES, RATING_SCORES
+
+    def text():
+        words = []
+        while sum(len(word) + 1 for word in words) < analysis_chars:
+            words.append(rng.choice(WORDS))
+        return ' '.join(words)[:analysis_chars]
+
+    # ''.join(...) builds new key strings, like a decoded BSON document
+    key = lambda name: ''.join(list(name))
+    breakdown = {}
+    for category in BREAKDOWN_CATEGORIES:
+        rating = rng.choice(RATINGS)
+        breakdown[key(category)] = {key('value'): rating, key('score'): RATING_SCORES[rating], key('analysis'): text()}
+    return {
+        key('_id'): f"{index:024x}",
+        key('listing_id'): f"{900000000 + index}_{index}",
+        key('source_site'): 'shopee.sg',
+        key('source_url'): f"https://shopee.sg/Bench-Product-i.{900000000 + index}.{index}",
+        key('product_name'): f"Bench Product {index}",
+        key('brand'): 'Bench',
+        key('category'): 'Sneakers',
+        key('sustainability_breakdown'): breakdown,
+        key('default_sustainability_score'): 50,
+        key('content_hash'): f"v1:{index:064x}",
+        key('minhash'): [rng.getrandbits(32) for _ in range(num_perm)],
+    }
+
+
+def projected(document: dict) -> dict:
+    """The document as read with PRODUCT_RESPONSE_PROJECTION."""
+    product = {key: value for key, value in document.items() if key != 'minhash'}
+    product['sustainability_breakdown'] = {
+        category: {key: value for key, value in details.items() if key != 'analysis'}
+        for category, details in document['sustainability_breakdown'].items()
+    }
+    return product
+
+
+def filled_cache(documents, count: int, prepare) -> tuple:
+    """
+    A cache holding `prepare(document)` for `count` documents, and the bytes
+    it holds. The documents are built while memory is traced and dropped once
+    cached, so whatever the cache keeps of them (e.g. the strings, which
+    deep copies share) is counted.
+    """
+    from scripts.hot_cache import TTLCache
+
+    gc.collect()
+    tracemalloc.start()
+    cache = TTLCache('bench', count, 3600)
+    for document in documents:
+        cache.put((document['source_site'], document['listing_id']), prepare(document))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return cache, size
+
+
+def finalize_previous(product: dict, recommendations: list) -> dict:
+    """`finalize_product_response` as it was, on a dict breakdown."""
+    from scripts.scorer import calculate_weighted_score
+
+    product['sustainability_score'] = calculate_weighted_score(product['sustainability_breakdown'])
+    product['recommendations'] = recommendations
+    product.pop('default_sustainability_score', None)
+    product.pop('_id', None)
+    return product
+
+
+def timed_hits(cache, keys, finalize, rounds: int) -> float:
+    """The best time per cache hit, over `rounds` passes of every key."""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for key in keys:
+            finalize(cache.get(key), [])
+        best = min(best, (time.perf_counter() - started) / len(keys))
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact breakdown memory and cache-hit benchmark.")
+    parser.add_argument('--products', type=int, default=10_000, help='cached products (HOT_CACHE_MAX_PRODUCTS)')
+    parser.add_argument('--analysis-chars', type=int, default=600, help='characters per analysis text')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from scripts.near_duplicates import NEAR_DUP_NUM_PERM
+    from scripts.shopee_processor import compact_product, finalize_product_response
+
+    def documents():
+        rng = random.Random(args.seed)
+        return (stored_document(index, args.analysis_chars, NEAR_DUP_NUM_PERM, rng) for index in range(args.products))
+
+    full_cache, full_bytes = filled_cache(documents(), args.products, lambda document: document)
+    compact_cache, compact_bytes = filled_cache(documents(), args.products,
+                                                lambda document: compact_product(projected(document)))
+    keys = list(full_cache._entries)
+
+    full_seconds = timed_hits(full_cache, keys, finalize_previous, args.rounds)
+    compact_seconds = timed_hits(compact_cache, keys, finalize_product_response, args.rounds)
+
+    # Both must give every product the same score
+    same = all(
+        finalize_previous(full_cache.get(key), [])['sustainability_score']
+        == finalize_product_response(compact_cache.get(key), [])['sustainability_score']
+        for key in keys
+    )
+
+    print(f"{args.products} cached products, {args.analysis_chars}-character analyses, "
+          f"{NEAR_DUP_NUM_PERM}-value MinHash signatures")
+    for label, size, seconds in (("full documents, dict breakdowns", full_bytes, full_seconds),
+                                 ("projected, compact Breakdown", compact_bytes, compact_seconds)):
+        print(f"  {label:34} {size / 2**20:8.1f} MiB  {size / args.products:8,.0f} B/product"
+              f"  {seconds * 1e6:7.1f} us per cache hit")
+    print(f"  identical scores: {'yes' if same else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-request logging cost, before and after level-gated logging.
+
+Replays the log statements one /extract_and_rate request used to make
+(INFO-level `json.dumps(..., indent=2)` of the payload, the analysis, the
+breakdown, the stored document, the response and each recommendation) and
+the statements it makes now (compact INFO events, with the document dumps
+moved to DEBUG behind `LazyJson`), over the same realistic documents. Output
+goes through a real handler and formatter into a byte-counting sink, so
+the numbers include formatting but not disk I/O.
+
+    python benchmarks/bench_logging.py --requests 2000
+
+Needs no database or API key.
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.logging_utils import LazyJson, TextFormatter, JsonFormatter, RequestIdFilter, log_event, set_request_id
+
+PAGE_TEXT = "\n".join([
+    "URL: https://shopee.sg/EcoBench-Sneakers-i.900000001.123456789",
+    "Product Brand: EcoBench",
+    "Product Name: EcoBench Recycled Canvas Sneakers",
+    "Product Specifications:",
+    "Category: Shopee > Men Shoes > Sneakers",
+    "Material: Recycled cotton canvas, natural rubber sole",
+    "Country of Origin: Vietnam",
+    "Product Description: " + "Lightweight everyday sneakers made from recycled canvas. " * 60,
+])
+
+ANALYSIS = {
+    "product_name": "EcoBench Recycled Canvas Sneakers",
+    "brand": "EcoBench",
+    "category": "Men Shoes",
+    "sustainability_analysis": {
+        name: {
+            "rating": "Good",
+            "analysis": "The product uses recycled cotton canvas and a natural rubber sole. " * 6,
+        }
+        for name in ("materials", "production", "brand_ethics")
+    },
+}
+
+BREAKDOWN = {
+    name: {"value": "Good", "score": 8, "analysis": details["analysis"]}
+    for name, details in ANALYSIS["sustainability_analysis"].items()
+}
+
+DOCUMENT = {
+    "listing_id": "900000001_123456789",
+    "source_site": "shopee.sg",
+    "source_url": "https://shopee.sg/EcoBench-Sneakers-i.900000001.123456789",
+    "product_name": ANALYSIS["product_name"],
+    "brand": ANALYSIS["brand"],
+    "category": ANALYSIS["category"],
+    "sustainability_breakdown": BREAKDOWN,
+    "default_sustainability_score": 80,
+}
+
+RECOMMENDATIONS = [
+    {"product_name": f"Alternative {i}", "brand": "Other", "url": f"https://shopee.sg/x-i.1.{i}", "score": 90 - i}
+    for i in range(3)
+]
+
+RESPONSE = {
+    "success": True,
+    "data": {**DOCUMENT, "score": 80, "breakdown": BREAKDOWN, "recommendations": RECOMMENDATIONS},
+}
+
+
+class CountingSink(io.TextIOBase):
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode('utf-8'))
+        self.lines += text.count('\n')
+        return len(text)
+
+
+def old_request(logger: logging.Logger) -> None:
+    """The INFO-level statements of one cache-miss request before the change."""
+    logger.info(f'EXT_PAYLOAD /extract_and_rate (text/plain): {PAGE_TEXT[:1000]}...')
+    logger.info("--- /extract_and_rate: NEW REQUEST ---")
+    logger.info(f"Parsed product_url from request: {DOCUMENT['source_url']}")
+    logger.info("=== SHOPEE_PROCESSOR: STARTING PROCESSING ===")
+    logger.info(f"SUCCESS: Parsed URL -> {json.dumps({'source_site': 'shopee.sg', 'listing_id': DOCUMENT['listing_id']}, indent=2)}")
+    logger.info(f"Raw text preview (first 500 chars): {PAGE_TEXT[:500]}...")
+    logger.info(f"LLM final_json output: {json.dumps(ANALYSIS, indent=2)}")
+    logger.info(f"Analysis result: {json.dumps(ANALYSIS, indent=2)}")
+    logger.info(f"Input to generate_sustainability_breakdown: {json.dumps(ANALYSIS, indent=2)}")
+    logger.info(f"Extracted sustainability_analysis: {json.dumps(ANALYSIS['sustainability_analysis'], indent=2)}")
+    logger.info(f"Generated breakdown: {json.dumps(BREAKDOWN, indent=2)}")
+    logger.info(f"Sustainability breakdown: {json.dumps(BREAKDOWN, indent=2)}")
+    logger.info(f"Document to insert: {json.dumps(DOCUMENT, indent=2)}")
+    logger.info(f"Recommendations: {json.dumps(RECOMMENDATIONS, indent=2, default=str)}")
+    logger.info(f"Returning product: {json.dumps(RESPONSE['data'], indent=2, default=str)}")
+    logger.info(f"RESPONSE JSON: {json.dumps(RESPONSE, indent=2)}")
+    for i, rec in enumerate(RECOMMENDATIONS):
+        logger.info(f"Recommendation {i+1}: {json.dumps(rec, indent=2, default=str)}")
+
+
+def new_request(logger: logging.Logger) -> None:
+    """The statements the same request makes now."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("EXT_PAYLOAD %s (%s): %s", '/extract_and_rate', 'text/plain', PAGE_TEXT[:1000])
+    log_event(logger, logging.INFO, "cache_miss", source_site='shopee.sg', listing_id=DOCUMENT['listing_id'])
+    log_event(logger, logging.INFO, "llm_analysis_started", listing_id=DOCUMENT['listing_id'], text_chars=len(PAGE_TEXT))
+    logger.debug("Raw text preview (first 500 chars): %s", PAGE_TEXT[:500])
+    logger.debug("LLM final_json output: %s", LazyJson(ANALYSIS))
+    logger.debug("Analysis result: %s", LazyJson(ANALYSIS))
+    logger.debug("Generated breakdown: %s", LazyJson(BREAKDOWN))
+    logger.debug("Document to insert: %s", LazyJson(DOCUMENT))
+    log_event(logger, logging.INFO, "product_stored", listing_id=DOCUMENT['listing_id'],
+              category=DOCUMENT['category'], score=80, _id='66f000000000000000000000')
+    logger.debug("Found %d recommendations for category '%s': %s", 3, DOCUMENT['category'], LazyJson(RECOMMENDATIONS))
+    logger.debug("Returning product: %s", LazyJson(RESPONSE['data']))
+    logger.debug("RESPONSE JSON: %s", LazyJson(RESPONSE))
+    log_event(logger, logging.INFO, "request_completed", method='POST', path='/extract_and_rate',
+              status=200, bytes_in=len(PAGE_TEXT), duration_ms=1234.5)
+
+
+def run(name: str, request_fn, level: int, formatter: logging.Formatter, requests: int) -> dict:
+    sink = CountingSink()
+    handler = logging.StreamHandler(sink)
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(formatter)
+    logger = logging.getLogger(f'bench.{name}')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+
+    set_request_id('bench')
+    start_cpu = time.process_time()
+    for _ in range(requests):
+        request_fn(logger)
+    cpu = time.process_time() - start_cpu
+    return {
+        'variant': name,
+        'cpu_us_per_request': round(cpu / requests * 1e6, 1),
+        'bytes_per_request': round(sink.bytes / requests),
+        'lines_per_request': round(sink.lines / requests, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    old_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    rows = [
+        run('old (INFO)', old_request, logging.INFO, old_formatter, args.requests),
+        run('new text (INFO)', new_request, logging.INFO, TextFormatter(), args.requests),
+        run('new json (INFO)', new_request, logging.INFO, JsonFormatter(), args.requests),
+        run('new text (DEBUG)', new_request, logging.DEBUG, TextFormatter(), args.requests),
+    ]
+
+    columns = ['variant', 'cpu_us_per_request', 'bytes_per_request', 'lines_per_request']
+    print(' | '.join(f"{c:>18}" for c in columns))
+    for row in rows:
+        print(' | '.join(f"{str(row[c]):>18}" for c in columns))
+
+
+if __name__ == '__main__':
+    main()
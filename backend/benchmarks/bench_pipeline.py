@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the analysis pipeline with the local analyzer.
+
+Runs `process_shopee_product` directly, then POST /extract_and_rate through
+the Flask app (WSGI layer, no sockets), for a set of distinct listings
+(cache misses that reach the analyzer) and then the same listings again
+(cache hits). A last phase sends fresh listings through
+`process_shopee_products_batch` in chunks of --batch-size, where concurrent
+misses share multi-product LLM calls. The analyzer is the deterministic local provider
+(local_analyzer.py) with the given latency and error rate, so the numbers
+show what the pipeline adds around the LLM, without network calls or API
+costs. The LLM scheduler's quotas are off unless --rpm is given.
+
+    python benchmarks/bench_pipeline.py --mongo-uri mongodb://localhost:27017
+    python benchmarks/bench_pipeline.py --in-memory --latency-ms 50 --error-rate 0.05
+
+A scratch database (ecoshop_bench_<random>) is created and dropped. With
+--in-memory the database is mongomock, if it is installed; it is not a
+backend dependency and is only meant for machines without a mongod.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MATERIALS = [
+    "recycled polyester", "organic cotton", "bamboo fibre", "hemp canvas", "nylon",
+    "natural rubber", "pvc", "linen", "wool blend", "cork", "acrylic", "pu leather",
+]
+CLAIMS = [
+    "fair trade certified", "gots certified", "fsc certified paper tag", "biodegradable packaging",
+    "recyclable box", "single-use sachet", "repairable stitching", "refillable", "oeko-tex",
+]
+WORDS = [
+    "aurora", "basalt", "cedar", "delta", "ember", "fjord", "garnet", "harbor", "indigo",
+    "juniper", "kestrel", "lumen", "meadow", "nimbus", "onyx", "prairie", "quartz", "russet",
+    "sierra", "tundra", "umber", "vesper", "willow", "xenon", "yarrow", "zephyr",
+]
+CATEGORIES = ["Sneakers", "Backpacks", "T-Shirts", "Water Bottles", "Notebooks", "Phone Cases"]
+
+
+def page_text(url: str, n: int) -> str:
+    """Product text that is distinct enough per listing to miss the content and near-duplicate caches."""
+    rng = random.Random(n)
+    name = " ".join(rng.sample(WORDS, 4)).title()
+    category = rng.choice(CATEGORIES)
+    return "\n".join([
+        f"URL: {url}",
+        f"Product Brand: {rng.choice(WORDS).title()}{rng.randrange(100, 999)}",
+        f"Product Name: {name} {category[:-1]} {n}",
+        "Product Specifications:",
+        f"Category: Shopee > Lifestyle > {category}",
+        f"Material: {', '.join(rng.sample(MATERIALS, 2))}",
+        f"Features: {', '.join(rng.sample(CLAIMS, 2))}",
+        f"Model: {' '.join(rng.sample(WORDS, 3))} {n}",
+        f"Product Description: {' '.join(rng.choices(WORDS, k=40))}",
+    ])
+
+
+def listing(n: int, offset: int) -> tuple[str, str]:
+    url = f"https://shopee.sg/Bench-Product-i.900000001.{offset + n}"
+    return url, page_text(url, offset + n)
+
+
+def run_phase(label: str, call, items: list, concurrency: int) -> dict:
+    def timed(item):
+        started = time.perf_counter()
+        ok = call(*item)
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, items))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for ok, latency in results if ok)
+
+    def percentile(p):
+        if not latencies:
+            return float('nan')
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    return {
+        'phase': label,
+        'requests': len(items),
+        'ok': len(latencies),
+        'errors': len(results) - len(latencies),
+        'elapsed_s': elapsed,
+        'throughput': len(items) / elapsed if elapsed else float('inf'),
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else float('nan'),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+    }
+
+
+def run_batches(process_batch, items: list, batch_size: int) -> dict:
+    """Sequential batch requests; the reported latencies are per listing (its batch's duration)."""
+    ok, latencies = 0, []
+    started = time.perf_counter()
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        batch_started = time.perf_counter()
+        results = [result for _, result in process_batch(chunk)]
+        latency = time.perf_counter() - batch_started
+        good = sum(1 for result in results if result and 'error' not in result)
+        ok += good
+        latencies.extend([latency] * good)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return float('nan')
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    return {
+        'phase': f'batch of {batch_size}, miss',
+        'requests': len(items),
+        'ok': ok,
+        'errors': len(items) - ok,
+        'elapsed_s': elapsed,
+        'throughput': len(items) / elapsed if elapsed else float('inf'),
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else float('nan'),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with the local analyzer.")
+    parser.add_argument('--mongo-uri', help='MongoDB to use (a scratch database is created and dropped)')
+    parser.add_argument('--in-memory', action='store_true', help='use mongomock instead of a server')
+    parser.add_argument('--requests', type=int, default=200, help='distinct listings per phase')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=20, help='listings per batch request')
+    parser.add_argument('--rpm', type=float, default=0,
+                        help='LLM scheduler requests per minute (default 0: no quota, to measure the pipeline)')
+    args = parser.parse_args()
+    if not args.in_memory and not args.mongo_uri:
+        parser.error("pass --mongo-uri or --in-memory")
+
+    os.environ['ANALYZER_PROVIDER'] = 'local'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from scripts import db, mongo_pool
+    if args.in_memory:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--in-memory needs mongomock (pip install mongomock)")
+        mongo_pool.MongoClient = mongomock.MongoClient
+    database_name = f"ecoshop_bench_{random.randrange(16**8):08x}"
+    db.MONGO_URI = args.mongo_uri or 'mongodb://localhost'
+    db.MONGO_DB = database_name
+    db.MONGO_PRODUCTS_COLLECTION = db.COLLECTION_NAMES['products'] = 'products'
+
+    from scripts.analyzer import set_analyzer_provider
+    from scripts.llm_scheduler import llm_scheduler
+    llm_scheduler.set_rates(args.rpm, 0)
+    from scripts.local_analyzer import LocalAnalyzerProvider
+    provider = LocalAnalyzerProvider(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    set_analyzer_provider(provider)
+
+    import app as flask_app
+    from scripts.shopee_processor import process_shopee_product, process_shopee_products_batch
+    client = flask_app.app.test_client()
+
+    def direct(url, text):
+        result = process_shopee_product(url, text)
+        return bool(result) and 'error' not in result
+
+    def http(url, text):
+        response = client.post('/extract_and_rate', data=text.encode('utf-8'), content_type='text/plain')
+        return response.status_code == 200 and response.get_json().get('success', False)
+
+    offset = random.randrange(1, 10**9)
+    direct_items = [listing(n, offset) for n in range(args.requests)]
+    http_items = [listing(n, offset + args.requests) for n in range(args.requests)]
+    batch_items = [listing(n, offset + 2 * args.requests) for n in range(args.requests)]
+
+    print(f"local analyzer: {args.latency_ms:.0f} +/- {args.jitter_ms:.0f} ms, error rate {args.error_rate:.0%}; "
+          f"{args.requests} listings per phase, concurrency {args.concurrency}; "
+          f"database: {'mongomock' if args.in_memory else args.mongo_uri}")
+    results = []
+    try:
+        results.append(run_phase('process_shopee_product, miss', direct, direct_items, args.concurrency))
+        results.append(run_phase('process_shopee_product, hit', direct, direct_items, args.concurrency))
+        results.append(run_phase('POST /extract_and_rate, miss', http, http_items, args.concurrency))
+        results.append(run_phase('POST /extract_and_rate, hit', http, http_items, args.concurrency))
+        calls_before = provider.stats()['calls']
+        results.append(run_batches(process_shopee_products_batch, batch_items, args.batch_size))
+        batch_calls = provider.stats()['calls'] - calls_before
+    finally:
+        db.get_mongo_client().drop_database(database_name)
+
+    print(f"{'phase':32} {'ok':>6} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for result in results:
+        print(f"{result['phase']:32} {result['ok']:6d} {result['errors']:7d} {result['throughput']:9.1f} "
+              f"{result['p50_ms']:8.1f} {result['p95_ms']:8.1f} {result['p99_ms']:8.1f}")
+    stats = provider.stats()
+    print(f"analyzer calls: {stats['calls']} ({stats['failures']} simulated failures) "
+          f"for {3 * args.requests} distinct listings; {batch_calls} of them for the "
+          f"{args.requests} batch listings")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Compute benchmark for bulk rescoring (scripts/rescore.py).
+
+Builds N projected products (as the rescoring aggregation returns them)
+with random ratings and times the rescoring work two ways: a per-document
+loop (a breakdown dict and `calculate_weighted_score` per product) and
+`rescore_batch` in batches (`calculate_weighted_scores`, NumPy if
+installed; products with the same change share an UpdateMany), both
+including change detection and update construction.
+The score computation alone is timed too, and both ways must give the same
+scores. No database is involved; reads and writes are measured by the job
+itself (rescore_progress).
+
+    python benchmarks/bench_rescore.py
+    python benchmarks/bench_rescore.py --products 2000000 --batch-size 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['material_composition', 'production_and_brand', 'circularity_and_end_of_life']
+
+
+def projected_products(count: int, seed: int) -> list:
+    from scripts.scorer import RATING_SCORES
+    rng = random.Random(seed)
+    ratings = list(RATING_SCORES)
+    return [
+        {
+            '_id': index,
+            'category': 'Bench',
+            'default_sustainability_score': -1,  # stale: every product changes
+            'breakdown': [
+                {'name': name, 'rating': rating, 'score': RATING_SCORES[rating]}
+                for name, rating in ((name, rng.choice(ratings)) for name in CATEGORIES)
+            ],
+        }
+        for index in range(count)
+    ]
+
+
+def rescore_batch_loop(products: list) -> list:
+    """The per-document version of `rescore_batch`."""
+    from pymongo import UpdateOne
+    from scripts.rescore import category_score
+    from scripts.scorer import calculate_weighted_score
+
+    updates = []
+    for product in products:
+        breakdown = {
+            entry['name']: {'score': category_score(entry.get('rating'), entry.get('score'))}
+            for entry in product['breakdown']
+        }
+        final_score = calculate_weighted_score(breakdown)
+        changes = {}
+        if product.get('default_sustainability_score') != final_score:
+            changes['default_sustainability_score'] = final_score
+        for entry in product['breakdown']:
+            score = breakdown[entry['name']]['score']
+            if entry.get('rating') is not None and entry.get('score') != score:
+                changes[f"sustainability_breakdown.{entry['name']}.score"] = score
+        if changes:
+            updates.append(UpdateOne({'_id': product['_id']}, {'$set': changes}))
+    return updates
+
+
+def timed_batches(function, products: list, batch_size: int) -> tuple[float, int, dict]:
+    """Runs `function` over `products` in batches; returns the time, the update count and each _id's new score."""
+    started = time.perf_counter()
+    batches = [function(products[start:start + batch_size]) for start in range(0, len(products), batch_size)]
+    seconds = time.perf_counter() - started
+
+    operations, scores = 0, {}
+    for result in batches:
+        updates = result[0] if isinstance(result, tuple) else result
+        operations += len(updates)
+        for update in updates:
+            ids = update._filter['_id']
+            for _id in ids['$in'] if isinstance(ids, dict) else [ids]:
+                scores[_id] = update._doc['$set']['default_sustainability_score']
+    return seconds, operations, scores
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk rescoring compute benchmark.")
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from scripts.rescore import category_score, rescore_batch
+    from scripts.scorer import calculate_weighted_score, calculate_weighted_scores
+    try:
+        import numpy
+        backend = f"NumPy {numpy.__version__}"
+    except ImportError:
+        backend = "no NumPy (per-product fallback)"
+
+    products = projected_products(args.products, args.seed)
+
+    loop_seconds, loop_operations, loop_scores = timed_batches(rescore_batch_loop, products, args.batch_size)
+    batch_seconds, batch_operations, batch_scores = timed_batches(rescore_batch, products, args.batch_size)
+
+    # The score computation alone, on ready-made score rows
+    rows = [[category_score(entry['rating'], entry['score']) for entry in product['breakdown']]
+            for product in products]
+    started = time.perf_counter()
+    for row in rows:
+        calculate_weighted_score({index: {'score': score} for index, score in enumerate(row)})
+    scalar_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for start in range(0, len(rows), args.batch_size):
+        calculate_weighted_scores(rows[start:start + args.batch_size])
+    vector_seconds = time.perf_counter() - started
+
+    def line(label, seconds, operations=None):
+        print(f"  {label:40} {seconds:7.2f} s  {args.products / seconds:12,.0f} products/s"
+              + (f"  {operations:,} update operations" if operations is not None else ""))
+
+    print(f"{args.products} products, batches of {args.batch_size}, {backend}")
+    line("rescoring, per-document loop", loop_seconds, loop_operations)
+    line("rescoring, rescore_batch", batch_seconds, batch_operations)
+    line("scores only, calculate_weighted_score", scalar_seconds)
+    line("scores only, calculate_weighted_scores", vector_seconds)
+    print(f"  identical scores: {'yes' if loop_scores == batch_scores else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
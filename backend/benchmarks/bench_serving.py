@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: sync (Flask/gunicorn) vs async (ASGI) serving of /extract_and_rate.
+
+Start both servers against the same database, then point this script at them:
+
+    gunicorn -w 4 -b 127.0.0.1:5000 --timeout 120 app:app
+    hypercorn -b 127.0.0.1:5001 asgi:app
+
+    python benchmarks/bench_serving.py \
+        --target sync=http://127.0.0.1:5000 \
+        --target async=http://127.0.0.1:5001 \
+        --requests 400 --concurrency 200
+
+By default every request uses a distinct listing ID, so each one is a cache
+miss that waits on the LLM (the case the async mode is for). Use
+`--cache-hits` to send the same listing every time instead. To run offline
+without LLM costs, start both servers with ANALYZER_PROVIDER=local (the
+deterministic stand-in in scripts/local_analyzer.py; its latency is set by
+LOCAL_ANALYZER_LATENCY_MS in config.py).
+
+The load generator only uses the standard library (one thread per
+concurrent request), so it runs anywhere the backend does.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PAGE_TEXT = """URL: {url}
+Product Brand: EcoBench
+Product Name: EcoBench Recycled Canvas Sneakers {n}
+Product Specifications:
+Category: Shopee > Men Shoes > Sneakers
+Material: Recycled cotton canvas, natural rubber sole
+Country of Origin: Vietnam
+Product Description: Lightweight everyday sneakers made from recycled canvas."""
+
+
+def make_request(base_url: str, n: int, cache_hits: bool, timeout: float) -> tuple[bool, float, int]:
+    item_id = 1 if cache_hits else n
+    url = f"https://shopee.sg/EcoBench-Sneakers-i.900000001.{item_id}"
+    body = PAGE_TEXT.format(url=url, n=item_id).encode('utf-8')
+    req = urllib.request.Request(
+        f"{base_url.rstrip('/')}/extract_and_rate",
+        data=body,
+        headers={'Content-Type': 'text/plain'},
+        method='POST',
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            payload = json.loads(response.read())
+            ok = bool(payload.get('success'))
+            status = response.status
+    except urllib.error.HTTPError as e:
+        ok, status = False, e.code
+    except Exception:
+        ok, status = False, 0
+    return ok, time.perf_counter() - start, status
+
+
+def run_target(name: str, base_url: str, args) -> dict:
+    # Offset item IDs per run so targets sharing a database don't hit each other's cache
+    offset = random.randrange(1, 10**9)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(
+            lambda n: make_request(base_url, offset + n, args.cache_hits, args.timeout),
+            range(args.requests),
+        ))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for ok, latency, _ in results if ok)
+    errors = [status for ok, _, status in results if not ok]
+
+    def percentile(p):
+        if not latencies:
+            return float('nan')
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    return {
+        'target': name,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'ok': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(50), 1),
+        'p95_ms': round(percentile(95), 1),
+        'p99_ms': round(percentile(99), 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else float('nan'),
+        'wall_s': round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True,
+                        help='name=base_url, e.g. sync=http://127.0.0.1:5000 (repeatable)')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--cache-hits', action='store_true', help='reuse one listing instead of forcing misses')
+    args = parser.parse_args()
+
+    rows = []
+    for target in args.target:
+        name, _, base_url = target.partition('=')
+        print(f"Running {args.requests} requests at concurrency {args.concurrency} against {name} ({base_url})...")
+        rows.append(run_target(name, base_url, args))
+
+    columns = ['target', 'ok', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'wall_s']
+    print()
+    print(' | '.join(f"{c:>14}" for c in columns))
+    for row in rows:
+        print(' | '.join(f"{str(row[c]):>14}" for c in columns))
+
+
+if __name__ == '__main__':
+    main()
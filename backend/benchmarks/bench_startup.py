@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: how long a fresh process takes to import the app.
+
+Runs `python -X importtime -c "import <module>"` in new interpreters (from
+backend/, so config.py is picked up) and reports the median wall time, the
+total import time reported by the interpreter, and the heaviest
+packages by self time. A new gunicorn/uvicorn worker pays this cost before it
+can serve its first request.
+
+    python benchmarks/bench_startup.py                # import app (Flask)
+    python benchmarks/bench_startup.py --module asgi  # import asgi (Quart)
+    python benchmarks/bench_startup.py --runs 10 --top 15
+
+Needs no database or API key; with the placeholder config.py, MongoDB is
+treated as not configured and nothing connects.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """(self µs, cumulative µs, indented module name) for each `import time:` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        # The name column is ' ' + two spaces per nesting level + module name
+        rows.append((int(parts[0]), int(parts[1]), parts[2][1:].rstrip()))
+    return rows
+
+
+def run_once(module: str) -> tuple[float, list[tuple[int, int, str]]]:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        sys.exit(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    return elapsed, parse_importtime(completed.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--module', default='app', help='module to import (default: app)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='heaviest packages to list')
+    args = parser.parse_args()
+
+    run_once(args.module)  # warm the bytecode and OS file caches
+    wall_times, import_totals, last_rows = [], [], []
+    for _ in range(args.runs):
+        elapsed, rows = run_once(args.module)
+        wall_times.append(elapsed)
+        # Top-level imports (no indentation) add up to the total import time
+        import_totals.append(sum(cumulative for _, cumulative, name in rows if not name.startswith(' ')))
+        last_rows = rows
+
+    print(f"import {args.module}: {args.runs} runs")
+    print(f"  wall time (process start to exit): median {statistics.median(wall_times) * 1000:.0f} ms, "
+          f"min {min(wall_times) * 1000:.0f} ms")
+    print(f"  import time (-X importtime):       median {statistics.median(import_totals) / 1000:.0f} ms")
+    modules = {name.strip() for _, _, name in last_rows}
+    print(f"  modules imported: {len(modules)}; google.generativeai imported: "
+          f"{'yes' if 'google.generativeai' in modules else 'no'}")
+
+    # Self time summed per root package (google, grpc, pymongo, ...), so the
+    # cost of a dependency shows up in one line wherever it is imported from
+    by_package = {}
+    for self_us, _, name in last_rows:
+        root = name.strip().split('.')[0]
+        by_package[root] = by_package.get(root, 0) + self_us
+    print("  heaviest packages by self time (last run):")
+    for root, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"    {self_us / 1000:8.1f} ms  {root}")
+
+if __name__ == '__main__':
+    main()
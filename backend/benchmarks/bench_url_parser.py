@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for scripts/url_parser.py.
+
+Builds a corpus of real-shaped Shopee URLs (slug + i.<shop>.<item> with
+tracking parameters, /product/<shop>/<item> share links, regional domains,
+and a share of search pages and non-Shopee URLs) and times:
+
+  - the previous parser (string splits, re.search with a pattern string),
+    reproduced here: with its logging at the default INFO level (a WARNING
+    per URL it rejects, written to /dev/null) and with logging off;
+  - parse_shopee_url with a cold memo cache (every URL new, as in a backfill);
+  - parse_shopee_url on a stream where --repeat-rate of the URLs repeat one
+    of the last REPEAT_WINDOW URLs (batches, popular listings).
+
+Both parsers must agree on every URL the previous one accepted.
+
+    python benchmarks/bench_url_parser.py
+    python benchmarks/bench_url_parser.py --urls 2000000 --repeat-rate 0.5
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DOMAINS = [
+    "shopee.sg", "shopee.com.my", "shopee.co.id", "shopee.co.th", "shopee.vn",
+    "shopee.ph", "shopee.tw", "shopee.com.br", "shopee.com.mx",
+]
+SLUG_WORDS = [
+    "NEW", "Unisex", "Stainless", "Steel", "Tumbler", "Organic", "Cotton", "T-Shirt", "Bamboo",
+    "Toothbrush", "Recycled", "Backpack", "(White)", "Sneakers", "Water", "Bottle", "500ml", "Eco",
+]
+REPEAT_WINDOW = 2000
+TRACKING = ["sp_atk=9f2a61c3-1b7e-4a55-8d0c-2f6c0b0d1e77&xptdk=9f2a61c3", "from=ads", "publish_id=&sp_atk=abc", ""]
+
+
+def make_url(rng: random.Random) -> str:
+    domain = rng.choice(DOMAINS)
+    shop, item = rng.randrange(10**7, 10**9), rng.randrange(10**9, 10**11)
+    kind = rng.random()
+    if kind < 0.70:
+        slug = "-".join(rng.sample(SLUG_WORDS, rng.randint(4, 10)))
+        query = rng.choice(TRACKING)
+        return f"https://{domain}/{slug}-i.{shop}.{item}" + (f"?{query}" if query else "")
+    if kind < 0.90:
+        return f"https://{domain}/product/{shop}/{item}?smtt=0.{rng.randrange(10**6)}"
+    if kind < 0.97:
+        return f"https://{domain}/search?keyword={rng.choice(SLUG_WORDS).lower()}"
+    return f"https://www.example.com/{rng.choice(SLUG_WORDS)}-i.{shop}.{item}"
+
+
+legacy_logger = logging.getLogger('bench_url_parser.previous')
+
+
+def legacy_parse_shopee_url(url: str) -> dict | None:
+    """The previous parser, logging as it did."""
+    try:
+        source_site = url.split('//')[1].split('/')[0]
+        if 'shopee' not in source_site:
+            legacy_logger.warning(f"URL does not contain a valid Shopee domain: {url}")
+            return None
+        match = re.search(r"i\.(\d+)\.(\d+)", url)
+        if match:
+            listing_id = f"{match.group(1)}_{match.group(2)}"
+            legacy_logger.debug("Parsed Shopee URL: source_site=%s, listing_id=%s", source_site, listing_id)
+            return {"source_site": source_site, "listing_id": listing_id}
+        legacy_logger.warning(f"No valid Shopee ID pattern found in URL: {url}")
+        return None
+    except Exception as e:
+        legacy_logger.error(f"Error parsing Shopee URL: {e}")
+        return None
+
+
+def timed(function, urls: list) -> tuple[float, int]:
+    started = time.perf_counter()
+    parsed = sum(1 for url in urls if function(url) is not None)
+    return time.perf_counter() - started, parsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="URL parser micro-benchmark.")
+    parser.add_argument('--urls', type=int, default=1_000_000)
+    parser.add_argument('--repeat-rate', type=float, default=0.3,
+                        help='share of the repeated-stream URLs that were seen before (default 0.3)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from scripts.url_parser import URL_PARSE_CACHE_SIZE, _parse, parse_shopee_url
+
+    rng = random.Random(args.seed)
+    urls = [make_url(rng) for _ in range(args.urls)]
+    # Repeats come from the last REPEAT_WINDOW URLs, as listings recur in a session or batch
+    repeated = []
+    for index, url in enumerate(urls):
+        recent = repeated[max(0, index - REPEAT_WINDOW):index]
+        repeated.append(rng.choice(recent) if recent and rng.random() < args.repeat_rate else url)
+
+    legacy_logger.disabled = True
+    mismatches = sum(
+        1 for url in urls[:100_000]
+        if legacy_parse_shopee_url(url) is not None and legacy_parse_shopee_url(url) != parse_shopee_url(url)
+    )
+    legacy_logger.disabled = False
+
+    # As the previous parser ran in the API (LOG_LEVEL INFO), without the terminal
+    devnull = open(os.devnull, 'w')
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    legacy_logger.addHandler(handler)
+    legacy_logger.setLevel(logging.INFO)
+    legacy_logger.propagate = False
+    logged_seconds, legacy_parsed = timed(legacy_parse_shopee_url, urls)
+    legacy_logger.disabled = True
+    legacy_seconds, _ = timed(legacy_parse_shopee_url, urls)
+    devnull.close()
+    _parse.cache_clear()
+    cold_seconds, cold_parsed = timed(parse_shopee_url, urls)
+    _parse.cache_clear()
+    repeated_seconds, _ = timed(parse_shopee_url, repeated)
+    cache = _parse.cache_info()
+
+    def line(label, seconds, parsed=None):
+        print(f"  {label:44} {seconds:6.2f} s  {args.urls / seconds:12,.0f} URLs/s  {seconds / args.urls * 1e9:6.0f} ns/URL"
+              + (f"  {parsed:,} parsed" if parsed is not None else ""))
+
+    print(f"{args.urls:,} URLs, memo cache of {URL_PARSE_CACHE_SIZE:,}")
+    line("previous parser, logging at INFO", logged_seconds, legacy_parsed)
+    line("previous parser, logging off", legacy_seconds, legacy_parsed)
+    line("parse_shopee_url, cold cache", cold_seconds, cold_parsed)
+    line(f"parse_shopee_url, {args.repeat_rate:.0%} repeats", repeated_seconds)
+    print(f"  cache hit rate on the repeated stream: {cache.hits / max(1, cache.hits + cache.misses):.1%}")
+    print(f"  disagreements with the previous parser (first 100,000 URLs): {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
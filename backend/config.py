@@ -8,3 +8,136 @@ MONGO_SCORES_COLLECTION="INSERT_YOUR_MONGO_SCORES_COLLECTION_NAME"
 
 # LLM Configuration for Groq API
 GOOGLE_API_KEY = "INSERT_YOUR_GOOGLE_API"
+
+# Request coalescing: concurrent cache misses on the same listing share one
+# LLM analysis. Lease documents in this collection coordinate gunicorn workers.
+MONGO_LEASES_COLLECTION="product_leases"
+ANALYSIS_LEASE_TTL_SECONDS = 90
+ANALYSIS_LEASE_POLL_SECONDS = 0.5
+
+# In-process hot cache in front of MongoDB (per worker). Sizes are entry counts.
+HOT_CACHE_MAX_PRODUCTS = 10000
+HOT_CACHE_PRODUCT_TTL_SECONDS = 300
+HOT_CACHE_MAX_CATEGORIES = 1000
+HOT_CACHE_RECOMMENDATION_TTL_SECONDS = 60
+
+# Asynchronous analysis tasks (POST /tasks + GET /watch/<task_id>)
+MONGO_TASKS_COLLECTION="tasks"
+TASK_WORKER_COUNT = 4
+TASK_POLL_INTERVAL_SECONDS = 1.0
+TASK_STALE_AFTER_SECONDS = 300
+
+# Sampled debug capture of extension requests (replaces entry.txt). Records are
+# written off the request thread as gzip-compressed NDJSON segments in
+# CAPTURE_DIR (relative to backend/). Server exceptions are always captured.
+CAPTURE_SAMPLE_RATE = 0.01
+CAPTURE_DIR = "captures"
+CAPTURE_MAX_SEGMENT_BYTES = 8 * 1024 * 1024
+CAPTURE_MAX_SEGMENTS = 20
+CAPTURE_MAX_BODY_CHARS = 200000
+
+# Largest /extract_and_rate and /batch_rate bodies accepted, as sent and
+# after gzip decompression (bytes)
+REQUEST_MAX_BODY_BYTES = 2 * 1024 * 1024
+BATCH_MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# Parsed product URLs memoized per process (scripts/url_parser.py)
+URL_PARSE_CACHE_SIZE = 16384
+
+# Logging: level and output format ("text" or "json", one event per line).
+# Can be overridden with the LOG_LEVEL / LOG_FORMAT environment variables.
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "text"
+
+# POST /batch_rate: maximum items per request, and how many LLM analyses batch
+# requests may run at once in each worker process.
+BATCH_MAX_ITEMS = 60
+BATCH_LLM_CONCURRENCY = 4
+
+# Near-duplicate reuse: on a cache miss, reuse the analysis of a stored product
+# whose brand/name/spec text has an estimated Jaccard similarity of at least
+# NEAR_DUP_THRESHOLD (MinHash with NEAR_DUP_NUM_PERM permutations, split into
+# NEAR_DUP_BANDS LSH bands). Each worker picks up other workers' new products
+# every NEAR_DUP_REFRESH_SECONDS.
+NEAR_DUP_ENABLED = True
+NEAR_DUP_THRESHOLD = 0.9
+NEAR_DUP_NUM_PERM = 128
+NEAR_DUP_BANDS = 16
+NEAR_DUP_REFRESH_SECONDS = 60
+
+# Materialized per-category top lists used for recommendations
+MONGO_CATEGORY_TOP_COLLECTION = "category_top_products"
+CATEGORY_TOP_K = 10
+
+# Category canonicalization (scripts/categories.py): the minimum difflib ratio
+# for a fuzzy match against the taxonomy, and extra aliases merged into its
+# alias table, e.g. {"kicks": "Sneakers"}.
+CATEGORY_FUZZY_CUTOFF = 0.85
+CATEGORY_EXTRA_ALIASES = {}
+
+# Run explain() on the hot queries at startup and log CRITICAL on any COLLSCAN
+# (same check as `python -m scripts.indexes --check`).
+INDEX_CHECK_ON_STARTUP = False
+
+# MongoDB connection pool (one shared client per process, created on first use).
+# Timeouts are in milliseconds; MONGO_READ_PREFERENCE is a pymongo mode name
+# ("primary", "primaryPreferred", "secondaryPreferred", "nearest", ...).
+MONGO_MAX_POOL_SIZE = 50
+MONGO_MIN_POOL_SIZE = 0
+MONGO_MAX_IDLE_TIME_MS = 300000
+MONGO_CONNECT_TIMEOUT_MS = 5000
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+MONGO_SOCKET_TIMEOUT_MS = 30000
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 5000
+MONGO_READ_PREFERENCE = "primary"
+# TLS (with certifi's CA bundle) is always on for mongodb+srv:// URIs; set this
+# to force it for plain mongodb:// URIs too. Otherwise the URI's own tls option
+# decides, so a local mongod works without TLS.
+MONGO_TLS = False
+
+# Analyzer backend: "gemini" (the real model) or "local", a deterministic
+# offline stand-in for load tests and benchmarks. Can be overridden with the
+# ANALYZER_PROVIDER environment variable. The local provider waits
+# LOCAL_ANALYZER_LATENCY_MS +/- LOCAL_ANALYZER_JITTER_MS per call and fails a
+# LOCAL_ANALYZER_ERROR_RATE fraction of calls (seeded, so runs are repeatable).
+ANALYZER_PROVIDER = "gemini"
+LOCAL_ANALYZER_LATENCY_MS = 800
+LOCAL_ANALYZER_JITTER_MS = 200
+LOCAL_ANALYZER_ERROR_RATE = 0.0
+LOCAL_ANALYZER_SEED = 0
+
+# Prompt compaction: strip review/shipping/size-chart boilerplate and repeated
+# lines from the page text before the LLM sees it, and cap the description at
+# PROMPT_DESCRIPTION_TOKEN_BUDGET (estimated) tokens.
+PROMPT_COMPACTION_ENABLED = True
+PROMPT_DESCRIPTION_TOKEN_BUDGET = 400
+
+# Multi-product LLM calls for batch work (POST /batch_rate, backfills): up to
+# ANALYZER_BATCH_SIZE cache misses share one call (1 disables this). A batch is
+# sent when full or when its oldest product has waited ANALYZER_BATCH_WAIT_MS.
+# With the local analyzer, each extra product in a call adds
+# LOCAL_ANALYZER_BATCH_ITEM_MS.
+ANALYZER_BATCH_SIZE = 5
+ANALYZER_BATCH_WAIT_MS = 50
+LOCAL_ANALYZER_BATCH_ITEM_MS = 150
+
+# LLM scheduler: every provider call waits for the per-minute request and token
+# quotas (token buckets holding LLM_BURST_SECONDS of quota; set the rates a
+# little below the project's real limits). Throttled or failed calls (429,
+# 5xx, timeouts) are retried up to LLM_MAX_ATTEMPTS times with jittered
+# exponential backoff. After LLM_BREAKER_FAILURE_THRESHOLD consecutive failures
+# calls fail fast for LLM_BREAKER_COOLDOWN_SECONDS. Interactive requests go
+# ahead of background work (backfills) and give up after
+# LLM_INTERACTIVE_MAX_WAIT_SECONDS of waiting for quota.
+LLM_REQUESTS_PER_MINUTE = 900
+LLM_TOKENS_PER_MINUTE = 900000
+LLM_BURST_SECONDS = 10
+LLM_OUTPUT_TOKENS_PER_PRODUCT = 600
+LLM_MAX_ATTEMPTS = 4
+LLM_BACKOFF_BASE_SECONDS = 1.0
+LLM_BACKOFF_MAX_SECONDS = 30.0
+LLM_BREAKER_FAILURE_THRESHOLD = 5
+LLM_BREAKER_COOLDOWN_SECONDS = 30
+LLM_INTERACTIVE_MAX_WAIT_SECONDS = 20
+# Simulated per-minute request quota of the local analyzer (0 = unlimited)
+LOCAL_ANALYZER_REQUESTS_PER_MINUTE = 0
@@ -1,11 +1,26 @@
 # scripts/analyzer.py (With Dynamic Category Extraction)
 
-import json
-import google.generativeai as genai
-from google.generativeai.types import Tool, FunctionDeclaration
+# The Gemini SDK (google.generativeai) takes a few hundred milliseconds to
+# import, so it is loaded on the first analysis, not at import time: a worker
+# that only serves stored products never pays for it. Configuration problems
+# raise AnalyzerUnavailableError from that first call instead of exiting.
+import asyncio
 import sys
 import os
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from scripts.llm_scheduler import (
+    LANE_BACKGROUND,
+    LANE_INTERACTIVE,
+    LLMSchedulerError,
+    estimate_call_tokens,
+    llm_scheduler,
+)
+from scripts.logging_utils import LazyJson, log_event
+from scripts.prompt_compaction import PROMPT_COMPACTION_ENABLED, compact_product_text, compaction_stats
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO)
@@ -19,21 +34,34 @@ try:
     from config import GOOGLE_API_KEY
     logger.info("Successfully imported config variables.")
 except ImportError:
-    logger.critical("CRITICAL: Could not import GOOGLE_API_KEY from config.py.")
-    sys.exit(1)
+    logger.error("Could not import GOOGLE_API_KEY from config.py; analyses will fail until it is set.")
+    GOOGLE_API_KEY = None
+
+try:
+    from config import ANALYZER_PROVIDER
+except ImportError:
+    ANALYZER_PROVIDER = "gemini"
 
-# --- Configure Google AI Client ---
 try:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    logger.info("Google AI client configured.")
-except Exception as e:
-    logger.critical(f"CRITICAL: Failed to configure Google AI. Error: {e}")
-    sys.exit(1)
+    from config import ANALYZER_BATCH_SIZE, ANALYZER_BATCH_WAIT_MS, BATCH_LLM_CONCURRENCY
+except ImportError:
+    ANALYZER_BATCH_SIZE = 5
+    ANALYZER_BATCH_WAIT_MS = 50
+    BATCH_LLM_CONCURRENCY = 4
+
+MODEL_NAME = 'gemini-2.5-flash-preview-05-20'
+
+
+class AnalyzerUnavailableError(RuntimeError):
+    """The LLM backend could not be loaded or configured."""
+
 
 # --- Define the Tools ---
 
+# Plain function declarations; they are turned into SDK objects in get_model().
+
 # Tool 1: Google Search (for information gathering)
-google_search_tool = FunctionDeclaration(
+GOOGLE_SEARCH_DECLARATION = dict(
     name="google_search",
     description="Performs a Google search to find public information about a company's sustainability practices or product materials.",
     parameters={
@@ -44,7 +72,7 @@ google_search_tool = FunctionDeclaration(
 )
 
 # Tool 2: The Final Answer Formatter (for structured output)
-analysis_submission_tool = FunctionDeclaration(
+ANALYSIS_SUBMISSION_DECLARATION = dict(
     name="submit_sustainability_analysis",
     description="Submits the complete, final sustainability analysis once all information has been gathered and synthesized.",
     parameters={
@@ -88,19 +116,78 @@ analysis_submission_tool = FunctionDeclaration(
     }
 )
 
-model = genai.GenerativeModel(
-    model_name='gemini-2.5-flash-preview-05-20', 
-    tools=[google_search_tool, analysis_submission_tool]
+# Tool 3: Several products in one call (see get_full_product_analyses). Each
+# entry is a full single-product analysis plus the `item_id` it answers.
+_BATCH_ITEM_SCHEMA = {
+    **ANALYSIS_SUBMISSION_DECLARATION['parameters'],
+    "properties": {
+        "item_id": {"type": "string", "description": "The item_id of the product this analysis is for, exactly as given."},
+        **ANALYSIS_SUBMISSION_DECLARATION['parameters']['properties'],
+    },
+    "required": ["item_id", *ANALYSIS_SUBMISSION_DECLARATION['parameters']['required']],
+}
+BATCH_SUBMISSION_DECLARATION = dict(
+    name="submit_sustainability_analyses",
+    description="Submits the final sustainability analyses of several products at once, one entry per product.",
+    parameters={
+        "type": "object",
+        "properties": {"analyses": {"type": "array", "items": _BATCH_ITEM_SCHEMA}},
+        "required": ["analyses"]
+    }
 )
 
 
-def get_full_product_analysis(raw_text: str) -> dict | None:
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
     """
-    Analyzes raw text using Gemini with Google Search and forces a structured
-    output via function calling.
+    The Gemini model, created on first use. Imports and configures the SDK
+    the first time it is called.
+
+    Raises:
+        AnalyzerUnavailableError: if the SDK is missing or cannot be configured.
     """
+    global _model
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is not None:
+            return _model
+        if not GOOGLE_API_KEY:
+            raise AnalyzerUnavailableError("GOOGLE_API_KEY is not set in config.py.")
+        started = time.perf_counter()
+        try:
+            import google.generativeai as genai
+            from google.generativeai.types import FunctionDeclaration
+        except ImportError as e:
+            raise AnalyzerUnavailableError(f"google.generativeai is not installed: {e}") from e
+
+        # --- Configure Google AI Client ---
+        try:
+            genai.configure(api_key=GOOGLE_API_KEY)
+            _model = genai.GenerativeModel(
+                model_name=MODEL_NAME,
+                tools=[
+                    FunctionDeclaration(**GOOGLE_SEARCH_DECLARATION),
+                    FunctionDeclaration(**ANALYSIS_SUBMISSION_DECLARATION),
+                    FunctionDeclaration(**BATCH_SUBMISSION_DECLARATION),
+                ],
+            )
+        except Exception as e:
+            raise AnalyzerUnavailableError(f"Failed to configure Google AI: {e}") from e
+        logger.info(f"Google AI client configured in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        return _model
+
+
+# We force the model to call our submission tool, which guarantees a structured output
+SUBMISSION_TOOL_CONFIG = {'function_calling_config': {'mode': 'any', 'allowed_function_names': ['submit_sustainability_analysis']}}
+
+
+def build_analysis_prompt(raw_text: str) -> str:
     # The prompt now focuses on telling the model its goal: call the submission function.
-    prompt = f"""
+    return f"""
     Your task is to analyze the following product information.
     First, use the provided text.
     Then, use your `google_search` tool to find any missing information, especially about the brand's reputation, labor practices, and specific material details.
@@ -110,46 +197,513 @@ def get_full_product_analysis(raw_text: str) -> dict | None:
     ---
     """
 
-    try:
-        # We force the model to call our submission tool, which guarantees a structured output
-        response = model.generate_content(
-            prompt,
-            tool_config={'function_calling_config': {'mode': 'any', 'allowed_function_names': ['submit_sustainability_analysis']}}
+
+BATCH_SUBMISSION_TOOL_CONFIG = {'function_calling_config': {'mode': 'any', 'allowed_function_names': ['submit_sustainability_analyses']}}
+
+
+def build_batch_analysis_prompt(raw_texts: list[str]) -> str:
+    products = "\n".join(
+        f"=== PRODUCT item_id={item_id} ===\n{raw_text}\n" for item_id, raw_text in enumerate(raw_texts)
+    )
+    return f"""
+    Your task is to analyze each of the following {len(raw_texts)} products independently.
+    Use only the text given for a product when analyzing it; do not mix information between products.
+    You MUST call the `submit_sustainability_analyses` function once, with exactly one entry per product, each carrying that product's `item_id` exactly as given.
+    Here are the product text dumps:
+    ---
+    {products}
+    ---
+    """
+
+
+def convert_to_dict(obj):
+    """Recursively converts MapComposite objects to regular dicts and lists."""
+    if hasattr(obj, '__iter__') and hasattr(obj, 'keys'):
+        # This is a MapComposite or similar dict-like object
+        return {key: convert_to_dict(value) for key, value in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        # This is a list or tuple
+        return [convert_to_dict(item) for item in obj]
+    else:
+        # This is a primitive value
+        return obj
+
+
+def parse_analysis_response(response) -> dict:
+    """Extracts the `submit_sustainability_analysis` arguments from a Gemini response."""
+    # The result is not in response.text, but in the function_calls part of the response
+    function_call = response.candidates[0].content.parts[0].function_call
+    
+    if function_call.name != "submit_sustainability_analysis":
+        raise ValueError("LLM did not call the expected submission function.")
+
+    # The arguments of the function call are our structured data!
+    analysis_args = function_call.args
+    
+    # Convert the arguments (which are in a special format) to a standard Python dictionary
+    final_json = {
+        "product_name": convert_to_dict(analysis_args.get("product_name")),
+        "brand": convert_to_dict(analysis_args.get("brand")),
+        "category": convert_to_dict(analysis_args.get("category")),
+        "sustainability_analysis": convert_to_dict(analysis_args.get("sustainability_analysis")),
+    }
+    logger.debug("LLM final_json output: %s", LazyJson(final_json))
+    return final_json
+
+
+def _valid_analysis(entry) -> bool:
+    return isinstance(entry, dict) and isinstance(entry.get("sustainability_analysis"), dict)
+
+
+def parse_batch_analysis_response(response, count: int) -> list[dict | None]:
+    """
+    Demultiplexes a `submit_sustainability_analyses` response by `item_id`.
+    Entries that are missing, malformed or duplicated come back as None.
+    """
+    results = [None] * count
+    for part in response.candidates[0].content.parts:
+        function_call = getattr(part, 'function_call', None)
+        if not function_call or function_call.name != "submit_sustainability_analyses":
+            continue
+        for entry in convert_to_dict(function_call.args.get("analyses")) or []:
+            if not _valid_analysis(entry):
+                continue
+            try:
+                item_id = int(str(entry.get("item_id")).strip())
+            except ValueError:
+                continue
+            if 0 <= item_id < count and results[item_id] is None:
+                results[item_id] = {
+                    "product_name": entry.get("product_name"),
+                    "brand": entry.get("brand"),
+                    "category": entry.get("category"),
+                    "sustainability_analysis": entry.get("sustainability_analysis"),
+                }
+    logger.debug("LLM batch output: %s", LazyJson(results))
+    return results
+
+
+# ==============================================================================
+# Analyzer providers
+#
+# A provider turns the extension's page dump into the arguments of
+# `submit_sustainability_analysis` (product_name, brand, category,
+# sustainability_analysis) and raises on failure. `analyze_many` answers
+# several products in one call, with None for any it could not answer.
+# ANALYZER_PROVIDER in config.py (or the environment) selects it: "gemini"
+# for the real model, "local" for the deterministic offline stand-in in
+# local_analyzer.py.
+# ==============================================================================
+
+class AnalyzerProvider:
+    """Base class for analyzer backends."""
+
+    name = 'base'
+
+    def analyze(self, raw_text: str) -> dict:
+        raise NotImplementedError
+
+    async def analyze_async(self, raw_text: str) -> dict:
+        # Providers without a native async client run in a worker thread
+        return await asyncio.to_thread(self.analyze, raw_text)
+
+    def analyze_many(self, raw_texts: list[str]) -> list[dict | None]:
+        # Providers without a multi-product call answer one product at a time
+        return [self.analyze(raw_text) for raw_text in raw_texts]
+
+    async def analyze_many_async(self, raw_texts: list[str]) -> list[dict | None]:
+        return await asyncio.to_thread(self.analyze_many, raw_texts)
+
+
+class GeminiProvider(AnalyzerProvider):
+    """Gemini with Google Search, forced to answer through the submission function."""
+
+    name = 'gemini'
+
+    def analyze(self, raw_text: str) -> dict:
+        response = get_model().generate_content(
+            build_analysis_prompt(raw_text),
+            tool_config=SUBMISSION_TOOL_CONFIG
         )
-        
-        # The result is not in response.text, but in the function_calls part of the response
-        function_call = response.candidates[0].content.parts[0].function_call
-        
-        if function_call.name == "submit_sustainability_analysis":
-            # The arguments of the function call are our structured data!
-            analysis_args = function_call.args
-            
-            # Helper function to recursively convert MapComposite objects to regular dicts
-            def convert_to_dict(obj):
-                if hasattr(obj, '__iter__') and hasattr(obj, 'keys'):
-                    # This is a MapComposite or similar dict-like object
-                    return {key: convert_to_dict(value) for key, value in obj.items()}
-                elif isinstance(obj, (list, tuple)):
-                    # This is a list or tuple
-                    return [convert_to_dict(item) for item in obj]
-                else:
-                    # This is a primitive value
-                    return obj
-            
-            # Convert the arguments (which are in a special format) to a standard Python dictionary
-            final_json = {
-                "product_name": convert_to_dict(analysis_args.get("product_name")),
-                "brand": convert_to_dict(analysis_args.get("brand")),
-                "category": convert_to_dict(analysis_args.get("category")),
-                "sustainability_analysis": convert_to_dict(analysis_args.get("sustainability_analysis")),
-            }
-            logger.info(f"LLM final_json output: {json.dumps(final_json, indent=2)}")
-            return final_json
-        else:
-            raise ValueError("LLM did not call the expected submission function.")
+        return parse_analysis_response(response)
+
+    async def analyze_async(self, raw_text: str) -> dict:
+        # The SDK's `generate_content_async`, so a pending call does not hold a thread
+        response = await get_model().generate_content_async(
+            build_analysis_prompt(raw_text),
+            tool_config=SUBMISSION_TOOL_CONFIG
+        )
+        return parse_analysis_response(response)
+
+    def analyze_many(self, raw_texts: list[str]) -> list[dict | None]:
+        response = get_model().generate_content(
+            build_batch_analysis_prompt(raw_texts),
+            tool_config=BATCH_SUBMISSION_TOOL_CONFIG
+        )
+        return parse_batch_analysis_response(response, len(raw_texts))
+
+    async def analyze_many_async(self, raw_texts: list[str]) -> list[dict | None]:
+        response = await get_model().generate_content_async(
+            build_batch_analysis_prompt(raw_texts),
+            tool_config=BATCH_SUBMISSION_TOOL_CONFIG
+        )
+        return parse_batch_analysis_response(response, len(raw_texts))
+
+
+def _create_provider(name: str) -> AnalyzerProvider:
+    if name == 'gemini':
+        return GeminiProvider()
+    if name == 'local':
+        from scripts.local_analyzer import LocalAnalyzerProvider
+        return LocalAnalyzerProvider()
+    raise AnalyzerUnavailableError(f"Unknown ANALYZER_PROVIDER '{name}' (expected 'gemini' or 'local').")
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_analyzer_provider() -> AnalyzerProvider:
+    """The configured provider, created on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                name = (os.environ.get('ANALYZER_PROVIDER') or ANALYZER_PROVIDER).strip().lower()
+                _provider = _create_provider(name)
+                logger.info(f"Analyzer provider: {_provider.name}")
+    return _provider
+
+
+def set_analyzer_provider(provider: AnalyzerProvider | None) -> None:
+    """Replaces the provider for this process (None: back to the configured one)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
+
+
+def prepare_analysis_text(raw_text: str) -> str:
+    """
+    The text actually sent to the provider: the page dump with boilerplate
+    and overlong descriptions removed (see prompt_compaction.py). Logs the
+    estimated tokens saved for this request.
+    """
+    if not PROMPT_COMPACTION_ENABLED:
+        return raw_text
+    compacted, stats = compact_product_text(raw_text)
+    compaction_stats.record(stats)
+    log_event(logger, logging.INFO, "prompt_compacted", **stats)
+    return compacted
+
+
+def _analysis_error(provider_name: str, error: Exception) -> dict:
+    # Scheduler refusals (open breaker, quota wait) are expected under load; no traceback
+    logger.error(f"An error occurred during {provider_name} analysis: {error}",
+                 exc_info=not isinstance(error, LLMSchedulerError))
+    return {
+        "error": "LLM analysis failed.",            "details": str(error)
+    }
+
+
+def is_analysis_error(analysis: dict | None) -> bool:
+    """Whether an analyzer result is missing or an error dict; such results must not be stored."""
+    return not analysis or 'error' in analysis
+
+
+def get_full_product_analysis(raw_text: str, lane: str = LANE_INTERACTIVE) -> dict | None:
+    """
+    Analyzes raw text with the configured provider (Gemini with Google Search
+    by default) and returns the structured `submit_sustainability_analysis`
+    arguments. The text is compacted first (`prepare_analysis_text`), and the
+    call runs in `lane` of the LLM scheduler (quotas, retries, circuit
+    breaker). Returns an error dict if the analysis failed.
+    """
+    provider_name = ANALYZER_PROVIDER
+    try:
+        provider = get_analyzer_provider()
+        provider_name = provider.name
+        text = prepare_analysis_text(raw_text)
+        return llm_scheduler.run(lambda: provider.analyze(text), lane, estimate_call_tokens([text]))
 
     except Exception as e:
-        logger.error(f"An error occurred during Google Gemini API analysis: {e}", exc_info=True)
-        return {
-            "error": "LLM analysis failed.",            "details": str(e)
-        }
\ No newline at end of file
+        return _analysis_error(provider_name, e)
+
+
+async def get_full_product_analysis_async(raw_text: str, lane: str = LANE_INTERACTIVE) -> dict | None:
+    """
+    Async variant of `get_full_product_analysis` for the ASGI server. With
+    Gemini it uses the SDK's `generate_content_async`, so a pending call does
+    not hold a thread.
+    """
+    provider_name = ANALYZER_PROVIDER
+    try:
+        provider = get_analyzer_provider()
+        provider_name = provider.name
+        text = prepare_analysis_text(raw_text)
+        return await llm_scheduler.run_async(lambda: provider.analyze_async(text), lane, estimate_call_tokens([text]))
+
+    except Exception as e:
+        return _analysis_error(provider_name, e)
+
+
+# ==============================================================================
+# Multi-product calls
+#
+# Under a backlog of misses (POST /batch_rate, backfills) one call per
+# product pays the per-call overhead and rate-limit budget every time.
+# `get_full_product_analyses` packs up to ANALYZER_BATCH_SIZE products into
+# one `submit_sustainability_analyses` call, demultiplexes the answers by
+# item_id and falls back to a single call for any product the batch did not
+# answer. The batchers below let concurrent batch workers, each handling one
+# listing, share those calls.
+# ==============================================================================
+
+def _analyze_single(provider: AnalyzerProvider, text: str, lane: str) -> dict:
+    try:
+        return llm_scheduler.run(lambda: provider.analyze(text), lane, estimate_call_tokens([text]))
+    except Exception as e:
+        return _analysis_error(provider.name, e)
+
+
+async def _analyze_single_async(provider: AnalyzerProvider, text: str, lane: str) -> dict:
+    try:
+        return await llm_scheduler.run_async(lambda: provider.analyze_async(text), lane, estimate_call_tokens([text]))
+    except Exception as e:
+        return _analysis_error(provider.name, e)
+
+
+def _unanswered(provider: AnalyzerProvider, texts: list[str], results) -> list[int]:
+    """The indices of a multi-product answer that need a single call; logs the outcome."""
+    if not isinstance(results, list) or len(results) != len(texts):
+        results = [None] * len(texts)
+    missing = [index for index, result in enumerate(results) if not _valid_analysis(result)]
+    log_event(
+        logger, logging.INFO, "llm_batch",
+        provider=provider.name, items=len(texts), answered=len(texts) - len(missing), fallbacks=len(missing),
+    )
+    return missing
+
+
+def _chunks(texts: list[str]):
+    size = max(1, ANALYZER_BATCH_SIZE)
+    for start in range(0, len(texts), size):
+        yield texts[start:start + size]
+
+
+def get_full_product_analyses(raw_texts: list[str], lane: str = LANE_INTERACTIVE) -> list[dict]:
+    """
+    Analyzes several products with as few provider calls as possible, in
+    `lane` of the LLM scheduler.
+
+    Returns:
+        One result per input, in order, each what `get_full_product_analysis`
+        would have returned for it (an analysis or an error dict).
+    """
+    try:
+        provider = get_analyzer_provider()
+    except Exception as e:
+        return [_analysis_error(ANALYZER_PROVIDER, e) for _ in raw_texts]
+
+    texts = [prepare_analysis_text(raw_text) for raw_text in raw_texts]
+    results = []
+    for chunk in _chunks(texts):
+        if len(chunk) == 1:
+            results.append(_analyze_single(provider, chunk[0], lane))
+            continue
+        try:
+            chunk_results = llm_scheduler.run(
+                lambda: provider.analyze_many(chunk), lane, estimate_call_tokens(chunk)
+            )
+        except Exception as e:
+            logger.warning(f"Multi-product {provider.name} call for {len(chunk)} products failed, "
+                           f"falling back to single calls: {e}")
+            chunk_results = None
+        missing = _unanswered(provider, chunk, chunk_results)
+        if not isinstance(chunk_results, list) or len(chunk_results) != len(chunk):
+            chunk_results = [None] * len(chunk)
+        for index in missing:
+            chunk_results[index] = _analyze_single(provider, chunk[index], lane)
+        results.extend(chunk_results)
+    return results
+
+
+async def get_full_product_analyses_async(raw_texts: list[str], lane: str = LANE_INTERACTIVE) -> list[dict]:
+    """Async version of `get_full_product_analyses`; fallbacks run concurrently."""
+    try:
+        provider = get_analyzer_provider()
+    except Exception as e:
+        return [_analysis_error(ANALYZER_PROVIDER, e) for _ in raw_texts]
+
+    texts = [prepare_analysis_text(raw_text) for raw_text in raw_texts]
+    results = []
+    for chunk in _chunks(texts):
+        if len(chunk) == 1:
+            results.append(await _analyze_single_async(provider, chunk[0], lane))
+            continue
+        try:
+            chunk_results = await llm_scheduler.run_async(
+                lambda: provider.analyze_many_async(chunk), lane, estimate_call_tokens(chunk)
+            )
+        except Exception as e:
+            logger.warning(f"Multi-product {provider.name} call for {len(chunk)} products failed, "
+                           f"falling back to single calls: {e}")
+            chunk_results = None
+        missing = _unanswered(provider, chunk, chunk_results)
+        if not isinstance(chunk_results, list) or len(chunk_results) != len(chunk):
+            chunk_results = [None] * len(chunk)
+        fallbacks = await asyncio.gather(*(_analyze_single_async(provider, chunk[index], lane) for index in missing))
+        for index, result in zip(missing, fallbacks):
+            chunk_results[index] = result
+        results.extend(chunk_results)
+    return results
+
+
+class AnalysisBatcher:
+    """
+    Turns concurrent single-product `submit` calls from many threads into
+    multi-product calls.
+
+    A flusher thread takes up to `max_batch_size` queued products once the
+    batch is full or its oldest product has waited `max_wait_seconds`, and
+    runs `get_full_product_analyses` on them in a pool of `max_calls`
+    threads, in `lane` of the LLM scheduler. While all calls are busy,
+    products keep queueing, so batches grow with the backlog. Threads do not
+    survive fork(); a forked worker starts its own flusher on first use.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_seconds: float, max_calls: int,
+                 lane: str = LANE_INTERACTIVE):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self.max_calls = max(1, max_calls)
+        self.lane = lane
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pending = []
+        self._pid = None
+
+    def _start(self) -> None:
+        # Called with self._lock held
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.max_calls)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_calls, thread_name_prefix='llm-batch')
+        threading.Thread(target=self._run_flusher, name='llm-batch-flusher', daemon=True).start()
+
+    def submit(self, raw_text: str) -> dict:
+        """Analyzes one product as part of a batch; blocks until its result is ready."""
+        future = Future()
+        with self._cond:
+            if self._pid != os.getpid():
+                self._start()
+            self._pending.append((raw_text, future, time.monotonic()))
+            self._cond.notify()
+        return future.result()
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_wait_seconds
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run_flusher(self) -> None:
+        while True:
+            batch = self._next_batch()
+            self._slots.acquire()
+            self._executor.submit(self._call, batch)
+
+    def _call(self, batch: list) -> None:
+        try:
+            results = get_full_product_analyses([raw_text for raw_text, _, _ in batch], self.lane)
+        except Exception as e:
+            results = [_analysis_error(ANALYZER_PROVIDER, e) for _ in batch]
+        finally:
+            self._slots.release()
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+
+class AsyncAnalysisBatcher:
+    """asyncio version of `AnalysisBatcher`, bound to the running event loop."""
+
+    def __init__(self, max_batch_size: int, max_wait_seconds: float, max_calls: int,
+                 lane: str = LANE_INTERACTIVE):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        self.max_calls = max(1, max_calls)
+        self.lane = lane
+        self._loop = None
+
+    def _ensure_started(self, loop) -> None:
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._pending = []
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_calls)
+        self._calls = set()
+        self._flusher = loop.create_task(self._run_flusher())
+
+    async def submit(self, raw_text: str) -> dict:
+        loop = asyncio.get_running_loop()
+        self._ensure_started(loop)
+        future = loop.create_future()
+        self._pending.append((raw_text, future, loop.time()))
+        self._wakeup.set()
+        return await future
+
+    async def _next_batch(self) -> list:
+        while not self._pending:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        deadline = self._pending[0][2] + self.max_wait_seconds
+        while len(self._pending) < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        batch = self._pending[:self.max_batch_size]
+        del self._pending[:self.max_batch_size]
+        return batch
+
+    async def _run_flusher(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            await self._slots.acquire()
+            call = asyncio.ensure_future(self._call(batch))
+            self._calls.add(call)
+            call.add_done_callback(self._calls.discard)
+
+    async def _call(self, batch: list) -> None:
+        try:
+            results = await get_full_product_analyses_async([raw_text for raw_text, _, _ in batch], self.lane)
+        except Exception as e:
+            results = [_analysis_error(ANALYZER_PROVIDER, e) for _ in batch]
+        finally:
+            self._slots.release()
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+analysis_batcher = AnalysisBatcher(ANALYZER_BATCH_SIZE, ANALYZER_BATCH_WAIT_MS / 1000, BATCH_LLM_CONCURRENCY)
+background_analysis_batcher = AnalysisBatcher(
+    ANALYZER_BATCH_SIZE, ANALYZER_BATCH_WAIT_MS / 1000, BATCH_LLM_CONCURRENCY, lane=LANE_BACKGROUND
+)
+async_analysis_batcher = AsyncAnalysisBatcher(ANALYZER_BATCH_SIZE, ANALYZER_BATCH_WAIT_MS / 1000, BATCH_LLM_CONCURRENCY)
@@ -0,0 +1,69 @@
+# async_db.py
+# Motor (asyncio) access to the same MongoDB collections as db.py, for the
+# ASGI server. The client is created lazily on first use, inside the running
+# event loop of the serving process, with the same pool settings as the
+# pymongo client (scripts/mongo_pool.py).
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ConfigurationError
+import logging
+
+# --- Logging Setup ---
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('async_db')
+
+from scripts import db
+from scripts.mongo_pool import client_options
+
+_client = None
+_configuration_error = None
+
+
+def get_async_database():
+    """
+    Returns the motor database handle, or None if MongoDB is not configured
+    (as `db.get_mongo_client` decides: missing settings, the config.py
+    placeholders or a URI the driver rejects).
+    """
+    global _client, _configuration_error
+
+    if not db.is_configured():
+        return None
+
+    if _client is None:
+        try:
+            _client = AsyncIOMotorClient(db.MONGO_URI, **client_options(db.MONGO_URI))
+        except ConfigurationError as e:
+            # Run without MongoDB, like the sync path
+            if _configuration_error is None:
+                logger.error(f"Invalid MongoDB configuration: {e}")
+            _configuration_error = str(e)
+            return None
+        logger.info("AsyncIOMotorClient created.")
+    return _client[db.MONGO_DB]
+
+
+async def ensure_async_indexes() -> None:
+    """
+    Creates the indexes of scripts/indexes.py (among them the unique listing
+    index the DuplicateKeyError handling relies on) for an ASGI deployment.
+    The specs are applied with pymongo, as in db.py, so this runs
+    `db.get_database` once in a thread at startup.
+    """
+    if db.is_configured():
+        await asyncio.to_thread(db.get_database)
+
+
+def get_async_products_collection():
+    database = get_async_database()
+    return database[db.MONGO_PRODUCTS_COLLECTION] if database is not None else None
+
+
+def get_async_leases_collection():
+    database = get_async_database()
+    return database[db.MONGO_LEASES_COLLECTION] if database is not None else None
+
+
+def get_async_category_top_collection():
+    database = get_async_database()
+    return database[db.MONGO_CATEGORY_TOP_COLLECTION] if database is not None else None
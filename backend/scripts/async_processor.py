@@ -0,0 +1,355 @@
+# ==============================================================================
+# asyncio version of shopee_processor.py, used by the ASGI server (asgi.py).
+#
+# The workflow is the same as `process_shopee_product`: URL parsing, the hot
+# cache, request coalescing, LLM analysis and scoring all reuse the same
+# helpers. Only the I/O is different: MongoDB goes through motor and Gemini
+# through `generate_content_async`, so one process can hold hundreds of
+# LLM-bound requests open without a thread for each.
+# ==============================================================================
+
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('async_processor')
+
+from scripts.async_db import (
+    get_async_products_collection,
+    get_async_leases_collection,
+    get_async_category_top_collection,
+)
+from scripts.url_parser import parse_shopee_url
+from scripts.analyzer import (
+    ANALYZER_BATCH_SIZE,
+    async_analysis_batcher,
+    get_full_product_analysis_async,
+)
+from scripts.singleflight import AsyncSingleFlight, AsyncMongoLease, wait_for_result_async
+from scripts.hot_cache import product_cache, recommendation_cache
+from scripts.category_top import get_category_top_async, add_to_category_top_async
+from scripts.categories import canonicalize_category
+from scripts.near_duplicates import NEAR_DUP_ENABLED, near_duplicate_index
+from scripts.scorer import Breakdown
+from scripts.shopee_processor import (
+    ANALYSIS_LEASE_TTL_SECONDS,
+    ANALYSIS_LEASE_POLL_SECONDS,
+    ANALYSIS_PROJECTION,
+    BATCH_ANALYSES_IN_FLIGHT,
+    PRODUCT_RESPONSE_PROJECTION,
+    analysis_from_product,
+    build_product_document,
+    checked_analysis,
+    compact_product,
+    content_keys,
+    exclude_current_listing,
+    finalize_product_response,
+    log_reuse,
+    near_duplicate_candidate,
+    publish_stored_product,
+)
+from scripts.logging_utils import log_event
+from pymongo.errors import DuplicateKeyError
+
+# Coalesces concurrent cache misses for the same listing on this event loop
+_inflight_analyses = AsyncSingleFlight()
+
+# Caps the listings that batch requests analyze at once on this event loop
+_batch_llm_slots = asyncio.Semaphore(BATCH_ANALYSES_IN_FLIGHT)
+
+
+async def get_recommendations_async(category: str, current_listing_id: str) -> list:
+    """Async version of `shopee_processor.get_recommendations`."""
+    category = canonicalize_category(category)
+    products_collection = get_async_products_collection()
+    if products_collection is None or category == "Unknown" or not current_listing_id:
+        return []
+
+    top_products = recommendation_cache.get(category)
+    if top_products is None:
+        try:
+            top_products = await get_category_top_async(
+                get_async_category_top_collection(), products_collection, category
+            )
+        except Exception as e:
+            logger.error(f"Error fetching recommendations: {e}", exc_info=True)
+            return []
+        recommendation_cache.put(category, top_products)
+
+    recommendations = exclude_current_listing(top_products, current_listing_id)
+    logger.debug("Found %d recommendations for category '%s'.", len(recommendations), category)
+    return recommendations
+
+
+async def _prepare_cached_response(product: dict) -> dict:
+    recommendations = await get_recommendations_async(
+        product.get('category', 'Unknown'),
+        product.get('listing_id', '')
+    )
+    return finalize_product_response(product, recommendations)
+
+
+async def _find_product(parsed_info: dict) -> dict | None:
+    cache_key = (parsed_info['source_site'], parsed_info['listing_id'])
+    product = product_cache.get(cache_key)
+    if product is not None:
+        return product
+
+    product = await get_async_products_collection().find_one({
+        "source_site": parsed_info['source_site'],
+        "listing_id": parsed_info['listing_id'],
+    }, PRODUCT_RESPONSE_PROJECTION)
+    if product:
+        product_cache.put(cache_key, compact_product(product))
+    return product
+
+
+async def get_stored_product_response_async(source_site: str, listing_id: str) -> dict | None:
+    """Async version of `shopee_processor.get_stored_product_response`."""
+    product = await _find_product({'source_site': source_site, 'listing_id': listing_id})
+    return await _prepare_cached_response(product) if product else None
+
+
+async def get_product_analysis_async(source_site: str, listing_id: str) -> dict | None:
+    """Async version of `shopee_processor.get_product_analysis`."""
+    product = await get_async_products_collection().find_one(
+        {"source_site": source_site, "listing_id": listing_id},
+        {"_id": 0, "sustainability_breakdown": 1},
+    )
+    if product is None:
+        return None
+    return Breakdown.from_document(product.get('sustainability_breakdown'), with_analysis=True).analysis_by_category()
+
+
+async def find_products_bulk_async(parsed_infos: list) -> dict:
+    """Async version of `shopee_processor.find_products_bulk`."""
+    found = {}
+    missing_by_site = {}
+    for parsed_info in parsed_infos:
+        cache_key = (parsed_info['source_site'], parsed_info['listing_id'])
+        if cache_key in found:
+            continue
+        product = product_cache.get(cache_key)
+        if product is not None:
+            found[cache_key] = product
+        else:
+            missing_by_site.setdefault(parsed_info['source_site'], set()).add(parsed_info['listing_id'])
+
+    if not missing_by_site:
+        return found
+
+    clauses = [
+        {"source_site": source_site, "listing_id": {"$in": sorted(listing_ids)}}
+        for source_site, listing_ids in missing_by_site.items()
+    ]
+    query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+    async for product in get_async_products_collection().find(query, PRODUCT_RESPONSE_PROJECTION):
+        cache_key = (product['source_site'], product['listing_id'])
+        product_cache.put(cache_key, compact_product(product))
+        found[cache_key] = product
+    return found
+
+
+async def load_near_duplicate_index() -> None:
+    """Loads (or tops up) the near-duplicate index from the stored `minhash` signatures."""
+    products_collection = get_async_products_collection()
+    if products_collection is None:
+        return
+    try:
+        cursor = products_collection.find(
+            near_duplicate_index.refresh_query(),
+            {"_id": 1, "source_site": 1, "listing_id": 1, "minhash": 1},
+        ).sort("_id", 1)
+        count = near_duplicate_index.ingest(await cursor.to_list(length=None))
+        if count:
+            logger.info(f"Near-duplicate index loaded {count} signature(s).")
+    except Exception as e:
+        logger.warning(f"Could not refresh the near-duplicate index: {e}")
+
+
+async def _find_analysis_by_content(content_hash: str | None) -> dict | None:
+    """Async version of `shopee_processor._find_analysis_by_content`."""
+    if not content_hash:
+        return None
+    donor = await get_async_products_collection().find_one({"content_hash": content_hash}, ANALYSIS_PROJECTION)
+    log_reuse("content_cache_hit", donor)
+    return donor
+
+
+async def _find_near_duplicate(signature: list | None, parsed_info: dict) -> dict | None:
+    """Async version of `shopee_processor._find_near_duplicate`."""
+    if NEAR_DUP_ENABLED and signature and near_duplicate_index.needs_refresh():
+        await load_near_duplicate_index()
+
+    match = near_duplicate_candidate(signature, parsed_info)
+    if not match:
+        return None
+    (source_site, listing_id), similarity = match
+    donor = await get_async_products_collection().find_one(
+        {"source_site": source_site, "listing_id": listing_id}, ANALYSIS_PROJECTION
+    )
+    log_reuse("near_duplicate_hit", donor, similarity=round(similarity, 3))
+    return donor
+
+
+async def _analyze_and_store(url: str, raw_text: str, parsed_info: dict, analyze=None) -> dict | None:
+    content_hash, signature = content_keys(raw_text)
+    donor = await _find_analysis_by_content(content_hash) or await _find_near_duplicate(signature, parsed_info)
+    if donor:
+        analysis_json = analysis_from_product(donor)
+    else:
+        log_event(logger, logging.INFO, "llm_analysis_started", listing_id=parsed_info['listing_id'], text_chars=len(raw_text))
+        analysis_json = checked_analysis(await (analyze or get_full_product_analysis_async)(raw_text))
+        if analysis_json is None:
+            return None
+
+    product_document = build_product_document(
+        url, parsed_info, analysis_json, content_hash, reused_from=donor, minhash=signature
+    )
+    try:
+        result = await get_async_products_collection().insert_one(product_document)
+    except DuplicateKeyError:
+        logger.warning("DUPLICATE KEY: Product already exists in database. Treating as cache hit.")
+        existing_doc = await _find_product(parsed_info)
+        return await _prepare_cached_response(existing_doc) if existing_doc else None
+    except Exception as e:
+        logger.error(f"FAILED: Could not insert document into MongoDB: {e}")
+        return None
+
+    log_event(
+        logger, logging.INFO, "product_stored",
+        listing_id=parsed_info['listing_id'],
+        category=product_document['category'],
+        score=product_document['default_sustainability_score'],
+        _id=result.inserted_id,
+    )
+    try:
+        await add_to_category_top_async(
+            get_async_category_top_collection(), get_async_products_collection(), product_document
+        )
+    except Exception as top_error:
+        logger.warning(f"Could not update the top list for '{product_document['category']}': {top_error}")
+    publish_stored_product(product_document)
+    return await _prepare_cached_response(product_document.copy())
+
+
+async def _analyze_with_lease(url: str, raw_text: str, parsed_info: dict, analyze=None) -> dict | None:
+    leases_collection = get_async_leases_collection()
+    lease = AsyncMongoLease(leases_collection, ttl_seconds=ANALYSIS_LEASE_TTL_SECONDS)
+    lease_key = f"{parsed_info['source_site']}:{parsed_info['listing_id']}"
+
+    token = await lease.acquire(lease_key)
+    if token is None:
+        logger.info(f"Another worker is analyzing {lease_key}. Waiting for its result...")
+        existing_doc = await wait_for_result_async(
+            lambda: _find_product(parsed_info),
+            lease,
+            lease_key,
+            timeout=ANALYSIS_LEASE_TTL_SECONDS,
+            poll_interval=ANALYSIS_LEASE_POLL_SECONDS,
+        )
+        if existing_doc:
+            return await _prepare_cached_response(existing_doc)
+        token = await lease.acquire(lease_key)
+
+    try:
+        return await _analyze_and_store(url, raw_text, parsed_info, analyze)
+    finally:
+        if token is not None:
+            await lease.release(lease_key, token)
+
+
+async def process_shopee_product_async(url: str, raw_text: str, user_weights: dict | None = None) -> dict | None:
+    """
+    Async version of `shopee_processor.process_shopee_product`, with the same
+    arguments and return value.
+    """
+    if get_async_products_collection() is None:
+        logger.error("CRITICAL: Database is not connected. Cannot process URL.")
+        return None
+
+    parsed_info = parse_shopee_url(url)
+    if not parsed_info:
+        logger.error(f"FAILED: Invalid or unparsable Shopee URL: {url}")
+        return None
+
+    existing_product = await _find_product(parsed_info)
+    if existing_product:
+        log_event(
+            logger, logging.INFO, "cache_hit",
+            source_site=parsed_info['source_site'],
+            listing_id=parsed_info['listing_id'],
+        )
+        return await _prepare_cached_response(existing_product)
+
+    log_event(
+        logger, logging.INFO, "cache_miss",
+        source_site=parsed_info['source_site'],
+        listing_id=parsed_info['listing_id'],
+    )
+
+    flight_key = (parsed_info['source_site'], parsed_info['listing_id'])
+    return await _inflight_analyses.do(
+        flight_key,
+        lambda: _analyze_with_lease(url, raw_text, parsed_info),
+    )
+
+
+async def process_shopee_products_batch_async(items: list):
+    """
+    Async version of `shopee_processor.process_shopee_products_batch`: an
+    async generator of `(index, result)` pairs in the same order.
+    """
+    if get_async_products_collection() is None:
+        logger.error("CRITICAL: Database is not connected. Cannot process batch.")
+        for index in range(len(items)):
+            yield index, None
+        return
+
+    indices_by_key = {}
+    inputs_by_key = {}
+    for index, (url, raw_text) in enumerate(items):
+        parsed_info = parse_shopee_url(url) if url else None
+        if not parsed_info:
+            yield index, None
+            continue
+        key = (parsed_info['source_site'], parsed_info['listing_id'])
+        if key not in indices_by_key:
+            indices_by_key[key] = []
+            inputs_by_key[key] = (url, raw_text, parsed_info)
+        indices_by_key[key].append(index)
+
+    stored = await find_products_bulk_async([parsed_info for _, _, parsed_info in inputs_by_key.values()])
+    misses = [key for key in indices_by_key if key not in stored]
+    log_event(
+        logger, logging.INFO, "batch_lookup",
+        items=len(items), listings=len(indices_by_key), hits=len(stored), misses=len(misses),
+    )
+    for key, product in stored.items():
+        response_document = await _prepare_cached_response(product)
+        for index in indices_by_key[key]:
+            yield index, response_document
+
+    batched_analyze = async_analysis_batcher.submit if ANALYZER_BATCH_SIZE > 1 else None
+
+    async def analyze(key):
+        url, raw_text, parsed_info = inputs_by_key[key]
+        async with _batch_llm_slots:
+            try:
+                return key, await _inflight_analyses.do(
+                    key, lambda: _analyze_with_lease(url, raw_text, parsed_info, batched_analyze)
+                )
+            except Exception as e:
+                logger.error(f"Batch analysis failed for {key}: {e}", exc_info=True)
+                return key, None
+
+    tasks = [asyncio.ensure_future(analyze(key)) for key in misses]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, response_document = await next_done
+            for index in indices_by_key[key]:
+                yield index, response_document
+    finally:
+        # If the client went away, don't start the analyses that are still queued
+        for task in tasks:
+            task.cancel()
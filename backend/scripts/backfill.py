@@ -0,0 +1,260 @@
+# scripts/backfill.py
+# ==============================================================================
+# Offline pre-scoring of a product catalogue, e.g. before a sale event, so the
+# first shopper on a listing gets a cache hit instead of an LLM round trip.
+#
+# Reads an NDJSON or CSV file of `{url, plainText}` records (the /batch_rate
+# item format; a record without `url` falls back to the URL: line of its
+# text) and processes it in chunks of --chunk-size records:
+#
+#   1. One index-only query finds the listings that are already stored;
+#      they are skipped, as are repeats within the chunk.
+#   2. The rest go through the regular cache-miss pipeline
+#      (shopee_processor.prepare_product_document: content-hash and
+#      near-duplicate reuse, LLM analysis, scoring) with at most
+#      --concurrency LLM calls in flight, sharing multi-product calls. The
+#      calls run in the LLM scheduler's background lane, so users waiting on
+#      the extension keep priority over the backfill.
+#   3. The new documents are written with one unordered insert_many and the
+#      affected categories' top lists are rebuilt once.
+#
+# After each chunk the number of records done is saved to the checkpoint
+# file (<input>.checkpoint.json by default). Rerunning the same command
+# resumes after the last finished chunk; --restart starts over (stored
+# listings are skipped either way). Records that could not be analyzed can
+# be written to --failed-output for a later run.
+#
+# Run from backend/:
+#     python -m scripts.backfill catalogue.ndjson
+#     python -m scripts.backfill catalogue.csv --concurrency 8 --chunk-size 500
+#     python -m scripts.backfill catalogue.ndjson --dry-run    # count what would be analyzed
+# ==============================================================================
+
+import argparse
+import csv
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.logging_utils import log_event
+from scripts.payload import extract_batch_items
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('backfill')
+
+try:
+    from config import BATCH_LLM_CONCURRENCY
+except ImportError:
+    BATCH_LLM_CONCURRENCY = 4
+
+DEFAULT_CHUNK_SIZE = 200
+# Page dumps can be far larger than the csv module's default 128 KiB field limit
+CSV_FIELD_SIZE_LIMIT = 16 * 1024 * 1024
+
+
+def detect_format(path: str) -> str:
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def read_records(path: str, file_format: str):
+    """
+    Yields `(record_number, record)` for every record of the file, where
+    `record` is a dict, or None for a line that is not a JSON object.
+    """
+    with open(path, newline='', encoding='utf-8') as input_file:
+        if file_format == 'csv':
+            csv.field_size_limit(CSV_FIELD_SIZE_LIMIT)
+            for number, row in enumerate(csv.DictReader(input_file)):
+                yield number, row
+            return
+        number = 0
+        for line in input_file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+            number += 1
+
+
+def _chunks(records, size: int):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Checkpoint:
+    """The number of records done for one input file, saved atomically after each chunk."""
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input = os.path.abspath(input_path)
+        self.input_size = os.path.getsize(input_path)
+        self.records_done = 0
+        self.totals = {}
+
+    def load(self) -> bool:
+        """Restores a checkpoint for the same, unchanged input file; returns whether one was found."""
+        try:
+            with open(self.path, encoding='utf-8') as checkpoint_file:
+                saved = json.load(checkpoint_file)
+        except FileNotFoundError:
+            return False
+        except ValueError:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}.")
+            return False
+        if saved.get('input') != self.input or saved.get('input_size') != self.input_size:
+            logger.warning(f"Checkpoint {self.path} is for another or a changed input file; starting over.")
+            return False
+        self.records_done = saved.get('records_done', 0)
+        self.totals = saved.get('totals', {})
+        return True
+
+    def save(self) -> None:
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump({
+                'input': self.input,
+                'input_size': self.input_size,
+                'records_done': self.records_done,
+                'totals': self.totals,
+            }, checkpoint_file)
+        os.replace(temporary_path, self.path)
+
+
+def _parse_records(chunk: list, totals: dict) -> list:
+    """The `(record, url, raw_text, parsed_info)` of each usable record, first occurrence only."""
+    from scripts.url_parser import parse_shopee_url
+
+    parsed, seen = [], set()
+    for _, record in chunk:
+        items = extract_batch_items([record]) if record is not None else None
+        url, raw_text = items[0] if items else (None, None)
+        parsed_info = parse_shopee_url(url) if url and raw_text else None
+        if not parsed_info:
+            totals['invalid'] += 1
+            continue
+        key = (parsed_info['source_site'], parsed_info['listing_id'])
+        if key in seen:
+            totals['repeated'] += 1
+            continue
+        seen.add(key)
+        parsed.append((record, url, raw_text, parsed_info))
+    return parsed
+
+
+def backfill_chunk(chunk: list, analyze, pool: ThreadPoolExecutor, totals: dict,
+                   dry_run: bool = False, failed_output=None) -> None:
+    """Processes one chunk of `(record_number, record)` pairs and adds its outcome to `totals`."""
+    from scripts.shopee_processor import find_stored_listings, prepare_product_document, store_products_bulk
+
+    totals['read'] += len(chunk)
+    parsed = _parse_records(chunk, totals)
+    stored_keys = find_stored_listings([parsed_info for _, _, _, parsed_info in parsed])
+    misses = [item for item in parsed if (item[3]['source_site'], item[3]['listing_id']) not in stored_keys]
+    totals['cached'] += len(parsed) - len(misses)
+    if dry_run:
+        totals['to_analyze'] += len(misses)
+        return
+
+    documents = list(pool.map(
+        lambda item: prepare_product_document(item[1], item[2], item[3], analyze), misses
+    ))
+    new_documents = []
+    for (record, _, _, _), document in zip(misses, documents):
+        if document is None:
+            totals['failed'] += 1
+            if failed_output is not None:
+                failed_output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            continue
+        if document.get('analysis_reused_from'):
+            totals['reused'] += 1
+        new_documents.append(document)
+    stored, duplicates = store_products_bulk(new_documents)
+    totals['stored'] += len(stored)
+    totals['cached'] += duplicates
+    totals['failed'] += len(new_documents) - len(stored) - duplicates
+    if failed_output is not None:
+        failed_output.flush()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-score a catalogue of {url, plainText} records.")
+    parser.add_argument('input', help='NDJSON or CSV file of records')
+    parser.add_argument('--format', choices=('ndjson', 'csv'), help='default: from the file extension')
+    parser.add_argument('--concurrency', type=int, default=BATCH_LLM_CONCURRENCY,
+                        help=f'LLM calls in flight (default {BATCH_LLM_CONCURRENCY})')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'records per existence check, bulk insert and checkpoint (default {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--checkpoint', help='default: <input>.checkpoint.json')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    parser.add_argument('--failed-output', help='append records that could not be analyzed to this NDJSON file')
+    parser.add_argument('--dry-run', action='store_true', help='only count the records that would be analyzed')
+    args = parser.parse_args(argv)
+
+    from scripts import db
+    if db.connect_to_db() is None:
+        print("Could not connect to MongoDB; check config.py.", file=sys.stderr)
+        return 2
+
+    from scripts.analyzer import ANALYZER_BATCH_SIZE, ANALYZER_BATCH_WAIT_MS, AnalysisBatcher, get_full_product_analysis
+    from scripts.llm_scheduler import LANE_BACKGROUND
+
+    concurrency = max(1, args.concurrency)
+    if ANALYZER_BATCH_SIZE > 1:
+        analyze = AnalysisBatcher(ANALYZER_BATCH_SIZE, ANALYZER_BATCH_WAIT_MS / 1000, concurrency,
+                                  lane=LANE_BACKGROUND).submit
+        workers = concurrency * ANALYZER_BATCH_SIZE
+    else:
+        analyze = functools.partial(get_full_product_analysis, lane=LANE_BACKGROUND)
+        workers = concurrency
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.input}.checkpoint.json", args.input)
+    if not args.restart and not args.dry_run and checkpoint.load():
+        logger.info(f"Resuming after {checkpoint.records_done} records ({checkpoint.path}).")
+    if args.dry_run:
+        totals = {'read': 0, 'invalid': 0, 'repeated': 0, 'cached': 0, 'to_analyze': 0}
+    else:
+        totals = {'read': 0, 'invalid': 0, 'repeated': 0, 'cached': 0, 'stored': 0, 'reused': 0, 'failed': 0}
+        totals.update(checkpoint.totals)
+
+    records = read_records(args.input, args.format or detect_format(args.input))
+    records = (record for record in records if record[0] >= checkpoint.records_done)
+    failed_output = open(args.failed_output, 'a', encoding='utf-8') if args.failed_output else None
+    started = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as pool:
+            for chunk in _chunks(records, max(1, args.chunk_size)):
+                backfill_chunk(chunk, analyze, pool, totals, args.dry_run, failed_output)
+                if not args.dry_run:
+                    checkpoint.records_done = chunk[-1][0] + 1
+                    checkpoint.totals = totals
+                    checkpoint.save()
+                log_event(logger, logging.INFO, "backfill_progress",
+                          records_done=chunk[-1][0] + 1,
+                          elapsed_s=round(time.monotonic() - started, 1), **totals)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun the same command to resume after record {checkpoint.records_done}.",
+              file=sys.stderr)
+        return 130
+    finally:
+        if failed_output is not None:
+            failed_output.close()
+
+    print(json.dumps(totals))
+    return 1 if totals.get('failed') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,363 @@
+# scripts/categories.py
+# ==============================================================================
+# Category canonicalization.
+#
+# The analyzer's `category` is free text from the LLM ("Sneakers",
+# "sneakers", "Men's Sneakers", "Shoes > Sneakers"). Recommendations and the
+# per-category top lists and caches are keyed by that string, so one logical
+# category used to be spread over many keys. `canonicalize_category` maps it
+# to one name:
+#
+#   1. The text is reduced to a key: lowercase, "&" -> "and", punctuation
+#      and possessives removed, gender/age qualifiers ("men's", "kids")
+#      dropped, simple plurals made singular. Of a breadcrumb, only the most
+#      specific step is used.
+#   2. The key is looked up in an index built once at import from
+#      CATEGORY_TAXONOMY (canonical names) and CATEGORY_ALIASES (synonyms,
+#      plus CATEGORY_EXTRA_ALIASES from config.py).
+#   3. Failing that, its trailing words ("trail running sneaker" ->
+#      "sneaker"), unless they are one of the GENERIC_HEAD_WORDS ("bottle
+#      cap" is not a hat), then a fuzzy match (difflib, ratio >=
+#      CATEGORY_FUZZY_CUTOFF) for typos and spelling variants.
+#   4. A category outside the taxonomy keeps a consistent spelling of its
+#      key ("Loafer" for "men's loafers" and "Loafers"), so it still groups.
+#
+# Results are memoized. Categories are canonicalized when a product document
+# is built and when recommendations are looked up. Products stored before are
+# migrated with:
+#
+#     python -m scripts.categories --dry-run    # show the mapping
+#     python -m scripts.categories              # rewrite categories, rebuild top lists
+#     python -m scripts.categories --show "Men's Running Shoes"
+#     python -m scripts.categories --check      # verify CANONICALIZATION_EXAMPLES
+# ==============================================================================
+
+import argparse
+import difflib
+import functools
+import json
+import logging
+import re
+import sys
+
+from pymongo import UpdateMany
+
+from scripts.category_top import rebuild_category_top
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('categories')
+
+try:
+    from config import CATEGORY_FUZZY_CUTOFF, CATEGORY_EXTRA_ALIASES
+except ImportError:
+    CATEGORY_FUZZY_CUTOFF = 0.85
+    CATEGORY_EXTRA_ALIASES = {}
+
+UNKNOWN_CATEGORY = 'Unknown'
+CANONICAL_CACHE_SIZE = 8192
+
+# Canonical category names, at the level of a Shopee breadcrumb's last step
+CATEGORY_TAXONOMY = (
+    # Fashion
+    'T-Shirts', 'Shirts', 'Blouses', 'Polo Shirts', 'Sweaters', 'Hoodies', 'Jackets', 'Coats',
+    'Dresses', 'Skirts', 'Jeans', 'Pants', 'Shorts', 'Leggings', 'Activewear', 'Swimwear',
+    'Underwear', 'Bras', 'Socks', 'Sleepwear', 'Baby Clothing', 'Kids Clothing',
+    # Shoes and accessories
+    'Sneakers', 'Sandals', 'Slippers', 'Boots', 'Heels', 'Flats', 'Loafers', 'Formal Shoes',
+    'Backpacks', 'Handbags', 'Tote Bags', 'Wallets', 'Luggage', 'Belts', 'Hats', 'Scarves',
+    'Sunglasses', 'Watches', 'Jewelry', 'Hair Accessories',
+    # Beauty and personal care
+    'Skincare', 'Makeup', 'Fragrances', 'Hair Care', 'Bath and Body', 'Oral Care',
+    'Shaving and Grooming', 'Feminine Care', 'Diapers', 'Sunscreen',
+    # Home and living
+    'Water Bottles', 'Drinkware', 'Food Storage', 'Cookware', 'Kitchen Utensils', 'Tableware',
+    'Bedding', 'Towels', 'Home Decor', 'Furniture', 'Storage and Organization', 'Lighting',
+    'Cleaning Supplies', 'Laundry', 'Plants and Gardening', 'Pet Supplies',
+    # Electronics
+    'Phone Cases', 'Mobile Phones', 'Chargers and Cables', 'Power Banks', 'Headphones',
+    'Speakers', 'Laptops', 'Tablets', 'Computer Accessories', 'Cameras', 'Smartwatches',
+    'Home Appliances', 'Kitchen Appliances', 'Batteries',
+    # Other
+    'Notebooks', 'Stationery', 'Books', 'Toys', 'Sports Equipment', 'Camping Gear', 'Bicycles',
+    'Food and Snacks', 'Beverages', 'Supplements', 'Baby Care', 'Face Masks', 'Car Accessories',
+)
+
+# Synonyms and common variants -> canonical name (keys are matched as category keys)
+CATEGORY_ALIASES = {
+    'tee': 'T-Shirts', 'tees': 'T-Shirts', 'tshirt': 'T-Shirts', 'graphic tee': 'T-Shirts', 'top': 'T-Shirts',
+    'tank top': 'T-Shirts', 'crop top': 'T-Shirts',
+    'button down shirt': 'Shirts', 'dress shirt': 'Shirts', 'flannel': 'Shirts',
+    'polo': 'Polo Shirts',
+    'jumper': 'Sweaters', 'cardigan': 'Sweaters', 'knitwear': 'Sweaters', 'pullover': 'Sweaters',
+    'sweatshirt': 'Hoodies', 'hoodie': 'Hoodies', 'hoody': 'Hoodies',
+    'windbreaker': 'Jackets', 'blazer': 'Jackets', 'bomber': 'Jackets', 'puffer': 'Jackets',
+    'gown': 'Dresses', 'frock': 'Dresses',
+    'denim': 'Jeans', 'trouser': 'Pants', 'chino': 'Pants', 'jogger': 'Pants', 'sweatpant': 'Pants',
+    'cargo pant': 'Pants', 'tights': 'Leggings', 'yoga pant': 'Leggings',
+    'sportswear': 'Activewear', 'gym wear': 'Activewear', 'sports bra': 'Activewear',
+    'swimsuit': 'Swimwear', 'bikini': 'Swimwear', 'swim trunk': 'Swimwear', 'rash guard': 'Swimwear',
+    'brief': 'Underwear', 'boxer': 'Underwear', 'panty': 'Underwear', 'lingerie': 'Underwear',
+    'pajama': 'Sleepwear', 'pyjama': 'Sleepwear', 'nightwear': 'Sleepwear', 'nightgown': 'Sleepwear',
+    'baby apparel': 'Baby Clothing', 'romper': 'Baby Clothing', 'onesie': 'Baby Clothing',
+    'kid apparel': 'Kids Clothing', 'children clothing': 'Kids Clothing',
+    'trainer': 'Sneakers', 'running shoe': 'Sneakers', 'sport shoe': 'Sneakers', 'athletic shoe': 'Sneakers',
+    'canvas shoe': 'Sneakers', 'casual shoe': 'Sneakers', 'shoe': 'Sneakers',
+    'flip flop': 'Slippers', 'slide': 'Slippers', 'house slipper': 'Slippers',
+    'ankle boot': 'Boots', 'rain boot': 'Boots', 'high heel': 'Heels', 'pump': 'Heels', 'wedge': 'Heels',
+    'ballet flat': 'Flats', 'moccasin': 'Loafers', 'oxford': 'Formal Shoes', 'dress shoe': 'Formal Shoes',
+    'rucksack': 'Backpacks', 'school bag': 'Backpacks', 'laptop bag': 'Backpacks', 'daypack': 'Backpacks',
+    'bag': 'Handbags', 'purse': 'Handbags', 'shoulder bag': 'Handbags', 'crossbody bag': 'Handbags',
+    'sling bag': 'Handbags', 'clutch': 'Handbags', 'tote': 'Tote Bags', 'shopping bag': 'Tote Bags',
+    'reusable bag': 'Tote Bags', 'canvas bag': 'Tote Bags', 'card holder': 'Wallets', 'coin purse': 'Wallets',
+    'suitcase': 'Luggage', 'travel bag': 'Luggage', 'duffel bag': 'Luggage',
+    'cap': 'Hats', 'baseball cap': 'Hats', 'beanie': 'Hats', 'bucket hat': 'Hats', 'shawl': 'Scarves',
+    'eyewear': 'Sunglasses', 'shade': 'Sunglasses', 'wristwatch': 'Watches',
+    'necklace': 'Jewelry', 'earring': 'Jewelry', 'bracelet': 'Jewelry', 'ring': 'Jewelry', 'jewellery': 'Jewelry',
+    'hair clip': 'Hair Accessories', 'scrunchie': 'Hair Accessories', 'headband': 'Hair Accessories',
+    'skin care': 'Skincare', 'moisturizer': 'Skincare', 'serum': 'Skincare', 'cleanser': 'Skincare',
+    'facial wash': 'Skincare', 'toner': 'Skincare', 'face cream': 'Skincare',
+    'cosmetic': 'Makeup', 'lipstick': 'Makeup', 'foundation': 'Makeup', 'mascara': 'Makeup',
+    'perfume': 'Fragrances', 'cologne': 'Fragrances', 'body mist': 'Fragrances',
+    'shampoo': 'Hair Care', 'conditioner': 'Hair Care', 'hair oil': 'Hair Care',
+    'soap': 'Bath and Body', 'body wash': 'Bath and Body', 'shower gel': 'Bath and Body',
+    'lotion': 'Bath and Body', 'body lotion': 'Bath and Body', 'deodorant': 'Bath and Body',
+    'toothbrush': 'Oral Care', 'toothpaste': 'Oral Care', 'mouthwash': 'Oral Care',
+    'razor': 'Shaving and Grooming', 'shaver': 'Shaving and Grooming', 'grooming': 'Shaving and Grooming',
+    'sanitary pad': 'Feminine Care', 'menstrual cup': 'Feminine Care', 'period underwear': 'Feminine Care',
+    'nappy': 'Diapers', 'cloth diaper': 'Diapers', 'sunblock': 'Sunscreen', 'spf': 'Sunscreen',
+    'bottle': 'Water Bottles', 'tumbler': 'Water Bottles', 'flask': 'Water Bottles',
+    'thermos': 'Water Bottles', 'insulated bottle': 'Water Bottles', 'drink bottle': 'Water Bottles',
+    'mug': 'Drinkware', 'cup': 'Drinkware', 'glass': 'Drinkware', 'straw': 'Drinkware', 'coffee cup': 'Drinkware',
+    'lunch box': 'Food Storage', 'bento box': 'Food Storage', 'food container': 'Food Storage',
+    'beeswax wrap': 'Food Storage', 'cling wrap': 'Food Storage',
+    'pot': 'Cookware', 'pan': 'Cookware', 'frying pan': 'Cookware', 'wok': 'Cookware',
+    'cutlery': 'Kitchen Utensils', 'utensil': 'Kitchen Utensils', 'chopstick': 'Kitchen Utensils',
+    'cutting board': 'Kitchen Utensils', 'knife': 'Kitchen Utensils', 'spatula': 'Kitchen Utensils',
+    'plate': 'Tableware', 'bowl': 'Tableware', 'dinnerware': 'Tableware',
+    'bed sheet': 'Bedding', 'pillow': 'Bedding', 'pillowcase': 'Bedding', 'blanket': 'Bedding',
+    'duvet': 'Bedding', 'comforter': 'Bedding', 'mattress': 'Bedding',
+    'bath towel': 'Towels', 'face towel': 'Towels',
+    'decor': 'Home Decor', 'vase': 'Home Decor', 'candle': 'Home Decor', 'wall art': 'Home Decor', 'rug': 'Home Decor',
+    'chair': 'Furniture', 'table': 'Furniture', 'desk': 'Furniture', 'shelf': 'Furniture', 'sofa': 'Furniture',
+    'storage box': 'Storage and Organization', 'organizer': 'Storage and Organization',
+    'hanger': 'Storage and Organization', 'basket': 'Storage and Organization',
+    'lamp': 'Lighting', 'light bulb': 'Lighting', 'led light': 'Lighting', 'fairy light': 'Lighting',
+    'detergent': 'Laundry', 'laundry detergent': 'Laundry', 'fabric softener': 'Laundry',
+    'dish soap': 'Cleaning Supplies', 'sponge': 'Cleaning Supplies', 'mop': 'Cleaning Supplies',
+    'broom': 'Cleaning Supplies', 'trash bag': 'Cleaning Supplies', 'garbage bag': 'Cleaning Supplies',
+    'plant': 'Plants and Gardening', 'planter': 'Plants and Gardening', 'seed': 'Plants and Gardening',
+    'gardening tool': 'Plants and Gardening', 'compost bin': 'Plants and Gardening',
+    'pet food': 'Pet Supplies', 'dog toy': 'Pet Supplies', 'cat litter': 'Pet Supplies',
+    'pet bed': 'Pet Supplies', 'leash': 'Pet Supplies',
+    'phone cover': 'Phone Cases', 'phone case': 'Phone Cases', 'case': 'Phone Cases', 'casing': 'Phone Cases',
+    'smartphone': 'Mobile Phones', 'phone': 'Mobile Phones', 'cellphone': 'Mobile Phones',
+    'charger': 'Chargers and Cables', 'cable': 'Chargers and Cables', 'usb cable': 'Chargers and Cables',
+    'charging cable': 'Chargers and Cables', 'adapter': 'Chargers and Cables',
+    'powerbank': 'Power Banks', 'portable charger': 'Power Banks',
+    'earphone': 'Headphones', 'earbud': 'Headphones', 'headset': 'Headphones', 'earpiece': 'Headphones',
+    'bluetooth speaker': 'Speakers', 'notebook computer': 'Laptops', 'ipad': 'Tablets',
+    'keyboard': 'Computer Accessories', 'mouse': 'Computer Accessories', 'mouse pad': 'Computer Accessories',
+    'webcam': 'Computer Accessories', 'monitor': 'Computer Accessories',
+    'smart watch': 'Smartwatches', 'fitness tracker': 'Smartwatches',
+    'fan': 'Home Appliances', 'air purifier': 'Home Appliances', 'vacuum cleaner': 'Home Appliances',
+    'iron': 'Home Appliances', 'humidifier': 'Home Appliances',
+    'blender': 'Kitchen Appliances', 'kettle': 'Kitchen Appliances', 'rice cooker': 'Kitchen Appliances',
+    'air fryer': 'Kitchen Appliances', 'coffee maker': 'Kitchen Appliances', 'toaster': 'Kitchen Appliances',
+    'rechargeable battery': 'Batteries',
+    'journal': 'Notebooks', 'planner': 'Notebooks', 'diary': 'Notebooks', 'sketchbook': 'Notebooks',
+    'pen': 'Stationery', 'pencil': 'Stationery', 'office supply': 'Stationery', 'school supply': 'Stationery',
+    'novel': 'Books', 'ebook': 'Books',
+    'toy': 'Toys', 'plush': 'Toys', 'puzzle': 'Toys', 'board game': 'Toys', 'building block': 'Toys',
+    'yoga mat': 'Sports Equipment', 'dumbbell': 'Sports Equipment', 'fitness equipment': 'Sports Equipment',
+    'racket': 'Sports Equipment', 'ball': 'Sports Equipment',
+    'tent': 'Camping Gear', 'sleeping bag': 'Camping Gear', 'outdoor gear': 'Camping Gear',
+    'bike': 'Bicycles', 'bicycle accessory': 'Bicycles',
+    'snack': 'Food and Snacks', 'food': 'Food and Snacks', 'grocery': 'Food and Snacks',
+    'coffee': 'Beverages', 'tea': 'Beverages', 'drink': 'Beverages', 'juice': 'Beverages',
+    'vitamin': 'Supplements', 'protein powder': 'Supplements', 'health supplement': 'Supplements',
+    'baby bottle': 'Baby Care', 'stroller': 'Baby Care', 'baby wipe': 'Baby Care', 'teether': 'Baby Care',
+    'mask': 'Face Masks', 'face mask': 'Face Masks', 'facemask': 'Face Masks',
+    'car charger': 'Car Accessories', 'car mount': 'Car Accessories', 'car seat cover': 'Car Accessories',
+}
+
+# One-word aliases that are right on their own ("Caps" are hats) but name
+# something else after a modifier ("Bottle Cap", "Pet Bowl", "Baby Shoes",
+# "Eco Bags"). Trailing-word matching skips them; multi-word aliases such as
+# 'baseball cap' or 'running shoe' still match.
+GENERIC_HEAD_WORDS = frozenset({
+    'bag', 'ball', 'basket', 'bottle', 'bowl', 'brief', 'cable', 'cap', 'case', 'casing', 'clothing',
+    'cup', 'decor', 'drink', 'fan', 'food', 'glass', 'iron', 'mask', 'monitor', 'mouse', 'organizer',
+    'pan', 'pen', 'phone', 'plant', 'plate', 'pot', 'pump', 'ring', 'seed', 'shade', 'shoe', 'slide',
+    'straw', 'table', 'tight', 'top', 'trainer', 'wedge',
+})
+
+# Inputs and the canonical names they must map to (`--check`)
+CANONICALIZATION_EXAMPLES = {
+    "Men's Sneakers": 'Sneakers',
+    'Shoes > Sneakers': 'Sneakers',
+    'Trail Running Sneakers': 'Sneakers',
+    "Men's Running Shoes": 'Sneakers',
+    "Men's T-Shirts": 'T-Shirts',
+    'Stainless Steel Water Bottle': 'Water Bottles',
+    'Caps': 'Hats',
+    'Baseball Cap': 'Hats',
+    'Bottle Cap': 'Bottle Cap',
+    'Pet Bowl': 'Pet Bowl',
+    'Baby Shoes': 'Baby Shoe',
+    'Eco Bags': 'Eco Bag',
+    'Loafers': 'Loafers',
+    '': UNKNOWN_CATEGORY,
+}
+
+# Words that narrow the audience, not the category ("Men's Sneakers" is "Sneakers")
+QUALIFIER_WORDS = frozenset({
+    'men', 'man', 'mens', 'women', 'woman', 'womens', 'lady', 'ladies', 'unisex', 'boy', 'boys',
+    'girl', 'girls', 'kid', 'kids', 'child', 'children', 'adult', 'for', 'the', 'and', 'new',
+})
+
+_BREADCRUMB_SEPARATOR = re.compile(r"\s*(?:>|»|/|\|)\s*")
+_POSSESSIVE = re.compile(r"['’]s\b")
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or word.endswith('ss'):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def category_key(text: str) -> str:
+    """The normalized form categories are compared by ("Men's T-Shirts" -> "t shirt")."""
+    text = _POSSESSIVE.sub('', text.lower().replace('&', ' and '))
+    words = _NON_ALPHANUMERIC.sub(' ', text).split()
+    kept = [_singular(word) for word in words if word not in QUALIFIER_WORDS]
+    # A category made only of qualifiers ("Kids") keeps them
+    return ' '.join(kept or [_singular(word) for word in words])
+
+
+def _build_index() -> dict:
+    index = {}
+    for name in CATEGORY_TAXONOMY:
+        index[category_key(name)] = name
+    for aliases in (CATEGORY_ALIASES, CATEGORY_EXTRA_ALIASES):
+        for alias, name in aliases.items():
+            index.setdefault(category_key(alias), name)
+    return index
+
+
+# Built once per process: category key -> canonical name
+CATEGORY_INDEX = _build_index()
+_INDEX_KEYS = list(CATEGORY_INDEX)
+
+
+def _match(key: str) -> str | None:
+    if key in CATEGORY_INDEX:
+        return CATEGORY_INDEX[key]
+    # English names end with their head noun: "trail running sneaker" -> "sneaker"
+    words = key.split()
+    for start in range(1, len(words)):
+        suffix = ' '.join(words[start:])
+        if suffix in CATEGORY_INDEX and suffix not in GENERIC_HEAD_WORDS:
+            return CATEGORY_INDEX[suffix]
+    close = difflib.get_close_matches(key, _INDEX_KEYS, n=1, cutoff=CATEGORY_FUZZY_CUTOFF)
+    return CATEGORY_INDEX[close[0]] if close else None
+
+
+@functools.lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonicalize_category(category) -> str:
+    """The canonical name for an analyzer or stored category (see the module header)."""
+    if not isinstance(category, str):
+        return UNKNOWN_CATEGORY
+    steps = [step for step in _BREADCRUMB_SEPARATOR.split(category.strip()) if step]
+    if not steps:
+        return UNKNOWN_CATEGORY
+    key = category_key(steps[-1])
+    if not key or key == 'unknown':
+        return UNKNOWN_CATEGORY
+    match = _match(key)
+    if match:
+        return match
+    # Outside the taxonomy: one spelling per key, so variants still group
+    return ' '.join(word.capitalize() for word in key.split())
+
+
+# ==============================================================================
+# Migration of stored products
+# ==============================================================================
+
+def migrate_categories(products_collection, top_collection=None, dry_run: bool = False) -> dict:
+    """
+    Rewrites every stored category that is not canonical (one UpdateMany per
+    distinct value), rebuilds the top lists of the categories that received
+    products and drops the top lists of the old names.
+
+    Returns:
+        A summary with 'distinct_before', 'distinct_after', 'renamed'
+        (old -> new), 'products_updated' and 'top_lists_rebuilt'.
+    """
+    stored = [category for category in products_collection.distinct('category') if category is not None]
+    renamed = {category: canonicalize_category(category) for category in stored}
+    renamed = {old: new for old, new in renamed.items() if old != new}
+    summary = {
+        'distinct_before': len(stored),
+        'distinct_after': len(set(stored) - set(renamed) | set(renamed.values())),
+        'renamed': renamed,
+        'products_updated': 0,
+        'top_lists_rebuilt': 0,
+    }
+    if dry_run or not renamed:
+        return summary
+
+    result = products_collection.bulk_write(
+        [UpdateMany({'category': old}, {'$set': {'category': new}}) for old, new in renamed.items()],
+        ordered=False,
+    )
+    summary['products_updated'] = result.modified_count
+    if top_collection is not None:
+        top_collection.delete_many({'_id': {'$in': list(renamed)}})
+        for category in sorted(set(renamed.values()) - {UNKNOWN_CATEGORY}):
+            rebuild_category_top(top_collection, products_collection, category)
+            summary['top_lists_rebuilt'] += 1
+    logger.info(f"Migrated {summary['products_updated']} products: {summary['distinct_before']} "
+                f"categories -> {summary['distinct_after']}.")
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Canonicalize stored product categories.")
+    parser.add_argument('--dry-run', action='store_true', help='only show which categories would be renamed')
+    parser.add_argument('--show', metavar='CATEGORY', help='print the canonical name of CATEGORY and exit')
+    parser.add_argument('--check', action='store_true', help='verify CANONICALIZATION_EXAMPLES and exit')
+    args = parser.parse_args(argv)
+
+    if args.show is not None:
+        print(canonicalize_category(args.show))
+        return 0
+    if args.check:
+        failures = {
+            category: (canonicalize_category(category), expected)
+            for category, expected in CANONICALIZATION_EXAMPLES.items()
+            if canonicalize_category(category) != expected
+        }
+        for category, (actual, expected) in failures.items():
+            print(f"{category!r} -> {actual!r}, expected {expected!r}", file=sys.stderr)
+        print(f"{len(CANONICALIZATION_EXAMPLES) - len(failures)}/{len(CANONICALIZATION_EXAMPLES)} examples OK")
+        return 1 if failures else 0
+
+    from scripts import db
+    if db.connect_to_db() is None:
+        print("Could not connect to MongoDB; check config.py.", file=sys.stderr)
+        return 2
+    summary = migrate_categories(db.get_products_collection(), db.get_category_top_collection(), args.dry_run)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
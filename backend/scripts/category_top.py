@@ -0,0 +1,182 @@
+# scripts/category_top.py
+# ==============================================================================
+# Materialized per-category top-K lists for recommendations.
+#
+# Instead of running a $match/$sort/$limit aggregation over the products
+# collection on every request, each category has one small document in
+# `category_top_products`:
+#
+#     {_id: <category>, products: [{product_name, brand, listing_id, url, score}, ...],
+#      updatedAt: <date>}
+#
+# holding its CATEGORY_TOP_K best products, best first. Reading it is a single
+# _id lookup, whatever the size of the catalogue. Every newly stored product
+# is pushed into its category's list with $push/$each/$sort/$slice, which
+# keeps the list sorted and bounded atomically. A category seen for the first
+# time is seeded once from the aggregation.
+#
+# Jobs that change stored scores or categories in bulk (rescoring, category
+# migrations) should call `rebuild_category_top` for the affected categories.
+# ==============================================================================
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('category_top')
+
+try:
+    from config import CATEGORY_TOP_K
+except ImportError:
+    CATEGORY_TOP_K = 10
+
+
+def build_top_products_pipeline(category: str, limit: int = CATEGORY_TOP_K) -> list:
+    """The aggregation that computes a category's top list from the products collection."""
+    # Define the aggregation pipeline to find, sort, limit, and project fields
+    return [
+        {
+            '$match': {
+                'category': category,
+            }
+        },
+        {
+            '$sort': {'default_sustainability_score': -1}
+        },
+        {
+            '$limit': limit
+        },
+        {
+            '$project': {
+                'product_name': 1,
+                'brand': 1,
+                'listing_id': 1,
+                'url': '$source_url',  # Rename 'source_url' to 'url' for the frontend
+                'score': '$default_sustainability_score', # Rename for consistency
+                '_id': 0
+            }
+        }
+    ]
+
+
+def top_entry(product: dict) -> dict:
+    """A product document in the shape of a top-list entry (the pipeline's $project)."""
+    return {
+        'product_name': product.get('product_name'),
+        'brand': product.get('brand'),
+        'listing_id': product.get('listing_id'),
+        'url': product.get('source_url'),
+        'score': product.get('default_sustainability_score'),
+    }
+
+
+def _push_filter(category: str, entry: dict) -> dict:
+    # Skip the push if the listing is already in the list (e.g. it was part of the seed)
+    return {'_id': category, 'products.listing_id': {'$ne': entry['listing_id']}}
+
+
+def _push_update(entry: dict, k: int) -> dict:
+    return {
+        '$push': {'products': {'$each': [entry], '$sort': {'score': -1}, '$slice': k}},
+        '$currentDate': {'updatedAt': True},
+    }
+
+
+def _seed_update(top_products: list) -> dict:
+    return {
+        '$setOnInsert': {'products': top_products},
+        '$currentDate': {'updatedAt': True},
+    }
+
+
+def get_category_top(top_collection, products_collection, category: str, k: int = CATEGORY_TOP_K) -> list:
+    """
+    The top `k` products of `category`, best first. Falls back to the
+    aggregation when there is no materialized collection.
+    """
+    if top_collection is None:
+        return list(products_collection.aggregate(build_top_products_pipeline(category, k)))
+
+    document = top_collection.find_one({'_id': category}, {'products': 1})
+    if document is not None:
+        return document.get('products', [])
+
+    # First request for this category: seed it. $setOnInsert means a
+    # concurrent seed or push that got there first is left alone.
+    top_products = list(products_collection.aggregate(build_top_products_pipeline(category, k)))
+    top_collection.update_one({'_id': category}, _seed_update(top_products), upsert=True)
+    logger.info(f"Seeded top list for category '{category}' with {len(top_products)} product(s).")
+    return top_products
+
+
+def add_to_category_top(top_collection, products_collection, product: dict, k: int = CATEGORY_TOP_K) -> None:
+    """Pushes a newly stored product into its category's top list."""
+    category = product.get('category')
+    if top_collection is None or not category or category == 'Unknown':
+        return
+
+    entry = top_entry(product)
+    result = top_collection.update_one(_push_filter(category, entry), _push_update(entry, k))
+    if result.matched_count:
+        return
+    if top_collection.find_one({'_id': category}, {'_id': 1}) is not None:
+        return  # Already listed
+
+    # New category: seed it (the aggregation already sees this product). If
+    # another worker seeded it first, its seed may predate our insert, so push
+    # again; the $ne filter keeps that from creating a duplicate.
+    top_products = list(products_collection.aggregate(build_top_products_pipeline(category, k)))
+    result = top_collection.update_one({'_id': category}, _seed_update(top_products), upsert=True)
+    if result.upserted_id is None:
+        top_collection.update_one(_push_filter(category, entry), _push_update(entry, k))
+
+
+def rebuild_category_top(top_collection, products_collection, category: str, k: int = CATEGORY_TOP_K) -> list:
+    """Recomputes a category's top list from scratch, e.g. after a bulk rescore."""
+    top_products = list(products_collection.aggregate(build_top_products_pipeline(category, k)))
+    top_collection.update_one(
+        {'_id': category},
+        {'$set': {'products': top_products}, '$currentDate': {'updatedAt': True}},
+        upsert=True,
+    )
+    return top_products
+
+
+# ==============================================================================
+# asyncio (motor) versions, used by async_processor.py
+# ==============================================================================
+
+async def get_category_top_async(top_collection, products_collection, category: str, k: int = CATEGORY_TOP_K) -> list:
+    """Async version of `get_category_top`."""
+    if top_collection is None:
+        cursor = products_collection.aggregate(build_top_products_pipeline(category, k))
+        return await cursor.to_list(length=None)
+
+    document = await top_collection.find_one({'_id': category}, {'products': 1})
+    if document is not None:
+        return document.get('products', [])
+
+    cursor = products_collection.aggregate(build_top_products_pipeline(category, k))
+    top_products = await cursor.to_list(length=None)
+    await top_collection.update_one({'_id': category}, _seed_update(top_products), upsert=True)
+    logger.info(f"Seeded top list for category '{category}' with {len(top_products)} product(s).")
+    return top_products
+
+
+async def add_to_category_top_async(top_collection, products_collection, product: dict, k: int = CATEGORY_TOP_K) -> None:
+    """Async version of `add_to_category_top`."""
+    category = product.get('category')
+    if top_collection is None or not category or category == 'Unknown':
+        return
+
+    entry = top_entry(product)
+    result = await top_collection.update_one(_push_filter(category, entry), _push_update(entry, k))
+    if result.matched_count:
+        return
+    if await top_collection.find_one({'_id': category}, {'_id': 1}) is not None:
+        return
+
+    cursor = products_collection.aggregate(build_top_products_pipeline(category, k))
+    top_products = await cursor.to_list(length=None)
+    result = await top_collection.update_one({'_id': category}, _seed_update(top_products), upsert=True)
+    if result.upserted_id is None:
+        await top_collection.update_one(_push_filter(category, entry), _push_update(entry, k))
@@ -0,0 +1,127 @@
+# scripts/content_hash.py
+# ==============================================================================
+# A stable fingerprint of what a product *is*, independent of where it is sold.
+#
+# The same product is often listed by several shops, or on several regional
+# Shopee domains, so its listing ID differs while the page text is nearly
+# identical. The fingerprint keeps only the brand, the name and the
+# specifications from the extension's plain-text dump, drops volatile lines
+# (price, ratings, stock, shipping, ...), normalizes case/whitespace/order,
+# and hashes the result. Products with the same hash share one LLM analysis.
+#
+# The extension's dump looks like:
+#     URL: https://shopee.sg/...
+#     Product Brand: ...
+#     Product Name: ...
+#     Product Specifications:
+#     Category: ...
+#     Material: ...
+#     Product Description: ...
+# ==============================================================================
+
+import hashlib
+import re
+
+from scripts.utils import clean_specifications
+
+# Bump when the normalization changes, so old and new hashes never collide
+CONTENT_HASH_VERSION = 1
+
+SECTION_PATTERN = re.compile(
+    r"^(URL|Product Brand|Product Name|Product Specifications|Product Description):\s*(.*)$",
+    re.IGNORECASE,
+)
+
+# Spec keys that change between listings of the same product
+VOLATILE_SPEC_KEYWORDS = (
+    'price', 'rating', 'review', 'sold', 'stock', 'ships from', 'shipping',
+    'voucher', 'discount', 'shop', 'sale', 'url', 'location',
+)
+
+PRICE_PATTERN = re.compile(
+    r"(?:[$€£₫฿₱]|\b(?:rm|sgd|s\$|rp|php|vnd|thb|myr|idr)\b)\s*\d[\d.,]*",
+    re.IGNORECASE,
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def parse_product_text(raw_text: str) -> dict:
+    """
+    Splits the extension's plain-text dump into its sections.
+
+    Returns:
+        A dictionary with 'url', 'brand', 'name' (strings), 'specifications'
+        (a dict of spec header -> text; headerless lines are keyed by their
+        position) and 'description' (string). Missing sections are empty.
+    """
+    parsed = {'url': '', 'brand': '', 'name': '', 'specifications': {}, 'description': ''}
+    section = None
+    description_lines = []
+    for line in (raw_text or '').splitlines():
+        match = SECTION_PATTERN.match(line.strip())
+        if match:
+            section = match.group(1).lower()
+            value = match.group(2).strip()
+            if section == 'url':
+                parsed['url'] = value
+            elif section == 'product brand':
+                parsed['brand'] = value
+            elif section == 'product name':
+                parsed['name'] = value
+            elif section == 'product description' and value:
+                description_lines.append(value)
+            continue
+
+        line = line.strip()
+        if not line:
+            continue
+        if section == 'product specifications':
+            key, sep, value = line.partition(':')
+            if sep and value.strip():
+                parsed['specifications'][key.strip()] = value.strip()
+            else:
+                parsed['specifications'][f"_{len(parsed['specifications'])}"] = line
+        elif section == 'product description':
+            description_lines.append(line)
+
+    parsed['description'] = '\n'.join(description_lines)
+    return parsed
+
+
+def _normalize(text: str) -> str:
+    text = PRICE_PATTERN.sub(' ', str(text).lower())
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def normalize_product_text(raw_text: str) -> str | None:
+    """
+    The canonical text the content hash is computed from: brand, name and
+    non-volatile specs, lowercased, whitespace-collapsed and with specs in a
+    fixed order. Returns None if the text has no brand, name or specs.
+    """
+    parsed = parse_product_text(raw_text)
+    specifications = clean_specifications(parsed['specifications'])
+
+    spec_lines = []
+    for key, value in specifications.items():
+        key = '' if key.startswith('_') else _normalize(key)
+        if any(keyword in key for keyword in VOLATILE_SPEC_KEYWORDS):
+            continue
+        value = _normalize(value)
+        if value:
+            spec_lines.append(f"{key}: {value}" if key else value)
+
+    brand = _normalize(parsed['brand'])
+    name = _normalize(parsed['name'])
+    if not (brand or name or spec_lines):
+        return None
+    return '\n'.join([f"brand: {brand}", f"name: {name}", *sorted(spec_lines)])
+
+
+def compute_content_hash(raw_text: str) -> str | None:
+    """SHA-256 of `normalize_product_text(raw_text)`, or None if there is nothing to hash."""
+    normalized = normalize_product_text(raw_text)
+    if normalized is None:
+        return None
+    digest = hashlib.sha256(f"v{CONTENT_HASH_VERSION}\n{normalized}".encode('utf-8')).hexdigest()
+    return f"v{CONTENT_HASH_VERSION}:{digest}"
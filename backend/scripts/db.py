@@ -1,9 +1,15 @@
 # db.py
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
-import certifi
-import ssl
+# Collections are handed out by getter functions backed by one shared, lazily
+# created MongoClient per process (scripts/mongo_pool.py). Importing this
+# module never connects to the server.
+from pymongo.errors import ConfigurationError, ConnectionFailure, PyMongoError
 import logging
+import os
+import threading
+import time
+
+from scripts.indexes import ensure_indexes, check_query_plans
+from scripts.mongo_pool import get_client
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO)
@@ -12,7 +18,6 @@ logger = logging.getLogger('db')
 # Import configuration variables from config.py (same directory)
 try:
     logger.info("Attempting to import config from db.py...")
-    import os
     logger.debug(f"db.py current working directory: {os.getcwd()}")
     logger.debug(f"db.py file location: {os.path.abspath(__file__)}")
     logger.debug(f"db.py directory: {os.path.dirname(os.path.abspath(__file__))}")
@@ -26,43 +31,155 @@ except ImportError as e:
     MONGO_DB = None
     MONGO_PRODUCTS_COLLECTION = None
 
-# Global variable to hold the collection object
-products_collection = None
+# Optional settings: older config.py files may not define these yet
+try:
+    from config import MONGO_LEASES_COLLECTION
+except ImportError:
+    MONGO_LEASES_COLLECTION = "product_leases"
+try:
+    from config import MONGO_TASKS_COLLECTION
+except ImportError:
+    MONGO_TASKS_COLLECTION = "tasks"
+try:
+    from config import MONGO_CATEGORY_TOP_COLLECTION
+except ImportError:
+    MONGO_CATEGORY_TOP_COLLECTION = "category_top_products"
+try:
+    from config import INDEX_CHECK_ON_STARTUP
+except ImportError:
+    INDEX_CHECK_ON_STARTUP = False
+
+# Logical name -> collection name, as used by scripts/indexes.py
+COLLECTION_NAMES = {
+    'products': MONGO_PRODUCTS_COLLECTION,
+    'leases': MONGO_LEASES_COLLECTION,
+    'tasks': MONGO_TASKS_COLLECTION,
+    'category_top': MONGO_CATEGORY_TOP_COLLECTION,
+}
 
-def connect_to_db():
+# Indexes are ensured once per process, the first time the database is used
+_indexes_ready = False
+_indexes_lock = threading.Lock()
+_indexes_retry_at = 0.0
+_configuration_error = None
+
+# After a failed attempt (server unreachable), wait this long before trying again
+INDEX_RETRY_SECONDS = 60
+
+
+def is_configured() -> bool:
+    settings = (MONGO_URI, MONGO_DB, MONGO_PRODUCTS_COLLECTION)
+    # config.py ships with "INSERT_YOUR_..." placeholders
+    return all(settings) and not any(str(value).startswith('INSERT_YOUR_') for value in settings)
+
+
+def get_mongo_client():
     """
-    Establishes a connection to the MongoDB database and returns the collection object.
+    This process's shared MongoClient (see mongo_pool.py), or None if MongoDB
+    is not configured. Creating it does not wait for the server.
     """
-    global products_collection
+    if not is_configured():
+        return None
+    try:
+        return get_client(MONGO_URI)
+    except ConfigurationError as e:
+        # e.g. the placeholder URI from config.py; run without MongoDB
+        global _configuration_error
+        if _configuration_error is None:
+            logger.error(f"Invalid MongoDB configuration: {e}")
+        _configuration_error = str(e)
+        return None
+
 
-    if MONGO_URI and MONGO_DB and MONGO_PRODUCTS_COLLECTION:
+def _ensure_indexes_once(database) -> None:
+    global _indexes_ready, _indexes_retry_at
+    if _indexes_ready or time.monotonic() < _indexes_retry_at:
+        return
+    with _indexes_lock:
+        if _indexes_ready or time.monotonic() < _indexes_retry_at:
+            return
         try:
-            # Create a new client and connect to the server
-            client = MongoClient(MONGO_URI, tls=True, tlsCAFile=certifi.where())
-            logger.info("MongoClient created.")
+            # All indexes are declared in scripts/indexes.py
+            ensure_indexes(database, COLLECTION_NAMES)
+            logger.info("Indexes are ready.")
+            if INDEX_CHECK_ON_STARTUP:
+                # Problems are logged as CRITICAL; `python -m scripts.indexes --check` fails on them
+                check_query_plans(database, COLLECTION_NAMES)
+        except PyMongoError as e:
+            # The query that triggered this will report the outage itself; don't
+            # make every caller wait out another server selection timeout
+            logger.error(f"Could not ensure indexes (retrying in {INDEX_RETRY_SECONDS}s): {e}")
+            _indexes_retry_at = time.monotonic() + INDEX_RETRY_SECONDS
+            return
+        _indexes_ready = True
 
-            # Send a ping to confirm a successful connection
-            client.admin.command('ping')
-            logger.info("Pinged your deployment. You successfully connected to MongoDB!")
 
-            # Get the database and collection
-            db = client[MONGO_DB]
-            products_collection = db[MONGO_PRODUCTS_COLLECTION]
-            logger.info(f"Ensuring unique index exists on collection: '{MONGO_PRODUCTS_COLLECTION}'...")
-            products_collection.create_index([("source_site", 1), ("listing_id", 1)], unique=True)
-            logger.info("Index is ready.")
+def get_database():
+    """The application database, or None if MongoDB is not configured."""
+    client = get_mongo_client()
+    if client is None:
+        return None
+    database = client[MONGO_DB]
+    _ensure_indexes_once(database)
+    return database
 
-            return products_collection
 
-        except ConnectionFailure as e:
-            logger.error(f"Could not connect to MongoDB: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"An error occurred: {e}")
-            return None
-    else:
+def _get_collection(name: str):
+    database = get_database()
+    return database[name] if database is not None else None
+
+
+def get_products_collection():
+    return _get_collection(MONGO_PRODUCTS_COLLECTION)
+
+
+def get_leases_collection():
+    # Lease documents used to coalesce concurrent LLM analyses across workers.
+    # The TTL index only cleans up leases left behind by crashed workers;
+    # expiry itself is enforced by the `expiresAt` check in singleflight.py.
+    return _get_collection(MONGO_LEASES_COLLECTION)
+
+
+def get_tasks_collection():
+    # Asynchronous analysis tasks (POST /tasks), drained by task_worker.py
+    return _get_collection(MONGO_TASKS_COLLECTION)
+
+
+def get_category_top_collection():
+    # Materialized per-category top lists (see category_top.py); keyed by _id
+    return _get_collection(MONGO_CATEGORY_TOP_COLLECTION)
+
+
+def _reset_after_fork() -> None:
+    global _indexes_lock
+    _indexes_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def connect_to_db():
+    """
+    Connects eagerly and pings the server, for command-line jobs that should
+    fail fast. Returns the products collection, or None if MongoDB is not
+    configured or not reachable. The web app does not call this; its
+    collections connect on first use.
+    """
+    if not is_configured():
         logger.error("Missing MongoDB configuration variables.")
         return None
-
-# Initialize the connection when this module is imported
-products_collection = connect_to_db()
\ No newline at end of file
+    try:
+        client = get_mongo_client()
+        if client is None:
+            return None
+        # Send a ping to confirm a successful connection
+        client.admin.command('ping')
+        logger.info("Pinged your deployment. You successfully connected to MongoDB!")
+        return get_products_collection()
+    except ConnectionFailure as e:
+        logger.error(f"Could not connect to MongoDB: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"An error occurred: {e}")
+        return None
@@ -0,0 +1,128 @@
+# scripts/hot_cache.py
+# ==============================================================================
+# A small in-process cache that sits in front of MongoDB.
+#
+# Popular listings are requested over and over; serving them from memory skips
+# the `find_one` and the recommendation `aggregate` round trips to Atlas.
+# Entries expire after a TTL and the least recently used entry is evicted once
+# the cache is full. Each gunicorn worker has its own copy.
+# ==============================================================================
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('hot_cache')
+
+try:
+    from config import (
+        HOT_CACHE_MAX_PRODUCTS,
+        HOT_CACHE_PRODUCT_TTL_SECONDS,
+        HOT_CACHE_MAX_CATEGORIES,
+        HOT_CACHE_RECOMMENDATION_TTL_SECONDS,
+    )
+except ImportError:
+    HOT_CACHE_MAX_PRODUCTS = 10000
+    HOT_CACHE_PRODUCT_TTL_SECONDS = 300
+    HOT_CACHE_MAX_CATEGORIES = 1000
+    HOT_CACHE_RECOMMENDATION_TTL_SECONDS = 60
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire after `ttl_seconds`.
+
+    Values are deep-copied on the way in and on the way out, so callers are
+    free to mutate what they get back (the processor does, when it prepares
+    the API response).
+    """
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key, value) -> None:
+        value = copy.deepcopy(value)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+# Stored product documents, keyed by (source_site, listing_id)
+product_cache = TTLCache('products', HOT_CACHE_MAX_PRODUCTS, HOT_CACHE_PRODUCT_TTL_SECONDS)
+
+# Top products per category, keyed by category name
+recommendation_cache = TTLCache('recommendations', HOT_CACHE_MAX_CATEGORIES, HOT_CACHE_RECOMMENDATION_TTL_SECONDS)
+
+
+def invalidate_product(source_site: str, listing_id: str, category: str | None = None) -> None:
+    """Drops cached entries that a newly written product makes stale."""
+    product_cache.invalidate((source_site, listing_id))
+    if category:
+        recommendation_cache.invalidate(category)
+
+
+def get_cache_stats() -> dict:
+    return {
+        'products': product_cache.stats(),
+        'recommendations': recommendation_cache.stats(),
+    }
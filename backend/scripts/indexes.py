@@ -0,0 +1,255 @@
+# scripts/indexes.py
+# ==============================================================================
+# Declarative index management and query-plan verification.
+#
+# INDEX_SPECS lists every index the backend's queries rely on, per collection.
+# `ensure_indexes` creates the missing ones on first use of the database (db.get_database) and
+# reports indexes whose options differ from the spec instead of silently
+# keeping them. HOT_QUERIES mirrors the queries on the request path;
+# `check_query_plans` runs explain() on each and reports any that would scan
+# the whole collection (COLLSCAN).
+#
+# Run from backend/:
+#     python -m scripts.indexes                     # ensure indexes
+#     python -m scripts.indexes --check             # ... and verify query plans (exit 1 on COLLSCAN)
+#     python -m scripts.indexes --drop-conflicting  # rebuild indexes whose options changed
+#
+# When you add a query on a new field, add its index here and the query to
+# HOT_QUERIES.
+# ==============================================================================
+
+import argparse
+import logging
+import sys
+
+from bson import ObjectId
+
+from scripts.category_top import build_top_products_pipeline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('indexes')
+
+# Index options that make two indexes on the same keys different, with their defaults
+COMPARED_OPTIONS = {
+    'unique': False,
+    'sparse': False,
+    'expireAfterSeconds': None,
+    'partialFilterExpression': None,
+}
+
+# Keyed by logical collection name; see db.COLLECTION_NAMES for the real names
+INDEX_SPECS = {
+    'products': [
+        {
+            'keys': [('source_site', 1), ('listing_id', 1)],
+            'options': {'unique': True},
+            'purpose': 'listing lookup (the cache key) and batch $in lookups',
+        },
+        {
+            'keys': [('category', 1), ('default_sustainability_score', -1)],
+            'options': {},
+            'purpose': 'category top-list seeding and rebuilds (recommendations)',
+        },
+        {
+            'keys': [('content_hash', 1)],
+            'options': {'partialFilterExpression': {'content_hash': {'$exists': True}}},
+            'purpose': 'content-hash analysis reuse; only documents that have a hash',
+        },
+    ],
+    'leases': [
+        {
+            'keys': [('expiresAt', 1)],
+            'options': {'expireAfterSeconds': 0},
+            'purpose': 'TTL cleanup of leases left behind by crashed workers',
+        },
+    ],
+    'tasks': [
+        {
+            'keys': [('status', 1), ('createdAt', 1)],
+            'options': {},
+            'purpose': 'task workers claiming the oldest new/stale task',
+        },
+    ],
+}
+
+_PLACEHOLDER = '__index_check__'
+
+# (label, logical collection, kind, spec) for explain(); kind is 'find' or 'aggregate'
+HOT_QUERIES = [
+    ('product lookup', 'products', 'find', {
+        'filter': {'source_site': _PLACEHOLDER, 'listing_id': _PLACEHOLDER},
+    }),
+    ('batch lookup', 'products', 'find', {
+        'filter': {'source_site': _PLACEHOLDER, 'listing_id': {'$in': [_PLACEHOLDER, _PLACEHOLDER + '2']}},
+    }),
+    ('content-hash lookup', 'products', 'find', {
+        'filter': {'content_hash': _PLACEHOLDER},
+    }),
+    ('near-duplicate index refresh', 'products', 'find', {
+        'filter': {'minhash': {'$exists': True}, '_id': {'$gt': ObjectId('0' * 24)}},
+        'sort': [('_id', 1)],
+    }),
+    ('category top-list seed', 'products', 'aggregate', {
+        'pipeline': build_top_products_pipeline(_PLACEHOLDER),
+    }),
+    ('category top list', 'category_top', 'find', {
+        'filter': {'_id': _PLACEHOLDER},
+    }),
+    ('task claim', 'tasks', 'find', {
+        'filter': {'$or': [
+            {'status': 'new'},
+            {'status': 'processing', 'updatedAt': {'$lt': 0}},
+        ]},
+        'sort': [('createdAt', 1)],
+        'limit': 1,
+    }),
+]
+
+
+def _normalize_keys(keys) -> tuple:
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in keys)
+
+
+def ensure_indexes(database, collection_names: dict, drop_conflicting: bool = False) -> list[str]:
+    """
+    Creates every index in INDEX_SPECS that doesn't exist yet.
+
+    An existing index on the same keys with different options is reported
+    (and left alone) unless `drop_conflicting` is set, in which case it is
+    dropped and recreated.
+
+    Returns:
+        A list of problems; empty if all indexes match the specs.
+    """
+    problems = []
+    for logical_name, specs in INDEX_SPECS.items():
+        collection = database[collection_names[logical_name]]
+        existing = {
+            _normalize_keys(info['key']): (name, info)
+            for name, info in collection.index_information().items()
+        }
+        for spec in specs:
+            keys = _normalize_keys(spec['keys'])
+            options = spec.get('options', {})
+            if keys in existing:
+                name, info = existing[keys]
+                differences = {
+                    option: (info.get(option, default), options.get(option, default))
+                    for option, default in COMPARED_OPTIONS.items()
+                    if info.get(option, default) != options.get(option, default)
+                }
+                if not differences:
+                    continue
+                if not drop_conflicting:
+                    problem = (f"{collection.name}: index '{name}' has options {differences} "
+                               f"(existing, wanted); rerun with --drop-conflicting to rebuild it")
+                    logger.error(problem)
+                    problems.append(problem)
+                    continue
+                logger.warning(f"{collection.name}: dropping index '{name}' to rebuild it with {options}")
+                collection.drop_index(name)
+
+            name = collection.create_index(list(keys), **options)
+            logger.info(f"{collection.name}: created index '{name}' ({spec['purpose']})")
+    return problems
+
+
+def _plan_stages(node) -> set[str]:
+    """All stage names in an explain() plan tree (classic and SBE formats)."""
+    stages = set()
+    if isinstance(node, dict):
+        if isinstance(node.get('stage'), str):
+            stages.add(node['stage'])
+        for value in node.values():
+            stages |= _plan_stages(value)
+    elif isinstance(node, list):
+        for item in node:
+            stages |= _plan_stages(item)
+    return stages
+
+
+def _winning_plans(explain_result) -> list:
+    """The `winningPlan` of every queryPlanner section (aggregations may nest them)."""
+    plans = []
+    if isinstance(explain_result, dict):
+        for key, value in explain_result.items():
+            if key == 'winningPlan':
+                plans.append(value)
+            else:
+                plans.extend(_winning_plans(value))
+    elif isinstance(explain_result, list):
+        for item in explain_result:
+            plans.extend(_winning_plans(item))
+    return plans
+
+
+def explain_query(database, collection_names: dict, logical_name: str, kind: str, spec: dict) -> set[str]:
+    """Runs explain() for one HOT_QUERIES entry and returns the stages of its winning plan(s)."""
+    collection = database[collection_names[logical_name]]
+    if kind == 'aggregate':
+        result = database.command('aggregate', collection.name, pipeline=spec['pipeline'], explain=True)
+    else:
+        cursor = collection.find(spec['filter'])
+        if spec.get('sort'):
+            cursor = cursor.sort(spec['sort'])
+        if spec.get('limit'):
+            cursor = cursor.limit(spec['limit'])
+        result = cursor.explain()
+    stages = set()
+    for plan in _winning_plans(result):
+        stages |= _plan_stages(plan)
+    return stages
+
+
+def check_query_plans(database, collection_names: dict) -> list[str]:
+    """
+    Explains every query in HOT_QUERIES.
+
+    Returns:
+        A list of problems: queries whose plan contains a COLLSCAN, or that
+        could not be explained.
+    """
+    problems = []
+    for label, logical_name, kind, spec in HOT_QUERIES:
+        try:
+            stages = explain_query(database, collection_names, logical_name, kind, spec)
+        except Exception as e:
+            problems.append(f"{label}: explain() failed: {e}")
+            continue
+        if 'COLLSCAN' in stages:
+            problems.append(f"{label}: COLLSCAN on '{collection_names[logical_name]}' (plan stages: {sorted(stages)})")
+        else:
+            logger.info(f"{label}: OK ({', '.join(sorted(stages))})")
+    for problem in problems:
+        logger.critical(f"QUERY PLAN CHECK FAILED: {problem}")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ensure MongoDB indexes and verify the hot query plans.")
+    parser.add_argument('--check', action='store_true',
+                        help='also explain() the hot queries and fail on any COLLSCAN')
+    parser.add_argument('--drop-conflicting', action='store_true',
+                        help='drop and recreate indexes whose options differ from INDEX_SPECS')
+    args = parser.parse_args(argv)
+
+    from scripts import db
+    if db.connect_to_db() is None:
+        print("Could not connect to MongoDB; check config.py.", file=sys.stderr)
+        return 2
+
+    database = db.get_mongo_client()[db.MONGO_DB]
+    problems = ensure_indexes(database, db.COLLECTION_NAMES, drop_conflicting=args.drop_conflicting)
+    if args.check:
+        problems += check_query_plans(database, db.COLLECTION_NAMES)
+
+    for problem in problems:
+        print(f"FAIL: {problem}", file=sys.stderr)
+    if not problems:
+        print("All indexes present" + (" and no hot query scans a collection." if args.check else "."))
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
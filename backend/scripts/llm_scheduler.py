@@ -0,0 +1,363 @@
+# scripts/llm_scheduler.py
+# ==============================================================================
+# Admission control, retries and a circuit breaker for LLM calls.
+#
+# Every provider call (single or multi-product) goes through `llm_scheduler`:
+#
+#   - Two token buckets hold the model's per-minute request and token quotas
+#     (LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE). A call waits until both
+#     can cover it; its tokens are estimated from the prompt text plus
+#     LLM_OUTPUT_TOKENS_PER_PRODUCT per product. Calls therefore run at the
+#     quota ceiling instead of bursting into 429s.
+#   - Two lanes: LANE_INTERACTIVE (a user waiting on the extension) and
+#     LANE_BACKGROUND (backfills). Background calls do not take quota while an
+#     interactive call is waiting for it. Interactive calls give up after
+#     LLM_INTERACTIVE_MAX_WAIT_SECONDS; background calls wait as long as needed.
+#   - Throttling, timeouts and 5xx errors are retried up to LLM_MAX_ATTEMPTS
+#     times with jittered exponential backoff. Other errors (bad answers,
+#     configuration problems) are raised at once.
+#   - After LLM_BREAKER_FAILURE_THRESHOLD consecutive retryable failures the
+#     breaker opens: calls fail fast with CircuitOpenError for
+#     LLM_BREAKER_COOLDOWN_SECONDS, then a single probe call decides whether
+#     it closes again.
+#
+# The state is per process: each gunicorn worker should get its share of the
+# quota (divide the rates by the number of workers).
+# ==============================================================================
+
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from scripts.logging_utils import log_event
+from scripts.prompt_compaction import estimate_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('llm_scheduler')
+
+try:
+    from config import (
+        LLM_REQUESTS_PER_MINUTE,
+        LLM_TOKENS_PER_MINUTE,
+        LLM_BURST_SECONDS,
+        LLM_OUTPUT_TOKENS_PER_PRODUCT,
+        LLM_MAX_ATTEMPTS,
+        LLM_BACKOFF_BASE_SECONDS,
+        LLM_BACKOFF_MAX_SECONDS,
+        LLM_BREAKER_FAILURE_THRESHOLD,
+        LLM_BREAKER_COOLDOWN_SECONDS,
+        LLM_INTERACTIVE_MAX_WAIT_SECONDS,
+    )
+except ImportError:
+    LLM_REQUESTS_PER_MINUTE = 900
+    LLM_TOKENS_PER_MINUTE = 900000
+    LLM_BURST_SECONDS = 10
+    LLM_OUTPUT_TOKENS_PER_PRODUCT = 600
+    LLM_MAX_ATTEMPTS = 4
+    LLM_BACKOFF_BASE_SECONDS = 1.0
+    LLM_BACKOFF_MAX_SECONDS = 30.0
+    LLM_BREAKER_FAILURE_THRESHOLD = 5
+    LLM_BREAKER_COOLDOWN_SECONDS = 30
+    LLM_INTERACTIVE_MAX_WAIT_SECONDS = 20
+
+LANE_INTERACTIVE = 'interactive'
+LANE_BACKGROUND = 'background'
+LANES = (LANE_INTERACTIVE, LANE_BACKGROUND)
+
+# Instructions and function schema around the product text, in tokens
+PROMPT_OVERHEAD_TOKENS = 400
+# How long a background call waits before looking again while interactive calls queue
+BACKGROUND_YIELD_SECONDS = 0.05
+# Longest single sleep while waiting for quota, so lane changes are noticed
+MAX_QUOTA_SLEEP_SECONDS = 1.0
+
+# HTTP statuses (google.api_core exceptions carry them as `.code`) and
+# exception class names that mean "try again later"
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    'ResourceExhausted', 'TooManyRequests', 'DeadlineExceeded', 'ServiceUnavailable',
+    'InternalServerError', 'GatewayTimeout', 'RetryError',
+}
+
+
+class LLMSchedulerError(RuntimeError):
+    """The scheduler refused to run an LLM call."""
+
+
+class CircuitOpenError(LLMSchedulerError):
+    """Recent calls kept failing; calls are rejected until the cooldown ends."""
+
+
+class QuotaWaitTimeout(LLMSchedulerError):
+    """An interactive call would have waited too long for quota."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether `error` is throttling or a transient failure of the LLM service."""
+    if isinstance(error, LLMSchedulerError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def estimate_call_tokens(texts: list[str]) -> int:
+    """Estimated input plus output tokens of one call analyzing `texts`."""
+    return (PROMPT_OVERHEAD_TOKENS + sum(estimate_tokens(text) for text in texts)
+            + LLM_OUTPUT_TOKENS_PER_PRODUCT * len(texts))
+
+
+class TokenBucket:
+    """A per-minute quota that refills continuously; not thread-safe on its own."""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60 if per_minute else 0.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0.0: available now)."""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.rate:
+            self.tokens -= min(amount, self.capacity)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures; one probe call after
+    `cooldown_seconds`. A probe that never reports back (cancelled, or gave up
+    waiting for quota) is replaced by another after a further cooldown.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_started = None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            if self.state == self.HALF_OPEN and (
+                    self._probe_started is None or now - self._probe_started >= self.cooldown_seconds):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("LLM circuit breaker closed.")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_started = None
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                if self.state == self.CLOSED:
+                    logger.warning(f"LLM circuit breaker opened after {self.consecutive_failures} "
+                                   f"consecutive failures; failing fast for {self.cooldown_seconds}s.")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class LLMScheduler:
+    """Runs LLM calls within the quotas, with retries and a circuit breaker (see the module header)."""
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+                 burst_seconds: float = LLM_BURST_SECONDS,
+                 max_attempts: int = LLM_MAX_ATTEMPTS,
+                 backoff_base_seconds: float = LLM_BACKOFF_BASE_SECONDS,
+                 backoff_max_seconds: float = LLM_BACKOFF_MAX_SECONDS,
+                 failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+                 cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS,
+                 interactive_max_wait_seconds: float | None = LLM_INTERACTIVE_MAX_WAIT_SECONDS):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.interactive_max_wait_seconds = interactive_max_wait_seconds
+        self.breaker = CircuitBreaker(failure_threshold, cooldown_seconds)
+        self._requests = TokenBucket(requests_per_minute, burst_seconds)
+        self._tokens = TokenBucket(tokens_per_minute, burst_seconds)
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._waiting = {lane: 0 for lane in LANES}
+        self._counters = {lane: {'calls': 0, 'retries': 0, 'failures': 0, 'rejected': 0, 'wait_seconds': 0.0}
+                          for lane in LANES}
+
+    def set_rates(self, requests_per_minute: float, tokens_per_minute: float,
+                  burst_seconds: float = LLM_BURST_SECONDS) -> None:
+        """Replaces the quotas (0 = unlimited), e.g. for benchmarks or a changed worker count."""
+        with self._lock:
+            self._requests = TokenBucket(requests_per_minute, burst_seconds)
+            self._tokens = TokenBucket(tokens_per_minute, burst_seconds)
+
+    # --- Quota ---
+
+    def _try_acquire(self, lane: str, tokens: int) -> float:
+        """Takes quota for one call and returns 0.0, or returns how long to wait before trying again."""
+        with self._lock:
+            if lane == LANE_BACKGROUND and self._waiting[LANE_INTERACTIVE]:
+                return BACKGROUND_YIELD_SECONDS
+            now = time.monotonic()
+            wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+            if wait <= 0:
+                self._requests.take(1)
+                self._tokens.take(tokens)
+            return wait
+
+    def _deadline(self, lane: str) -> float | None:
+        if lane == LANE_INTERACTIVE and self.interactive_max_wait_seconds is not None:
+            return time.monotonic() + self.interactive_max_wait_seconds
+        return None
+
+    def _enter(self, lane: str) -> None:
+        with self._lock:
+            self._waiting[lane] += 1
+
+    def _leave(self, lane: str, started: float) -> None:
+        with self._lock:
+            self._waiting[lane] -= 1
+            self._counters[lane]['wait_seconds'] += time.monotonic() - started
+
+    def _check_wait(self, lane: str, wait: float, deadline: float | None) -> float:
+        if deadline is not None and time.monotonic() + wait > deadline:
+            self._count(lane, 'rejected')
+            raise QuotaWaitTimeout(f"LLM quota exhausted; an {lane} call would wait more than "
+                                   f"{self.interactive_max_wait_seconds}s.")
+        return min(wait, MAX_QUOTA_SLEEP_SECONDS)
+
+    def acquire(self, lane: str, tokens: int) -> None:
+        """Blocks until the quotas allow one call of `tokens` estimated tokens."""
+        deadline, started = self._deadline(lane), time.monotonic()
+        self._enter(lane)
+        try:
+            while (wait := self._try_acquire(lane, tokens)) > 0:
+                time.sleep(self._check_wait(lane, wait, deadline))
+        finally:
+            self._leave(lane, started)
+
+    async def acquire_async(self, lane: str, tokens: int) -> None:
+        deadline, started = self._deadline(lane), time.monotonic()
+        self._enter(lane)
+        try:
+            while (wait := self._try_acquire(lane, tokens)) > 0:
+                await asyncio.sleep(self._check_wait(lane, wait, deadline))
+        finally:
+            self._leave(lane, started)
+
+    # --- Calls ---
+
+    def _count(self, lane: str, counter: str) -> None:
+        with self._lock:
+            self._counters[lane][counter] += 1
+
+    def _admit(self, lane: str) -> None:
+        if not self.breaker.allow():
+            self._count(lane, 'rejected')
+            raise CircuitOpenError("LLM calls are failing; circuit breaker is open.")
+        self._count(lane, 'calls')
+
+    def _backoff(self, lane: str, attempt: int, error: Exception) -> float | None:
+        """
+        Records a failed attempt. Returns the delay before the next attempt,
+        or None if the error should be raised.
+        """
+        if not is_retryable(error):
+            # The service answered; the problem is the request or the answer
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        self._count(lane, 'failures')
+        if attempt >= self.max_attempts or self.breaker.state == CircuitBreaker.OPEN:
+            return None
+        ceiling = min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** (attempt - 1))
+        with self._lock:
+            delay = self._random.uniform(ceiling / 2, ceiling)
+            self._counters[lane]['retries'] += 1
+        log_event(logger, logging.WARNING, "llm_retry", lane=lane, attempt=attempt,
+                  delay_s=round(delay, 2), error=type(error).__name__)
+        return delay
+
+    def run(self, call, lane: str = LANE_INTERACTIVE, tokens: int = 0):
+        """Runs `call()` within the quotas, retrying transient failures; returns its result."""
+        for attempt in range(1, self.max_attempts + 1):
+            self._admit(lane)
+            self.acquire(lane, tokens)
+            try:
+                result = call()
+            except Exception as e:
+                delay = self._backoff(lane, attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def run_async(self, call, lane: str = LANE_INTERACTIVE, tokens: int = 0):
+        """Async version of `run`; `call()` returns an awaitable."""
+        for attempt in range(1, self.max_attempts + 1):
+            self._admit(lane)
+            await self.acquire_async(lane, tokens)
+            try:
+                result = await call()
+            except Exception as e:
+                delay = self._backoff(lane, attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            lanes = {lane: {**counters, 'wait_seconds': round(counters['wait_seconds'], 3),
+                            'waiting': self._waiting[lane]}
+                     for lane, counters in self._counters.items()}
+        return {
+            'breaker': self.breaker.state,
+            'consecutive_failures': self.breaker.consecutive_failures,
+            'requests_per_minute': round(self._requests.rate * 60),
+            'tokens_per_minute': round(self._tokens.rate * 60),
+            'lanes': lanes,
+        }
+
+
+llm_scheduler = LLMScheduler()
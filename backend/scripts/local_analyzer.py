@@ -0,0 +1,222 @@
+# scripts/local_analyzer.py
+# ==============================================================================
+# A deterministic, offline stand-in for the LLM analyzer.
+#
+# Selected with ANALYZER_PROVIDER = "local" (config.py or the environment).
+# It returns the same `submit_sustainability_analysis` structure as Gemini,
+# derived from the page text alone: the name and brand sections, the most
+# specific step of the "Category: a > b > c" breadcrumb, and ratings from
+# material/production/end-of-life keywords (falling back to a hash of the
+# text). The same text always gets the same analysis.
+#
+# Each call waits LOCAL_ANALYZER_LATENCY_MS +/- LOCAL_ANALYZER_JITTER_MS and
+# fails a LOCAL_ANALYZER_ERROR_RATE fraction of the time, drawn from a seeded
+# generator. A multi-product call adds LOCAL_ANALYZER_BATCH_ITEM_MS per extra
+# product and leaves each product unanswered at the same error rate. With
+# LOCAL_ANALYZER_REQUESTS_PER_MINUTE set, calls beyond that many in the last
+# minute fail like a Gemini 429. Load tests and benchmarks thus exercise the
+# real pipeline (leases, batching, fallbacks, scheduler, error handling)
+# without network calls or API costs.
+# ==============================================================================
+
+import asyncio
+import collections
+import hashlib
+import logging
+import random
+import threading
+import time
+
+from scripts.analyzer import AnalyzerProvider
+from scripts.content_hash import parse_product_text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('local_analyzer')
+
+try:
+    from config import (
+        LOCAL_ANALYZER_LATENCY_MS,
+        LOCAL_ANALYZER_JITTER_MS,
+        LOCAL_ANALYZER_ERROR_RATE,
+        LOCAL_ANALYZER_SEED,
+        LOCAL_ANALYZER_BATCH_ITEM_MS,
+        LOCAL_ANALYZER_REQUESTS_PER_MINUTE,
+    )
+except ImportError:
+    LOCAL_ANALYZER_LATENCY_MS = 800
+    LOCAL_ANALYZER_JITTER_MS = 200
+    LOCAL_ANALYZER_ERROR_RATE = 0.0
+    LOCAL_ANALYZER_SEED = 0
+    LOCAL_ANALYZER_BATCH_ITEM_MS = 150
+    LOCAL_ANALYZER_REQUESTS_PER_MINUTE = 0
+
+RATINGS = ("Excellent", "Good", "Neutral", "Poor", "Unknown")
+
+# Per dimension: (keywords that improve the rating, keywords that worsen it)
+DIMENSION_KEYWORDS = {
+    "material_composition": (
+        ("recycled", "organic", "bamboo", "hemp", "linen", "natural rubber", "wool", "cork"),
+        ("polyester", "plastic", "pvc", "acrylic", "nylon", "synthetic leather", "pu leather"),
+    ),
+    "production_and_brand": (
+        ("fair trade", "certified", "gots", "fsc", "b corp", "oeko-tex", "carbon neutral"),
+        ("fast fashion", "unknown origin"),
+    ),
+    "circularity_and_end_of_life": (
+        ("biodegradable", "compostable", "recyclable", "repairable", "refillable", "take-back"),
+        ("single-use", "disposable", "non-recyclable"),
+    ),
+}
+
+
+class LocalAnalyzerError(RuntimeError):
+    """A simulated analyzer failure (transient, like a Gemini 503)."""
+
+    code = 503
+
+
+class LocalQuotaExceededError(LocalAnalyzerError):
+    """A simulated 429: more than `requests_per_minute` calls in the last minute."""
+
+    code = 429
+
+
+def _rating(text: str, dimension: str, fallback_byte: int) -> tuple[str, list[str]]:
+    positives, negatives = DIMENSION_KEYWORDS[dimension]
+    good = [keyword for keyword in positives if keyword in text]
+    bad = [keyword for keyword in negatives if keyword in text]
+    balance = len(good) - len(bad)
+    if balance >= 2:
+        return "Excellent", good
+    if balance == 1:
+        return "Good", good
+    if balance < 0:
+        return "Poor", bad
+    # No evidence either way: any rating, but always the same one for this text
+    return RATINGS[fallback_byte % len(RATINGS)], good + bad
+
+
+def _category(specifications: dict) -> str:
+    for key, value in specifications.items():
+        if key.strip().lower() == 'category':
+            steps = [step.strip() for step in value.split('>') if step.strip()]
+            if steps:
+                return steps[-1]
+    return "Unknown"
+
+
+def local_analysis(raw_text: str) -> dict:
+    """The deterministic `submit_sustainability_analysis` arguments for `raw_text`."""
+    parsed = parse_product_text(raw_text)
+    text = (raw_text or '').lower()
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+
+    sustainability_analysis = {}
+    for position, dimension in enumerate(DIMENSION_KEYWORDS):
+        rating, evidence = _rating(text, dimension, digest[position])
+        label = dimension.replace('_', ' ')
+        sustainability_analysis[dimension] = {
+            "analysis": (f"Local analysis of {label}: mentions {', '.join(evidence)}." if evidence
+                         else f"Local analysis of {label}: the page text does not mention it."),
+            "rating": rating,
+            "reasoning": "Keyword match on the product text (local analyzer, no LLM).",
+        }
+    return {
+        "product_name": parsed['name'] or "Unknown",
+        "brand": parsed['brand'] or "Unknown",
+        "category": _category(parsed['specifications']),
+        "sustainability_analysis": sustainability_analysis,
+    }
+
+
+class LocalAnalyzerProvider(AnalyzerProvider):
+    """Deterministic analyses with simulated latency and failures."""
+
+    name = 'local'
+
+    def __init__(self, latency_ms: float = LOCAL_ANALYZER_LATENCY_MS,
+                 jitter_ms: float = LOCAL_ANALYZER_JITTER_MS,
+                 error_rate: float = LOCAL_ANALYZER_ERROR_RATE,
+                 seed: int = LOCAL_ANALYZER_SEED,
+                 batch_item_ms: float = LOCAL_ANALYZER_BATCH_ITEM_MS,
+                 requests_per_minute: int = LOCAL_ANALYZER_REQUESTS_PER_MINUTE):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.batch_item_ms = batch_item_ms
+        self.requests_per_minute = requests_per_minute
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._accepted = collections.deque()
+        self.calls = 0
+        self.failures = 0
+        self.throttled = 0
+        self.products = 0
+
+    def _check_quota(self) -> None:
+        # Called with self._lock held
+        if not self.requests_per_minute:
+            return
+        now = time.monotonic()
+        while self._accepted and now - self._accepted[0] >= 60:
+            self._accepted.popleft()
+        if len(self._accepted) >= self.requests_per_minute:
+            self.throttled += 1
+            raise LocalQuotaExceededError("Simulated quota exceeded (429).")
+        self._accepted.append(now)
+
+    def _draw(self, products: int = 1) -> tuple[float, bool, list[bool]]:
+        """This call's delay in seconds, whether it fails, and which products it leaves unanswered."""
+        with self._lock:
+            self._check_quota()
+            self.calls += 1
+            self.products += products
+            delay_ms = (self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+                        + (products - 1) * self.batch_item_ms)
+            fails = self._random.random() < self.error_rate
+            if fails:
+                self.failures += 1
+            dropped = [products > 1 and self._random.random() < self.error_rate for _ in range(products)]
+        return max(0.0, delay_ms) / 1000, fails, dropped
+
+    def _answers(self, raw_texts: list[str], dropped: list[bool]) -> list[dict | None]:
+        return [None if drop else local_analysis(raw_text) for raw_text, drop in zip(raw_texts, dropped)]
+
+    def analyze(self, raw_text: str) -> dict:
+        delay, fails, _ = self._draw()
+        time.sleep(delay)
+        if fails:
+            raise LocalAnalyzerError("Simulated analyzer failure.")
+        return local_analysis(raw_text)
+
+    async def analyze_async(self, raw_text: str) -> dict:
+        delay, fails, _ = self._draw()
+        await asyncio.sleep(delay)
+        if fails:
+            raise LocalAnalyzerError("Simulated analyzer failure.")
+        return local_analysis(raw_text)
+
+    def analyze_many(self, raw_texts: list[str]) -> list[dict | None]:
+        delay, fails, dropped = self._draw(len(raw_texts))
+        time.sleep(delay)
+        if fails:
+            raise LocalAnalyzerError("Simulated analyzer failure.")
+        return self._answers(raw_texts, dropped)
+
+    async def analyze_many_async(self, raw_texts: list[str]) -> list[dict | None]:
+        delay, fails, dropped = self._draw(len(raw_texts))
+        await asyncio.sleep(delay)
+        if fails:
+            raise LocalAnalyzerError("Simulated analyzer failure.")
+        return self._answers(raw_texts, dropped)
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'products': self.products,
+            'failures': self.failures,
+            'throttled': self.throttled,
+            'latency_ms': self.latency_ms,
+            'jitter_ms': self.jitter_ms,
+            'error_rate': self.error_rate,
+        }
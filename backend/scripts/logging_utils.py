@@ -0,0 +1,127 @@
+# scripts/logging_utils.py
+# ==============================================================================
+# Logging helpers for the request hot path.
+#
+#   - `LazyJson` defers `json.dumps` until a record is actually emitted, so a
+#     DEBUG dump of a whole product document costs nothing at INFO level.
+#   - `log_event` emits one compact event with key/value fields, and builds
+#     nothing at all when its level is disabled.
+#   - Every record carries the current request ID (see `set_request_id`).
+#   - `configure_logging` picks plain text or single-line JSON output
+#     (LOG_FORMAT) and the level (LOG_LEVEL), from config.py or the environment.
+#
+# Usage:
+#     logger.debug("Analysis result: %s", LazyJson(analysis_json))
+#     log_event(logger, logging.INFO, "cache_hit", listing_id=listing_id)
+# ==============================================================================
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+try:
+    from config import LOG_LEVEL, LOG_FORMAT
+except ImportError:
+    LOG_LEVEL = "INFO"
+    LOG_FORMAT = "text"
+
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def set_request_id(request_id: str | None = None) -> str:
+    """Tags all log records from the current thread/task with `request_id`."""
+    request_id = request_id or new_request_id()
+    request_id_var.set(request_id)
+    return request_id
+
+
+class LazyJson:
+    """
+    Serializes `obj` to JSON only when the log record is formatted.
+
+    Pass it as a %-style argument (not inside an f-string), otherwise the
+    serialization happens eagerly again.
+    """
+    __slots__ = ('obj', 'indent', 'max_chars')
+
+    def __init__(self, obj, indent: int | None = None, max_chars: int | None = None):
+        self.obj = obj
+        self.indent = indent
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        separators = None if self.indent else (',', ':')
+        try:
+            text = json.dumps(self.obj, indent=self.indent, separators=separators, default=str, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            text = f"<unserializable {type(self.obj).__name__}: {e}>"
+        if self.max_chars is not None and len(text) > self.max_chars:
+            text = f"{text[:self.max_chars]}...(+{len(text) - self.max_chars} chars)"
+        return text
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields) -> None:
+    """Logs a named event with structured fields, if `level` is enabled."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields}, stacklevel=2)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """The existing human-readable format, plus request ID and event fields."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - [%(request_id)s] %(name)s - %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            text += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per line, for log shipping."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            event.update(fields)
+        if record.exc_info:
+            event['exc'] = self.formatException(record.exc_info)
+        return json.dumps(event, separators=(',', ':'), default=str, ensure_ascii=False)
+
+
+def configure_logging(level: str | None = None, log_format: str | None = None) -> None:
+    """
+    Replaces the root handlers set up by the modules' `basicConfig` calls.
+    Environment variables LOG_LEVEL / LOG_FORMAT override config.py.
+    """
+    level = (level or os.environ.get('LOG_LEVEL') or LOG_LEVEL).upper()
+    log_format = (log_format or os.environ.get('LOG_FORMAT') or LOG_FORMAT).lower()
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+    logging.basicConfig(level=level, handlers=[handler], force=True)
@@ -0,0 +1,161 @@
+# scripts/mongo_pool.py
+# ==============================================================================
+# One MongoClient per process, created on first use.
+#
+# A MongoClient is a connection pool plus background monitor threads; it is
+# meant to be created once and shared. Nothing here touches the network at
+# import time: `get_client()` builds the client the first time a query needs
+# it, and pymongo connects in the background. The client is fork-safe in the
+# sense that matters for gunicorn: a client inherited from the parent process
+# (its sockets and threads do not survive fork) is dropped, and the child
+# builds its own on first use.
+#
+# Pool size, timeouts, read preference and TLS come from config.py (MONGO_*).
+# TLS is forced only for mongodb+srv:// URIs (Atlas) or when MONGO_TLS is set;
+# any other URI keeps its own tls option, so a local mongod works as is.
+# `PoolStatsListener` counts connection pool events so /db/pool/stats can
+# show whether requests are waiting for connections.
+# ==============================================================================
+
+import logging
+import os
+import threading
+
+import certifi
+from pymongo import MongoClient, monitoring
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('mongo_pool')
+
+try:
+    from config import (
+        MONGO_MAX_POOL_SIZE,
+        MONGO_MIN_POOL_SIZE,
+        MONGO_MAX_IDLE_TIME_MS,
+        MONGO_CONNECT_TIMEOUT_MS,
+        MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        MONGO_SOCKET_TIMEOUT_MS,
+        MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        MONGO_READ_PREFERENCE,
+        MONGO_TLS,
+    )
+except ImportError:
+    MONGO_MAX_POOL_SIZE = 50
+    MONGO_MIN_POOL_SIZE = 0
+    MONGO_MAX_IDLE_TIME_MS = 300000
+    MONGO_CONNECT_TIMEOUT_MS = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+    MONGO_SOCKET_TIMEOUT_MS = 30000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = 5000
+    MONGO_READ_PREFERENCE = "primary"
+    MONGO_TLS = False
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events for this process (all servers combined)."""
+
+    _COUNTERS = (
+        'connections_created', 'connections_closed', 'checkouts_started',
+        'checked_out', 'checked_in', 'checkout_failures', 'pools_cleared',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = dict.fromkeys(self._COUNTERS, 0)
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counts[counter] += 1
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+
+    def pool_cleared(self, event): self._count('pools_cleared')
+    def connection_created(self, event): self._count('connections_created')
+    def connection_closed(self, event): self._count('connections_closed')
+    def connection_check_out_started(self, event): self._count('checkouts_started')
+    def connection_checked_out(self, event): self._count('checked_out')
+    def connection_check_out_failed(self, event): self._count('checkout_failures')
+    def connection_checked_in(self, event): self._count('checked_in')
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        counts['open_connections'] = counts['connections_created'] - counts['connections_closed']
+        counts['in_use'] = counts['checked_out'] - counts['checked_in']
+        # Checkouts that have neither succeeded nor failed yet are queued for a connection
+        counts['waiting'] = counts['checkouts_started'] - counts['checked_out'] - counts['checkout_failures']
+        return counts
+
+
+pool_stats_listener = PoolStatsListener()
+
+
+def client_options(mongo_uri: str) -> dict:
+    """Keyword arguments shared by the pymongo and motor clients for `mongo_uri`."""
+    options = {
+        'maxPoolSize': MONGO_MAX_POOL_SIZE,
+        'minPoolSize': MONGO_MIN_POOL_SIZE,
+        'maxIdleTimeMS': MONGO_MAX_IDLE_TIME_MS,
+        'connectTimeoutMS': MONGO_CONNECT_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'socketTimeoutMS': MONGO_SOCKET_TIMEOUT_MS,
+        'waitQueueTimeoutMS': MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        'readPreference': MONGO_READ_PREFERENCE,
+        'event_listeners': [pool_stats_listener],
+    }
+    if MONGO_TLS or mongo_uri.startswith('mongodb+srv://'):
+        options['tls'] = True
+        options['tlsCAFile'] = certifi.where()
+    return options
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client(mongo_uri: str) -> MongoClient:
+    """This process's shared client for `mongo_uri`, created on first call."""
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            # Never reuse (or close) a client inherited across fork()
+            _client = MongoClient(mongo_uri, **client_options(mongo_uri))
+            _client_pid = pid
+            logger.info(f"MongoClient created for pid {pid} (maxPoolSize={MONGO_MAX_POOL_SIZE}, "
+                        f"readPreference={MONGO_READ_PREFERENCE}).")
+        return _client
+
+
+def _reset_after_fork() -> None:
+    global _client, _client_pid, _client_lock
+    _client = None
+    _client_pid = None
+    _client_lock = threading.Lock()
+    pool_stats_listener.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_pool_stats() -> dict:
+    return {
+        'pid': os.getpid(),
+        'client_created': _client is not None and _client_pid == os.getpid(),
+        'max_pool_size': MONGO_MAX_POOL_SIZE,
+        'min_pool_size': MONGO_MIN_POOL_SIZE,
+        'read_preference': MONGO_READ_PREFERENCE,
+        **pool_stats_listener.stats(),
+    }
@@ -0,0 +1,198 @@
+# scripts/near_duplicates.py
+# ==============================================================================
+# Near-duplicate detection across listings, with MinHash + LSH.
+#
+# The content hash (content_hash.py) only matches identical product text.
+# Many listings are the same SKU with a slightly different title or an extra
+# spec line; for those we compare MinHash signatures of the brand, name and
+# spec text. A signature is stored with each product document (`minhash`), so
+# the index is rebuilt from the collection when a worker first needs it and
+# topped up with newer documents as it goes. Candidates are found through LSH
+# banding and confirmed against NEAR_DUP_THRESHOLD (estimated Jaccard
+# similarity) before an analysis is reused.
+#
+# No extra dependency: one SHAKE-128 digest per shingle provides all the
+# permutations, so a 128-permutation signature of a product page takes about
+# half a millisecond.
+# ==============================================================================
+
+import hashlib
+import logging
+import re
+import struct
+import threading
+import time
+
+from scripts.content_hash import normalize_product_text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('near_duplicates')
+
+try:
+    from config import (
+        NEAR_DUP_ENABLED,
+        NEAR_DUP_THRESHOLD,
+        NEAR_DUP_NUM_PERM,
+        NEAR_DUP_BANDS,
+        NEAR_DUP_REFRESH_SECONDS,
+    )
+except ImportError:
+    NEAR_DUP_ENABLED = True
+    NEAR_DUP_THRESHOLD = 0.9
+    NEAR_DUP_NUM_PERM = 128
+    NEAR_DUP_BANDS = 16
+    NEAR_DUP_REFRESH_SECONDS = 60
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def product_shingles(raw_text: str) -> set[str]:
+    """
+    Word unigrams and bigrams of the normalized brand/name/spec text (see
+    `content_hash.normalize_product_text`), per line so that neighbouring
+    specs don't form bigrams.
+    """
+    normalized = normalize_product_text(raw_text)
+    if not normalized:
+        return set()
+    shingles = set()
+    for line in normalized.splitlines():
+        tokens = _TOKEN_PATTERN.findall(line)
+        shingles.update(tokens)
+        shingles.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return shingles
+
+
+class MinHasher:
+    """
+    MinHash where permutation i of a shingle is the i-th 32-bit word of its
+    SHAKE-128 digest (salted with `seed`). Signatures are comparable across
+    processes as long as `num_perm` and `seed` don't change.
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        self.num_perm = num_perm
+        self._salt = f"{seed}:".encode('utf-8')
+        self._unpack = struct.Struct(f"<{num_perm}I").unpack
+
+    def signature(self, shingles: set[str]) -> list[int] | None:
+        if not shingles:
+            return None
+        digest_size = 4 * self.num_perm
+        rows = [
+            self._unpack(hashlib.shake_128(self._salt + shingle.encode('utf-8')).digest(digest_size))
+            for shingle in shingles
+        ]
+        return [min(column) for column in zip(*rows)]
+
+
+def estimated_similarity(signature_a: list[int], signature_b: list[int]) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    if not signature_a or len(signature_a) != len(signature_b):
+        return 0.0
+    return sum(a == b for a, b in zip(signature_a, signature_b)) / len(signature_a)
+
+
+class NearDuplicateIndex:
+    """
+    In-memory LSH index over the `minhash` signatures stored in the products
+    collection, keyed by (source_site, listing_id).
+
+    With 128 permutations in 16 bands of 8 rows, a pair at 0.9 similarity
+    shares a band with probability > 0.999, while pairs below ~0.6 rarely do.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, threshold: float = 0.9,
+                 refresh_seconds: float = 60):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._signatures = {}   # key -> signature
+        self._buckets = {}      # (band, band values) -> set of keys
+        self._last_id = None    # newest _id loaded from the collection
+        self._last_refresh = None
+
+    def signature_for_text(self, raw_text: str) -> list[int] | None:
+        return self.hasher.signature(product_shingles(raw_text))
+
+    def _band_keys(self, signature: list[int]):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, tuple(signature[start:start + self.rows])
+
+    def add(self, key: tuple, signature: list[int] | None) -> None:
+        if not signature or len(signature) != self.hasher.num_perm:
+            return
+        with self._lock:
+            self._signatures[key] = signature
+            for band_key in self._band_keys(signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+
+    def best_match(self, signature: list[int] | None, exclude: tuple | None = None) -> tuple[tuple, float] | None:
+        """The most similar indexed product at or above the threshold, as `(key, similarity)`."""
+        if not signature:
+            return None
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            candidates.discard(exclude)
+            scored = [(estimated_similarity(signature, self._signatures[key]), key) for key in candidates]
+        if not scored:
+            return None
+        similarity, key = max(scored)
+        return (key, similarity) if similarity >= self.threshold else None
+
+    def needs_refresh(self) -> bool:
+        return self._last_refresh is None or time.monotonic() - self._last_refresh >= self.refresh_seconds
+
+    def refresh_query(self) -> dict:
+        """The `find` filter for documents this index hasn't loaded yet."""
+        query = {"minhash": {"$exists": True}}
+        if self._last_id is not None:
+            query["_id"] = {"$gt": self._last_id}
+        return query
+
+    def ingest(self, documents) -> int:
+        """Adds documents returned by `refresh_query` (sorted by _id) to the index."""
+        count = 0
+        for document in documents:
+            self.add((document['source_site'], document['listing_id']), document.get('minhash'))
+            self._last_id = document['_id']
+            count += 1
+        self._last_refresh = time.monotonic()
+        return count
+
+    def refresh(self, collection) -> None:
+        """Loads signatures added to `collection` since the last refresh (all of them, the first time)."""
+        started = time.perf_counter()
+        cursor = collection.find(
+            self.refresh_query(),
+            {"_id": 1, "source_site": 1, "listing_id": 1, "minhash": 1},
+        ).sort("_id", 1)
+        count = self.ingest(cursor)
+        if count:
+            logger.info(f"Near-duplicate index loaded {count} signature(s) in {(time.perf_counter() - started) * 1000:.0f} ms "
+                        f"({len(self._signatures)} total).")
+
+    def stats(self) -> dict:
+        return {
+            'products': len(self._signatures),
+            'buckets': len(self._buckets),
+            'threshold': self.threshold,
+            'num_perm': self.hasher.num_perm,
+            'bands': self.bands,
+        }
+
+
+near_duplicate_index = NearDuplicateIndex(
+    num_perm=NEAR_DUP_NUM_PERM,
+    bands=NEAR_DUP_BANDS,
+    threshold=NEAR_DUP_THRESHOLD,
+    refresh_seconds=NEAR_DUP_REFRESH_SECONDS,
+)
@@ -0,0 +1,348 @@
+# scripts/payload.py
+# ==============================================================================
+# The wire format between the extension and the backend: how request bodies
+# are decoded into a product URL + page text, and how processor results are
+# shaped into the JSON the extension expects. Shared by the Flask app
+# (app.py), the ASGI app (asgi.py) and the task workers.
+#
+# /extract_and_rate accepts, optionally gzip-compressed
+# (Content-Encoding: gzip):
+#
+#   - the structured product payload, as JSON or msgpack
+#     (application/msgpack, needs the msgpack package):
+#         {"v": 1, "url": ..., "brand": ..., "name": ...,
+#          "specs": [[header, text], ...], "desc": ...}
+#     `header` may be empty. The extension caps `desc` before sending.
+#   - the extension's older plain-text dump ("URL: ...\nProduct Brand: ...").
+#
+# /batch_rate accepts a JSON list of items (extract_batch_items), also
+# optionally gzip-compressed. Bodies are limited to REQUEST_MAX_BODY_BYTES
+# (BATCH_MAX_BODY_BYTES for /batch_rate), both as sent and decompressed.
+#
+# A structured payload is turned into the same text the plain-text dump
+# carries (format_product_text), so content hashes, near-duplicate
+# signatures and prompt compaction treat both formats alike.
+# ==============================================================================
+
+import re
+import json
+import hashlib
+import logging
+import zlib
+from datetime import datetime, timezone
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('payload')
+
+try:
+    from config import REQUEST_MAX_BODY_BYTES
+except ImportError:
+    REQUEST_MAX_BODY_BYTES = 2 * 1024 * 1024
+try:
+    from config import BATCH_MAX_BODY_BYTES
+except ImportError:
+    BATCH_MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# The extension's plain-text dump starts with a "URL: ..." line
+URL_LINE_PATTERN = re.compile(r"URL: (https?://[^\s]+)")
+
+# Structured payload versions this backend understands
+STRUCTURED_PAYLOAD_VERSIONS = (1,)
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+class PayloadError(ValueError):
+    """A request body that cannot be read; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def decompress_body(raw_bytes: bytes, content_encoding: str | None,
+                    max_bytes: int = REQUEST_MAX_BODY_BYTES) -> bytes:
+    """
+    Undoes a gzip/deflate Content-Encoding. Both the body as sent and the
+    decompressed body are capped at `max_bytes` (413 beyond), so a small
+    compressed body cannot expand without bound either.
+    """
+    if len(raw_bytes) > max_bytes:
+        raise PayloadError(f"Request body exceeds {max_bytes} bytes.", 413)
+    encoding = (content_encoding or '').strip().lower()
+    if encoding in ('', 'identity'):
+        return raw_bytes
+    if encoding not in ('gzip', 'x-gzip', 'deflate'):
+        raise PayloadError(f"Unsupported Content-Encoding '{content_encoding}'.", 415)
+    # wbits: 16 + MAX_WBITS expects a gzip header, MAX_WBITS a zlib one
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16 if 'gzip' in encoding else zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(raw_bytes, max_bytes + 1)
+    except zlib.error as e:
+        raise PayloadError(f"Request body is not valid {encoding}: {e}") from e
+    if len(body) > max_bytes or decompressor.unconsumed_tail:
+        raise PayloadError(f"Decompressed request body exceeds {max_bytes} bytes.", 413)
+    return body
+
+
+def is_structured_payload(data) -> bool:
+    return isinstance(data, dict) and 'v' in data
+
+
+def format_product_text(payload: dict) -> str:
+    """
+    The plain-text dump for a structured payload, line for line what the
+    extension's `formatAsPlainText` produced.
+    """
+    lines = [
+        f"URL: {payload.get('url') or ''}",
+        f"Product Brand: {payload.get('brand') or ''}",
+        f"Product Name: {payload.get('name') or ''}",
+    ]
+    spec_lines = []
+    for spec in payload.get('specs') or []:
+        if isinstance(spec, dict):
+            header, text = spec.get('header'), spec.get('text')
+        elif isinstance(spec, (list, tuple)) and len(spec) == 2:
+            header, text = spec
+        else:
+            header, text = None, spec if isinstance(spec, str) else None
+        if text:
+            spec_lines.append(f"{header}: {text}" if header else str(text))
+    lines.append('Product Specifications:' + ''.join(f"\n{line}" for line in spec_lines))
+    lines.append(f"Product Description: {payload.get('desc') or 'No description available'}")
+    return '\n'.join(lines)
+
+
+def structured_product_request(payload: dict) -> tuple[str | None, str]:
+    """`(product_url, raw_text)` for a structured payload; raises PayloadError for an unknown version."""
+    if payload.get('v') not in STRUCTURED_PAYLOAD_VERSIONS:
+        raise PayloadError(f"Unsupported payload version {payload.get('v')!r}.")
+    return payload.get('url') or None, format_product_text(payload)
+
+
+def read_product_request(raw_bytes: bytes, content_type: str | None,
+                         content_encoding: str | None = None) -> tuple[str | None, str | None]:
+    """
+    Decodes an /extract_and_rate body in any supported format (see the
+    module header).
+
+    Returns:
+        A `(product_url, raw_text)` tuple; either can be None.
+
+    Raises:
+        PayloadError: The body cannot be decompressed or decoded.
+    """
+    body = decompress_body(raw_bytes, content_encoding)
+    mime_type = (content_type or '').split(';')[0].strip().lower()
+    if mime_type in MSGPACK_CONTENT_TYPES:
+        if msgpack is None:
+            raise PayloadError("msgpack bodies are not supported (msgpack is not installed).", 415)
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise PayloadError(f"Request body is not valid msgpack: {e}") from e
+        if not is_structured_payload(data):
+            raise PayloadError("Expected a structured product payload.")
+        return structured_product_request(data)
+
+    raw_text = decode_body(body)
+    json_data = None
+    if mime_type == 'application/json' or mime_type.endswith('+json'):
+        try:
+            json_data = json.loads(raw_text)
+        except ValueError:
+            json_data = None
+    if is_structured_payload(json_data):
+        return structured_product_request(json_data)
+    return extract_product_request(raw_text, content_type, json_data)
+
+
+def decode_body(raw_bytes: bytes) -> str:
+    """Decodes a request body as UTF-8, falling back to latin-1."""
+    try:
+        # Try to decode as UTF-8 first
+        return raw_bytes.decode('utf-8', errors='strict')
+    except UnicodeDecodeError:
+        logger.warning("Failed to decode request body as UTF-8, trying 'latin-1' as fallback.")
+        return raw_bytes.decode('latin-1', errors='replace') # Common fallback
+
+
+def extract_product_request(raw_text: str | None, content_type: str | None, json_data=None) -> tuple[str | None, str | None]:
+    """
+    Pulls the product URL and the page text out of a decoded request.
+
+    Plain-text bodies carry the URL on their "URL: ..." line. JSON bodies
+    carry it in `url`, with the page text in `plainText` (as sent by some
+    versions of the extension).
+
+    Returns:
+        A `(product_url, raw_text)` tuple; either can be None.
+    """
+    if isinstance(json_data, dict):
+        return json_data.get('url'), json_data.get('plainText') or raw_text
+
+    product_url = None
+    if raw_text and 'text/plain' in (content_type or ''):
+        url_match = URL_LINE_PATTERN.search(raw_text)
+        if url_match:
+            product_url = url_match.group(1).strip()
+    return product_url, raw_text
+
+
+def extract_batch_items(payload) -> list[tuple[str | None, str]] | None:
+    """
+    Reads the items of a /batch_rate body: `{"items": [{"url", "plainText"}, ...]}`
+    or a bare list of such objects. An item without `url` falls back to the
+    "URL: ..." line of its page text. Items can also be structured payloads.
+
+    Returns:
+        A list of `(product_url, raw_text)` tuples in request order, or None
+        if the body is not a non-empty list of items.
+    """
+    items = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return None
+    pairs = []
+    for item in items:
+        if not isinstance(item, dict):
+            pairs.append((None, ''))
+            continue
+        if is_structured_payload(item):
+            try:
+                pairs.append(structured_product_request(item))
+            except PayloadError:
+                pairs.append((None, ''))
+            continue
+        raw_text = item.get('plainText') or ''
+        product_url = item.get('url') or item.get('product_url')
+        if not product_url:
+            product_url, _ = extract_product_request(raw_text, 'text/plain')
+        pairs.append((product_url, raw_text))
+    return pairs
+
+
+def read_batch_request(raw_bytes: bytes, content_encoding: str | None = None) -> list[tuple[str | None, str]] | None:
+    """
+    Decodes a /batch_rate body (JSON, optionally gzip-compressed) into its
+    items, as `extract_batch_items` returns them; None if it is not a JSON
+    list of items.
+
+    Raises:
+        PayloadError: The body is too large or cannot be decompressed.
+    """
+    body = decompress_body(raw_bytes, content_encoding, BATCH_MAX_BODY_BYTES)
+    try:
+        payload = json.loads(decode_body(body))
+    except ValueError:
+        return None
+    return extract_batch_items(payload)
+
+
+def format_batch_line(index: int, product_url: str | None, processed_result: dict | None, processing_time_ms: float) -> str:
+    """One NDJSON line of a /batch_rate response."""
+    if processed_result:
+        line = {
+            'index': index,
+            'url': product_url,
+            'success': True,
+            'data': build_response_data(processed_result, product_url, processing_time_ms),
+        }
+    else:
+        line = {
+            'index': index,
+            'url': product_url,
+            'success': False,
+            'error': 'Product analysis failed or the URL is not a Shopee product URL.',
+        }
+    return json.dumps(line, separators=(',', ':'), default=str) + '\n'
+
+
+def format_batch_error_line(completed: int) -> str:
+    """
+    The last NDJSON line of a /batch_rate response that failed part-way, so
+    the client can tell it from a stream that ended because every item was
+    rated. `completed` is the number of item lines sent before it.
+    """
+    line = {
+        'index': None,
+        'url': None,
+        'success': False,
+        'error': 'Batch processing failed; the remaining items were not rated.',
+        'completed': completed,
+    }
+    return json.dumps(line, separators=(',', ':')) + '\n'
+
+
+def format_task_text(payload: dict) -> str:
+    """Rebuilds the extension's plain-text page dump from a task's structured fields."""
+    lines = [
+        f"URL: {payload.get('product_url') or ''}",
+        f"Product Brand: {payload.get('product_brand') or ''}",
+        f"Product Name: {payload.get('product_name') or ''}",
+        "Product Specifications:",
+    ]
+    specifications = payload.get('specifications') or []
+    if isinstance(specifications, dict):
+        lines.extend(f"{key}: {value}" for key, value in specifications.items())
+    else:
+        for spec in specifications:
+            if isinstance(spec, dict) and spec.get('text'):
+                lines.append(f"{spec['header']}: {spec['text']}" if spec.get('header') else spec['text'])
+    return '\n'.join(lines)
+
+
+# Response fields that differ between two requests for the same stored product
+VOLATILE_RESPONSE_FIELDS = ('processing_time_ms', 'timestamp')
+
+
+def response_etag(data: dict) -> str:
+    """
+    The ETag of a product response (GET /score): a hash of everything in it
+    but the per-request timing fields, so it changes whenever the stored
+    document (analysis, scores, category) or its recommendations change.
+    """
+    stable = {key: value for key, value in data.items() if key not in VOLATILE_RESPONSE_FIELDS}
+    encoded = json.dumps(stable, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()[:20]
+
+
+def build_response_data(processed_result: dict, product_url: str | None, processing_time_ms: float) -> dict:
+    """
+    Shapes a shopee_processor result into the payload the extension expects.
+    Shared by both serving modes and the background task workers.
+    """
+    # The structure of 'result' should match what the extension expects
+    # Based on previous logs, it seems shopee_processor returns a dict that can be directly used.
+    # Debug the score extraction - check all possible score field names
+    sustainability_score = processed_result.get('sustainability_score')
+    alt_score = processed_result.get('score')
+    default_score = processed_result.get('default_sustainability_score')
+    
+    logger.debug(
+        "Score fields from processor: sustainability_score=%s score=%s default_sustainability_score=%s keys=%s",
+        sustainability_score, alt_score, default_score, list(processed_result),
+    )
+
+    # Use the first available score, prioritizing sustainability_score
+    final_score = sustainability_score if sustainability_score is not None else (alt_score if alt_score is not None else (default_score if default_score is not None else 0))
+    logger.debug("Final score being sent to frontend: %s", final_score)
+
+    return {
+        'url': product_url or processed_result.get('url'), # Prioritize initially parsed URL
+        'brand': processed_result.get('brand', 'Unknown'),
+        'brand_name': processed_result.get('brand', 'Unknown'),  # For consistency with frontend
+        'name': processed_result.get('product_name', processed_result.get('name', 'Unknown')),
+        'category': processed_result.get('category', 'Unknown'),
+        'score': final_score,
+        'breakdown': processed_result.get('sustainability_breakdown', {}),
+        'sustainability_breakdown': processed_result.get('sustainability_breakdown', {}),  # For consistency
+        'recommendations': processed_result.get('recommendations', []),
+        'raw_llm_response': processed_result.get('raw_llm_response', None), # For debugging LLM
+        'processing_time_ms': processing_time_ms,
+        'timestamp': datetime.now(timezone.utc).isoformat() + 'Z'
+    }
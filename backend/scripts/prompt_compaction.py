@@ -0,0 +1,281 @@
+# scripts/prompt_compaction.py
+# ==============================================================================
+# Shrinks the extension's page dump before it is sent to the LLM.
+#
+# The dump carries everything the content script could scrape: review and
+# rating snippets, shipping/return/stock boilerplate, size-chart rows,
+# hashtags and the same sentence repeated in specs and description. None of
+# it helps the sustainability analysis, and every input token costs latency
+# and money on each cache miss. `compact_product_text`:
+#
+#   - keeps URL, brand and name as they are;
+#   - runs the specifications through utils.clean_specifications and drops
+#     boilerplate spec lines (shipping, stock, price, ...);
+#   - splits the description into sentences/bullets (the content script
+#     collapses it onto one line), drops boilerplate and size-chart rows and
+#     repeats of earlier lines;
+#   - caps the description at PROMPT_DESCRIPTION_TOKEN_BUDGET tokens.
+#
+# Boilerplate is recognised by phrases ("free shipping", "ships within",
+# "return policy", "size chart", "Waist: 70 cm"), never by a lone word like
+# "waist" or "delivery", and a segment that mentions a sustainability term
+# (material, recycled, organic, packaging, certified, ...) is always kept:
+# losing one of those costs more than the tokens it saves.
+#
+#     python -m scripts.prompt_compaction --check   # verify COMPACTION_EXAMPLES
+#
+# Token counts are estimated at ~4 characters per token (no tokenizer
+# dependency, no API round-trip); they are for reporting, not billing.
+# ==============================================================================
+
+import argparse
+import math
+import re
+import sys
+import threading
+
+from scripts.content_hash import parse_product_text
+from scripts.utils import clean_specifications
+
+try:
+    from config import PROMPT_COMPACTION_ENABLED, PROMPT_DESCRIPTION_TOKEN_BUDGET
+except ImportError:
+    PROMPT_COMPACTION_ENABLED = True
+    PROMPT_DESCRIPTION_TOKEN_BUDGET = 400
+
+CHARS_PER_TOKEN = 4
+
+# Spec keys whose lines say nothing about the product itself
+BOILERPLATE_SPEC_KEYWORDS = (
+    'ships from', 'shipping', 'delivery', 'stock', 'price', 'voucher', 'discount',
+    'warranty type', 'shop', 'sold', 'rating', 'review', 'size chart',
+)
+
+# Description sentences/bullets to drop (matched case-insensitively). Only
+# phrases: a single word such as "waist" or "delivery" also turns up in
+# sentences about the product itself.
+BOILERPLATE_PATTERN = re.compile(
+    r"\b(?:\d(?:\.\d)? out of 5|\d(?:\.\d)? stars? rating|\d+(?:\.\d+)?k? (?:ratings|reviews|sold)"
+    r"|customer reviews|report abuse|was this (?:review )?helpful"
+    r"|free shipping|shipping (?:fee|cost|time|policy)|ships? (?:out )?(?:within|from|in \d+)"
+    r"|(?:will be )?(?:shipped|dispatched) (?:out )?(?:within|from|in \d+)|same[- ]day dispatch"
+    r"|delivery (?:time|fee|within|in \d+)|estimated delivery|cash on delivery|cod (?:available|accepted)"
+    r"|courier|tracking number"
+    r"|return policy|refund policy|exchange policy|(?:returns?|refunds?|exchanges?) (?:are )?(?:not )?(?:accepted|within)"
+    r"|no (?:returns?|refunds?|exchanges?)|ready stock|in stock|out of stock|pre-?order|restock"
+    r"|size (?:chart|guide)|(?:manual|hand) measurements?|measurements? (?:are )?in (?:cm|inch)"
+    r"|(?:bust|waist|hips?|chest|length|shoulder|sleeve)\s*[:=]?\s*\d+(?:\.\d+)?(?:cm|mm|in|inch|inches)?"
+    r"|(?:use|claim|collect) (?:our |the )?vouchers?|\d+% off|promo code|flash sale|free gift"
+    r"|chat (?:with )?us|follow (?:us|our shop)|add to cart|buy now"
+    r"|disclaimer|slight colou?r difference|\d+\s*-\s*\d+\s*cm error)\b",
+    re.IGNORECASE,
+)
+# Segments and spec lines naming one of these are never dropped as boilerplate
+SUSTAINABILITY_TERM_PATTERN = re.compile(
+    r"\b(?:materials?|fab(?:ric|rics)|recycl\w*|upcycl\w*|organic|packag\w*|certif\w*|sustainab\w*"
+    r"|eco[- ]?friendly|biodegrad\w*|compost\w*|plastic[- ]free|carbon|emissions?|fair ?trade|vegan"
+    r"|cotton|bamboo|hemp|linen|wool|leather|polyester|nylon|repair\w*|refill\w*|reusable|renewable"
+    r"|energy|fsc|gots|oeko[- ]?tex|bpa[- ]free)\b",
+    re.IGNORECASE,
+)
+HASHTAG_LINE_PATTERN = re.compile(r"^(?:#\S+\s*)+$")
+# Rows of a size table: mostly numbers and size letters ("M 38 70 cm")
+SIZE_ROW_TOKEN = re.compile(r"^(?:\d+(?:[.,]\d+)?(?:cm|mm|kg|g|in|inch|\")?|x{0,3}[sml]|xxl|cm|kg|[-/|:])$", re.IGNORECASE)
+SEGMENT_SPLIT_PATTERN = re.compile(r"\n+|(?<=[.!?])\s+(?=\S)|\s*(?:[•●▪►✓✔✅❤★☆]|\s-\s)\s*")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def _dedupe_key(text: str) -> str:
+    return WHITESPACE_PATTERN.sub(' ', re.sub(r"[^\w\s]", ' ', text.lower())).strip()
+
+
+def _is_size_row(segment: str) -> bool:
+    if not any(char.isdigit() for char in segment):
+        return False
+    tokens = segment.split()
+    if len(tokens) < 3:
+        return False
+    return sum(bool(SIZE_ROW_TOKEN.match(token)) for token in tokens) / len(tokens) >= 0.7
+
+
+def _keep_spec(key: str) -> bool:
+    key = key.lower()
+    return not any(keyword in key for keyword in BOILERPLATE_SPEC_KEYWORDS)
+
+
+def _is_boilerplate(segment: str) -> bool:
+    """Whether a description segment (or headerless spec line) can be dropped."""
+    if SUSTAINABILITY_TERM_PATTERN.search(segment):
+        return False
+    return bool(BOILERPLATE_PATTERN.search(segment) or HASHTAG_LINE_PATTERN.match(segment)
+                or _is_size_row(segment))
+
+
+# Description segments and whether compaction keeps them (`python -m scripts.prompt_compaction --check`)
+COMPACTION_EXAMPLES = {
+    'Made from 100% organic cotton with an elastic waist': True,
+    'Shipped in plastic-free compostable packaging': True,
+    'Carbon-neutral delivery on every order': True,
+    'Fair trade certified factory.': True,
+    'Elastic waist with an adjustable drawstring': True,
+    'Roomy chest pocket with a button flap': True,
+    'Five-star comfort for everyday wear': True,
+    'Easy exchange of the replaceable insole': True,
+    'Free shipping for orders above $20': False,
+    'Ships within 24 hours': False,
+    'Return policy: 7 days from delivery': False,
+    'Please check the size chart before ordering': False,
+    'Waist: 70 cm': False,
+    'Hip 92cm': False,
+    '4.9 out of 5 stars': False,
+    'Ready stock!': False,
+    'Please allow 1-3 cm error due to manual measurement': False,
+    'Follow our shop for more vouchers': False,
+    '#sneakers #fashion #ootd': False,
+    'S 36 70 cm': False,
+}
+
+
+def compact_product_text(raw_text: str, description_token_budget: int = PROMPT_DESCRIPTION_TOKEN_BUDGET) -> tuple[str, dict]:
+    """
+    The page dump with boilerplate, repeats and overlong descriptions removed.
+
+    Returns:
+        A `(compacted_text, stats)` tuple. `stats` has 'tokens_before',
+        'tokens_after', 'tokens_saved' (estimates), 'segments_dropped' and
+        'description_truncated'. Text without any of the dump's sections is
+        returned unchanged.
+    """
+    tokens_before = estimate_tokens(raw_text)
+    parsed = parse_product_text(raw_text)
+    if not (parsed['brand'] or parsed['name'] or parsed['specifications'] or parsed['description']):
+        return raw_text, {
+            'tokens_before': tokens_before, 'tokens_after': tokens_before, 'tokens_saved': 0,
+            'segments_dropped': 0, 'description_truncated': False,
+        }
+
+    seen = set()
+    dropped = 0
+
+    def is_new(text: str) -> bool:
+        key = _dedupe_key(text)
+        if not key or key in seen:
+            return False
+        seen.add(key)
+        return True
+
+    is_new(parsed['name'])
+
+    spec_lines = []
+    for key, value in clean_specifications(parsed['specifications']).items():
+        value = WHITESPACE_PATTERN.sub(' ', str(value)).strip()
+        if key.startswith('_'):
+            # Headerless lines are judged by their text, like description sentences
+            boilerplate = _is_boilerplate(value)
+        else:
+            boilerplate = not _keep_spec(key) and not SUSTAINABILITY_TERM_PATTERN.search(value)
+        if not value or boilerplate or not is_new(value):
+            dropped += 1
+            continue
+        spec_lines.append(value if key.startswith('_') else f"{key}: {value}")
+
+    segments, used, truncated = [], 0, False
+    for segment in SEGMENT_SPLIT_PATTERN.split(parsed['description']):
+        segment = WHITESPACE_PATTERN.sub(' ', segment or '').strip(' -*~=')
+        if not segment:
+            continue
+        if _is_boilerplate(segment) or not is_new(segment):
+            dropped += 1
+            continue
+        cost = estimate_tokens(segment) + 1
+        if used + cost > description_token_budget:
+            # Over budget: keep what fits of this segment (cut at a word) and stop
+            remaining_chars = (description_token_budget - used) * CHARS_PER_TOKEN
+            if remaining_chars > 40:
+                segments.append(segment[:remaining_chars].rsplit(' ', 1)[0] + ' ...')
+            truncated = True
+            break
+        segments.append(segment)
+        used += cost
+
+    lines = [
+        f"URL: {parsed['url']}",
+        f"Product Brand: {parsed['brand']}",
+        f"Product Name: {parsed['name']}",
+        "Product Specifications:",
+        *spec_lines,
+        f"Product Description: {' '.join(segments) or 'No description available'}",
+    ]
+    compacted = '\n'.join(lines)
+    tokens_after = estimate_tokens(compacted)
+    if tokens_after >= tokens_before:
+        # Nothing to gain (e.g. a very short dump); send the original
+        compacted, tokens_after = raw_text, tokens_before
+    return compacted, {
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after,
+        'segments_dropped': dropped,
+        'description_truncated': truncated,
+    }
+
+
+class CompactionStats:
+    """Running totals of the estimated tokens sent and saved in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, stats: dict) -> None:
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += stats['tokens_before']
+            self.tokens_after += stats['tokens_after']
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                'enabled': PROMPT_COMPACTION_ENABLED,
+                'requests': self.requests,
+                'tokens_before': self.tokens_before,
+                'tokens_after': self.tokens_after,
+                'tokens_saved': saved,
+                'saved_ratio': round(saved / self.tokens_before, 3) if self.tokens_before else 0.0,
+            }
+
+
+compaction_stats = CompactionStats()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compact a product page dump before it is sent to the LLM.")
+    parser.add_argument('--check', action='store_true', help='verify COMPACTION_EXAMPLES and exit')
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failures = {
+            segment: kept
+            for segment, kept in COMPACTION_EXAMPLES.items()
+            if _is_boilerplate(segment) == kept
+        }
+        for segment, kept in failures.items():
+            print(f"{segment!r} {'dropped' if kept else 'kept'}, expected {'kept' if kept else 'dropped'}", file=sys.stderr)
+        print(f"{len(COMPACTION_EXAMPLES) - len(failures)}/{len(COMPACTION_EXAMPLES)} examples OK")
+        return 1 if failures else 0
+
+    compacted, stats = compact_product_text(sys.stdin.read())
+    print(compacted)
+    print(stats, file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
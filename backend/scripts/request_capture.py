@@ -0,0 +1,212 @@
+# scripts/request_capture.py
+# ==============================================================================
+# Sampled capture of incoming extension requests for debugging.
+#
+# This replaces the old `entry.txt` dump, which rewrote one file synchronously
+# on every request (so concurrent requests overwrote each other and every
+# request paid for disk I/O). Now the request thread only decides whether to
+# sample and puts a record on a queue. A background thread writes sampled
+# records as NDJSON into gzip-compressed segment files, starts a new segment
+# once the current one reaches the size limit, and deletes the oldest
+# segments beyond the retention count.
+#
+# Read a segment with: zcat captures/capture-*.ndjson.gz | jq .
+# ==============================================================================
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('request_capture')
+
+try:
+    from config import (
+        CAPTURE_SAMPLE_RATE,
+        CAPTURE_DIR,
+        CAPTURE_MAX_SEGMENT_BYTES,
+        CAPTURE_MAX_SEGMENTS,
+        CAPTURE_MAX_BODY_CHARS,
+    )
+except ImportError:
+    CAPTURE_SAMPLE_RATE = 0.01
+    CAPTURE_DIR = "captures"
+    CAPTURE_MAX_SEGMENT_BYTES = 8 * 1024 * 1024
+    CAPTURE_MAX_SEGMENTS = 20
+    CAPTURE_MAX_BODY_CHARS = 200_000
+
+
+class RequestCaptureSink:
+    """
+    Non-blocking, sampled NDJSON capture with size-based rotation.
+
+    `capture()` never touches the disk. If the queue is full (the disk can't
+    keep up) the record is dropped and counted rather than slowing down the
+    request.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float = 0.01,
+        max_segment_bytes: int = 8 * 1024 * 1024,
+        max_segments: int = 20,
+        max_body_chars: int = 200_000,
+        queue_size: int = 1000,
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.max_body_chars = max_body_chars
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._raw_file = None
+        self._gzip_file = None
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.segments_written = 0
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1 or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def capture(self, record: dict, force: bool = False) -> bool:
+        """
+        Queues `record` for writing if it is sampled (or `force` is set, used
+        for server exceptions). Returns True if the record was queued.
+        """
+        if not force and not self.should_sample():
+            return False
+        body = record.get('body')
+        if isinstance(body, str) and len(body) > self.max_body_chars:
+            record['body'] = body[:self.max_body_chars]
+            record['body_truncated'] = True
+        record.setdefault('ts', datetime.now(timezone.utc).isoformat())
+        record.setdefault('pid', os.getpid())
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.captured += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'sample_rate': self.sample_rate,
+            'captured': self.captured,
+            'written': self.written,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+            'segments_written': self.segments_written,
+            'directory': self.directory,
+        }
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Waits (up to `timeout`) for queued records to reach the disk."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _ensure_started(self) -> None:
+        # A thread does not survive a gunicorn fork, so track the owning pid
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._raw_file = None
+            self._gzip_file = None
+            self._thread = threading.Thread(target=self._run, name='request-capture', daemon=True)
+            self._thread.start()
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        path = os.path.join(self.directory, f"capture-{stamp}-{os.getpid()}.ndjson.gz")
+        self._raw_file = open(path, 'wb')
+        self._gzip_file = gzip.GzipFile(fileobj=self._raw_file, mode='wb')
+        self.segments_written += 1
+        self._prune_segments()
+
+    def _close_segment(self) -> None:
+        if self._gzip_file is not None:
+            self._gzip_file.close()
+            self._raw_file.close()
+        self._gzip_file = None
+        self._raw_file = None
+
+    def _prune_segments(self) -> None:
+        segments = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith('capture-') and name.endswith('.ndjson.gz')
+        )
+        for name in segments[:-self.max_segments]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning(f"Could not remove old capture segment {name}: {e}")
+
+    def _write(self, record: dict) -> None:
+        if self._gzip_file is None:
+            self._open_segment()
+        line = json.dumps(record, separators=(',', ':'), default=str) + '\n'
+        self._gzip_file.write(line.encode('utf-8', 'replace'))
+        self.written += 1
+        # The raw file position is the compressed size flushed so far
+        if self._raw_file.tell() >= self.max_segment_bytes:
+            self._close_segment()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                record = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                # Idle: push buffered data to disk so segments are readable
+                if self._gzip_file is not None:
+                    self._gzip_file.flush()
+                continue
+            try:
+                self._write(record)
+            except Exception as e:
+                logger.error(f"Could not write request capture: {e}")
+                self._close_segment()
+            finally:
+                self._queue.task_done()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._gzip_file is not None:
+                self._close_segment()
+
+
+def exception_record(path: str) -> dict:
+    """A capture record for the exception currently being handled."""
+    return {'event': 'exception', 'path': path, 'traceback': traceback.format_exc()}
+
+
+_backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+request_capture = RequestCaptureSink(
+    directory=os.path.join(_backend_dir, CAPTURE_DIR),
+    sample_rate=CAPTURE_SAMPLE_RATE,
+    max_segment_bytes=CAPTURE_MAX_SEGMENT_BYTES,
+    max_segments=CAPTURE_MAX_SEGMENTS,
+    max_body_chars=CAPTURE_MAX_BODY_CHARS,
+)
+atexit.register(request_capture.close)
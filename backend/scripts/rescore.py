@@ -0,0 +1,193 @@
+# scripts/rescore.py
+# ==============================================================================
+# Bulk rescoring after a scorer change.
+#
+# Stored products keep the per-category scores (`sustainability_breakdown.
+# <category>.score`) and the `default_sustainability_score` computed when
+# they were analyzed. When RATING_SCORES or `calculate_weighted_score`
+# change, both go stale, and so does every recommendation ordering built on
+# them. This job recomputes them for the whole collection:
+#
+#   - Products are streamed in batches of --batch-size through an
+#     aggregation that projects each breakdown to its (category, rating,
+#     score) entries, so the long analysis texts never leave the server.
+#   - Category scores are looked up again from the rating with the current
+#     RATING_SCORES, and the final scores are computed for the whole batch
+#     at once (`scorer.calculate_weighted_scores`, vectorized with NumPy).
+#   - Only products whose scores changed are updated, with one unordered
+#     bulk_write per batch. Scores are small integers, so many products get
+#     the same change; they share one UpdateMany on their _ids.
+#   - Finally the top list of every category with a changed product is
+#     rebuilt (category_top.rebuild_category_top).
+#
+# Workers' hot caches pick up the new scores within
+# HOT_CACHE_PRODUCT_TTL_SECONDS / HOT_CACHE_RECOMMENDATION_TTL_SECONDS.
+#
+# Run from backend/:
+#     python -m scripts.rescore                 # rescore every product
+#     python -m scripts.rescore --dry-run       # only count the changes
+#     python -m scripts.rescore --batch-size 20000
+# ==============================================================================
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+from pymongo import UpdateMany
+
+from scripts.category_top import rebuild_category_top
+from scripts.logging_utils import log_event
+from scripts.scorer import RATING_SCORES, calculate_weighted_scores
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('rescore')
+
+DEFAULT_BATCH_SIZE = 5000
+# The score `calculate_weighted_score` assumes for a category without one
+MISSING_CATEGORY_SCORE = 3
+
+# Each product as {_id, category, default_sustainability_score,
+# breakdown: [{name, rating, score}, ...]} in breakdown order
+RESCORE_PIPELINE = [
+    {'$project': {
+        'category': 1,
+        'default_sustainability_score': 1,
+        'breakdown': {'$map': {
+            'input': {'$objectToArray': {'$ifNull': ['$sustainability_breakdown', {}]}},
+            'as': 'entry',
+            'in': {'name': '$$entry.k', 'rating': '$$entry.v.value', 'score': '$$entry.v.score'},
+        }},
+    }},
+]
+
+
+def category_score(rating, stored_score):
+    """A category's score under the current RATING_SCORES, as `generate_sustainability_breakdown` computes it."""
+    if rating is None:
+        return MISSING_CATEGORY_SCORE if stored_score is None else stored_score
+    return RATING_SCORES.get(rating, 0.0)
+
+
+def rescore_batch(products: list) -> tuple[list, int, set]:
+    """
+    The updates for one batch of projected products.
+
+    Returns:
+        An `(updates, changed, categories)` tuple: one UpdateMany per distinct
+        change, the number of products whose scores changed, and their categories.
+    """
+    rows = [
+        [category_score(entry.get('rating'), entry.get('score')) for entry in product.get('breakdown') or []]
+        for product in products
+    ]
+    final_scores = calculate_weighted_scores(rows)
+
+    ids_by_change, categories = {}, set()
+    for product, scores, final_score in zip(products, rows, final_scores):
+        changes = {}
+        if product.get('default_sustainability_score') != final_score:
+            changes['default_sustainability_score'] = final_score
+        for entry, score in zip(product.get('breakdown') or [], scores):
+            if entry.get('rating') is not None and entry.get('score') != score:
+                changes[f"sustainability_breakdown.{entry['name']}.score"] = score
+        if changes:
+            ids_by_change.setdefault(tuple(sorted(changes.items())), []).append(product['_id'])
+            categories.add(product.get('category'))
+
+    updates = [UpdateMany({'_id': {'$in': ids}}, {'$set': dict(change)}) for change, ids in ids_by_change.items()]
+    return updates, sum(len(ids) for ids in ids_by_change.values()), categories
+
+
+def _batches(cursor, size: int):
+    batch = []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rescore_products(products_collection, top_collection=None, batch_size: int = DEFAULT_BATCH_SIZE,
+                     dry_run: bool = False) -> dict:
+    """
+    Rescores every stored product (see the module header).
+
+    Returns:
+        Counters and timings: 'scanned', 'changed', 'update_operations',
+        'categories_rebuilt', 'read_s', 'compute_s', 'write_s', 'elapsed_s'
+        and 'products_per_s'.
+    """
+    total = products_collection.estimated_document_count()
+    stats = {'scanned': 0, 'changed': 0, 'update_operations': 0, 'categories_rebuilt': 0,
+             'read_s': 0.0, 'compute_s': 0.0, 'write_s': 0.0}
+    changed_categories = set()
+    started = time.monotonic()
+
+    cursor = products_collection.aggregate(RESCORE_PIPELINE, batchSize=batch_size)
+    batches = _batches(cursor, batch_size)
+    while True:
+        read_started = time.monotonic()
+        products = next(batches, None)
+        stats['read_s'] += time.monotonic() - read_started
+        if products is None:
+            break
+
+        compute_started = time.monotonic()
+        updates, changed, categories = rescore_batch(products)
+        stats['compute_s'] += time.monotonic() - compute_started
+
+        if updates and not dry_run:
+            write_started = time.monotonic()
+            products_collection.bulk_write(updates, ordered=False)
+            stats['write_s'] += time.monotonic() - write_started
+        stats['scanned'] += len(products)
+        stats['changed'] += changed
+        stats['update_operations'] += len(updates)
+        changed_categories |= categories
+
+        elapsed = time.monotonic() - started
+        rate = stats['scanned'] / elapsed if elapsed else 0.0
+        log_event(
+            logger, logging.INFO, "rescore_progress",
+            scanned=stats['scanned'], total=total, changed=stats['changed'],
+            products_per_s=round(rate), eta_s=round((total - stats['scanned']) / rate) if rate and total > stats['scanned'] else 0,
+        )
+
+    if not dry_run and top_collection is not None:
+        for category in sorted(changed_categories - {None, 'Unknown'}):
+            rebuild_category_top(top_collection, products_collection, category)
+            stats['categories_rebuilt'] += 1
+
+    stats['elapsed_s'] = time.monotonic() - started
+    stats['products_per_s'] = round(stats['scanned'] / stats['elapsed_s']) if stats['elapsed_s'] else 0
+    for key in ('read_s', 'compute_s', 'write_s', 'elapsed_s'):
+        stats[key] = round(stats[key], 3)
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute stored sustainability scores after a scorer change.")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'products per read/compute/write batch (default {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--dry-run', action='store_true', help='only count the products whose scores would change')
+    args = parser.parse_args(argv)
+
+    from scripts import db
+    if db.connect_to_db() is None:
+        print("Could not connect to MongoDB; check config.py.", file=sys.stderr)
+        return 2
+
+    stats = rescore_products(
+        db.get_products_collection(), db.get_category_top_collection(),
+        batch_size=max(1, args.batch_size), dry_run=args.dry_run,
+    )
+    print(json.dumps(stats))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,8 +12,11 @@ RATING_SCORES = {
     'Unknown': 3, # Penalize unknown, but not too much
 }
 
-import json
 import logging
+import sys
+from enum import IntEnum
+
+from scripts.logging_utils import LazyJson
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('scorer')
@@ -33,36 +36,207 @@ def generate_sustainability_breakdown(analysis_json: dict) -> dict:
     Returns:
         A dictionary containing the detailed sustainability breakdown.
     """
-    logger.info(f"Input to generate_sustainability_breakdown: {json.dumps(analysis_json, indent=2)}")
     breakdown = {}
     # The new analysis is nested under the 'sustainability_analysis' key
     sustainability_analysis = analysis_json.get('sustainability_analysis', {})
-    logger.info(f"Extracted sustainability_analysis: {json.dumps(sustainability_analysis, indent=2)}")
     # Iterate through our three main categories
     for category, details in sustainability_analysis.items():
         rating = details.get('rating', 'Unknown')
-        logger.debug(f"Processing category: {category}, rating: {rating}")
+        logger.debug("Processing category: %s, rating: %s", category, rating)
         breakdown[category] = {
             "value": rating,  # The qualitative rating (e.g., "Good")
             "score": RATING_SCORES.get(rating, 0.0), # The quantitative score
             "analysis": details.get('analysis', 'No analysis provided.')
         }
-    logger.info(f"Generated breakdown: {json.dumps(breakdown, indent=2)}")
+    logger.debug("Generated breakdown: %s", LazyJson(breakdown))
     return breakdown
 
 
-def calculate_weighted_score(sustainability_breakdown: dict, user_weights: dict | None = None) -> int:
+def calculate_weighted_score(sustainability_breakdown, user_weights: dict | None = None) -> int:
     """
     Calculates the final 0-100 score from the breakdown object. No weights are used; all fields are equally weighted.
+    Accepts a breakdown dict or a compact `Breakdown`, which carries its score already computed.
     """
+    if isinstance(sustainability_breakdown, Breakdown):
+        return sustainability_breakdown.weighted_score
+    return _weighted_score(
+        breakdown_details.get('score', 3)  # Unknown is 3
+        for breakdown_details in sustainability_breakdown.values()
+    )
+
+
+def _weighted_score(scores) -> int:
     total_score = 0
     count = 0
-    for category, breakdown_details in sustainability_breakdown.items():
-        score = breakdown_details.get('score', 3)  # Unknown is 3
+    for score in scores:
         normalized_score = (score - 5) / 5  # 0->-1, 5->0, 10->1, 3->-0.4
         total_score += normalized_score
         count += 1
     if count == 0:
         return 50
     normalized_score = 50 + 50 * (total_score / count)
-    return max(0, min(100, round(normalized_score)))  # Use round() instead of int() to properly round values)
\ No newline at end of file
+    return max(0, min(100, round(normalized_score)))  # Use round() instead of int() to properly round values)
+
+# ==============================================================================
+# Part 3: Bulk Scoring
+# ==============================================================================
+
+def calculate_weighted_scores(score_rows: list) -> list[int]:
+    """
+    `calculate_weighted_score` for many products at once, for bulk rescoring
+    (scripts/rescore.py). `score_rows[i]` holds product i's category scores
+    in breakdown order.
+
+    With NumPy installed the rows are packed into one padded matrix and the
+    arithmetic runs column by column in the same order and float operations
+    as `calculate_weighted_score`, with the same round-half-to-even, so both
+    give identical results. Without NumPy it falls back to the per-product loop.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [
+            calculate_weighted_score({index: {'score': score} for index, score in enumerate(row)})
+            for row in score_rows
+        ]
+
+    if not score_rows:
+        return []
+    lengths = np.fromiter((len(row) for row in score_rows), dtype=np.int64, count=len(score_rows))
+    width = int(lengths.max())
+    if width == 0:
+        return [50] * len(score_rows)
+    present = np.arange(width) < lengths[:, None]
+    matrix = np.zeros((len(score_rows), width))
+    matrix[present] = np.fromiter((score for row in score_rows for score in row), dtype=np.float64,
+                                  count=int(lengths.sum()))
+
+    normalized = (matrix - 5) / 5
+    # Column by column, like the loop's running sum (np.sum may pair terms differently)
+    total = np.zeros(len(score_rows))
+    for column in range(width):
+        total = total + np.where(present[:, column], normalized[:, column], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = 50 + 50 * (total / lengths)
+    scores = np.clip(np.rint(scores), 0, 100)
+    scores[lengths == 0] = 50
+    return scores.astype(np.int64).tolist()
+
+
+# ==============================================================================
+# Part 4: Compact Breakdown
+# ==============================================================================
+
+# The categories the analyzer rates (its tool schema), in the order it returns them
+BREAKDOWN_CATEGORIES = ('material_composition', 'production_and_brand', 'circularity_and_end_of_life')
+
+
+class Rating(IntEnum):
+    """The LLM's qualitative ratings as small integer codes."""
+    UNKNOWN = 0
+    POOR = 1
+    NEUTRAL = 2
+    GOOD = 3
+    EXCELLENT = 4
+
+    @property
+    def label(self) -> str:
+        """The rating as stored and shown, e.g. 'Good'."""
+        return self.name.capitalize()
+
+    @classmethod
+    def from_label(cls, label) -> 'Rating | None':
+        """The code of a stored rating, or None for a label the analyzer cannot produce (e.g. 'good')."""
+        return _RATINGS_BY_LABEL.get(label)
+
+
+_RATINGS_BY_LABEL = {rating.label: rating for rating in Rating}
+
+
+class Breakdown:
+    """
+    A sustainability breakdown in compact form, for products held in memory
+    (the hot cache) and the per-request scoring.
+
+    The category names are interned and shared by every instance, ratings are
+    `Rating` codes (a stored label outside the enum, e.g. from free-text
+    batch analyses, is kept verbatim in `other_labels` and its rating is
+    None), and the final score is computed once, on construction, so
+    `calculate_weighted_score` is an attribute read. The analysis texts, by
+    far the largest part of a breakdown, are only kept if they were asked for
+    (`from_document(..., with_analysis=True)`); the details page fetches them
+    separately (GET /score/<source_site>/<listing_id>/analysis).
+
+    Instances are never modified, so copies share the original.
+    """
+    __slots__ = ('names', 'ratings', 'scores', 'analyses', 'other_labels', 'weighted_score')
+
+    def __init__(self, names: tuple, ratings: tuple, scores: tuple, analyses: tuple | None = None,
+                 other_labels: tuple | None = None):
+        self.names = names
+        self.ratings = ratings
+        self.scores = scores
+        self.analyses = analyses
+        # The stored label of each rating that is None; None if there are none
+        self.other_labels = other_labels
+        self.weighted_score = _weighted_score(scores)
+
+    @classmethod
+    def from_document(cls, sustainability_breakdown: dict | None, with_analysis: bool = False) -> 'Breakdown':
+        """
+        The compact form of a stored `sustainability_breakdown` (as built by
+        `generate_sustainability_breakdown`). Stored scores are kept as they
+        are, so a product that has not been rescored yet keeps its old ones.
+        """
+        entries = (sustainability_breakdown or {}).items()
+        labels = tuple(details.get('value') for _, details in entries)
+        ratings = tuple(Rating.from_label(label) for label in labels)
+        return cls(
+            tuple(sys.intern(name) for name, _ in entries),
+            ratings,
+            tuple(details.get('score', 3) for _, details in entries),
+            tuple(details.get('analysis', 'No analysis provided.') for _, details in entries) if with_analysis else None,
+            labels if None in ratings else None,
+        )
+
+    def labels(self) -> tuple:
+        """The rating labels, exactly as stored."""
+        if self.other_labels is None:
+            return tuple(rating.label for rating in self.ratings)
+        return tuple(
+            rating.label if rating is not None else label
+            for rating, label in zip(self.ratings, self.other_labels)
+        )
+
+    def to_document(self) -> dict:
+        """
+        The breakdown as stored in MongoDB and sent to the extension:
+        `{category: {value, score[, analysis]}}`, with the analysis only if
+        this instance has it.
+        """
+        document = {}
+        analyses = self.analyses if self.analyses is not None else (None,) * len(self.names)
+        for name, label, score, analysis in zip(self.names, self.labels(), self.scores, analyses):
+            # An entry stored without a label stays without one
+            entry = {"value": label, "score": score} if label is not None else {"score": score}
+            if analysis is not None:
+                entry["analysis"] = analysis
+            document[name] = entry
+        return document
+
+    def analysis_by_category(self) -> dict:
+        """`{category: analysis text}`; empty if the texts were not loaded."""
+        return dict(zip(self.names, self.analyses)) if self.analyses is not None else {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self) -> str:
+        ratings = ', '.join(f"{name}={label}" for name, label in zip(self.names, self.labels()))
+        return f"Breakdown({ratings}, weighted_score={self.weighted_score})"
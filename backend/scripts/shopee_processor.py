@@ -10,8 +10,12 @@
 
 import sys
 import os
-import json
+import functools
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pymongo.errors import BulkWriteError
 
 # Configure logging for shopee_processor
 logging.basicConfig(level=logging.INFO)
@@ -19,24 +23,94 @@ logger = logging.getLogger('shopee_processor')
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from scripts.db import products_collection
+from scripts.db import get_products_collection, get_leases_collection, get_category_top_collection
 from scripts.url_parser import parse_shopee_url
-from scripts.analyzer import get_full_product_analysis
-from scripts.scorer import generate_sustainability_breakdown, calculate_weighted_score
+from scripts.analyzer import (
+    ANALYZER_BATCH_SIZE,
+    LANE_BACKGROUND,
+    LANE_INTERACTIVE,
+    analysis_batcher,
+    background_analysis_batcher,
+    get_full_product_analysis,
+    is_analysis_error,
+)
+from scripts.scorer import BREAKDOWN_CATEGORIES, Breakdown, generate_sustainability_breakdown, calculate_weighted_score
+from scripts.singleflight import SingleFlight, MongoLease, wait_for_result
+from scripts.hot_cache import product_cache, recommendation_cache, invalidate_product
+from scripts.logging_utils import LazyJson, log_event
+from scripts.content_hash import compute_content_hash
+from scripts.near_duplicates import NEAR_DUP_ENABLED, near_duplicate_index
+from scripts.category_top import get_category_top, add_to_category_top, rebuild_category_top
+from scripts.categories import canonicalize_category
+
+try:
+    from config import ANALYSIS_LEASE_TTL_SECONDS, ANALYSIS_LEASE_POLL_SECONDS
+except ImportError:
+    ANALYSIS_LEASE_TTL_SECONDS = 90
+    ANALYSIS_LEASE_POLL_SECONDS = 0.5
+
+try:
+    from config import BATCH_LLM_CONCURRENCY
+except ImportError:
+    BATCH_LLM_CONCURRENCY = 4
+
+# Number of recommendations returned alongside each product
+RECOMMENDATION_COUNT = 3
+
+# Fields of a stored product that are enough to rebuild its analysis
+ANALYSIS_PROJECTION = {
+    "_id": 0,
+    "source_site": 1,
+    "listing_id": 1,
+    "product_name": 1,
+    "brand": 1,
+    "category": 1,
+    "sustainability_breakdown": 1,
+}
+
+# Fields of a stored product that responses do not need: the analysis texts
+# (the details page fetches them, see `get_product_analysis`) and the
+# near-duplicate signature. Left out of lookups, and so of the hot cache.
+PRODUCT_RESPONSE_PROJECTION = {
+    "minhash": 0,
+    **{f"sustainability_breakdown.{category}.analysis": 0 for category in BREAKDOWN_CATEGORIES},
+}
+
+# Coalesces concurrent cache misses for the same listing within this process
+_inflight_analyses = SingleFlight()
+
+# Caps the listings that batch requests analyze at once, across all batches.
+# Up to ANALYZER_BATCH_SIZE of them share one LLM call (see
+# analyzer.AnalysisBatcher), so this allows BATCH_LLM_CONCURRENCY full calls.
+BATCH_ANALYSES_IN_FLIGHT = BATCH_LLM_CONCURRENCY * max(1, ANALYZER_BATCH_SIZE)
+_batch_llm_slots = threading.BoundedSemaphore(BATCH_ANALYSES_IN_FLIGHT)
+
+
+def exclude_current_listing(top_products: list, current_listing_id: str) -> list:
+    """Drops the product being viewed and trims the list to RECOMMENDATION_COUNT."""
+    return [
+        {k: v for k, v in product.items() if k != 'listing_id'}
+        for product in top_products
+        if product.get('listing_id') != current_listing_id
+    ][:RECOMMENDATION_COUNT]
 
 
 def get_recommendations(category: str, current_listing_id: str) -> list:
     """
-    Queries the database to find the top 3 most sustainable products
-    in the same category, excluding the current product.
+    Finds the top 3 most sustainable products in the same category,
+    excluding the current product. Served from the hot cache, else from the
+    category's materialized top list (one _id lookup, see category_top.py).
 
     Args:
-        category: The category to search within.
+        category: The category to search within; canonicalized first, so
+            products stored before the category migration still match.
         current_listing_id: The ID of the product being viewed, to exclude it.
 
     Returns:
         A list of up to 3 recommendation dictionaries with 'url' and 'score'.
     """
+    category = canonicalize_category(category)
+    products_collection = get_products_collection()
     if products_collection is None or category == "Unknown":
         logger.warning("Cannot get recommendations, database not connected or category is Unknown.")
         return []
@@ -45,46 +119,486 @@ def get_recommendations(category: str, current_listing_id: str) -> list:
         logger.warning("Cannot get recommendations, current_listing_id is empty.")
         return []
 
+    # Per-category top list from the hot cache. It holds more than
+    # RECOMMENDATION_COUNT products so the current listing can be excluded
+    # without another database query.
+    top_products = recommendation_cache.get(category)
+    if top_products is not None:
+        recommendations = exclude_current_listing(top_products, current_listing_id)
+        logger.debug("Found %d recommendations for category '%s' (hot cache).", len(recommendations), category)
+        return recommendations
+
     try:
-        # Define the aggregation pipeline to find, sort, limit, and project fields
-        pipeline = [
-            {
-                '$match': {
-                    'category': category,
-                    'listing_id': {'$ne': current_listing_id}
-                }
-            },
-            {
-                '$sort': {'default_sustainability_score': -1}
-            },
-            {
-                '$limit': 3
-            },
-            {
-                '$project': {
-                    'product_name': 1,
-                    'brand': 1,
-                    'url': '$source_url',  # Rename 'source_url' to 'url' for the frontend
-                    'score': '$default_sustainability_score', # Rename for consistency
-                    '_id': 0
-                }
-            }
-        ]
-        
-        recommendations = list(products_collection.aggregate(pipeline))
-        logger.info(f"Found {len(recommendations)} recommendations for category '{category}'.")
-        # Log the actual recommendations found
-        if recommendations:
-            # Use default=str for any non-serializable fields like ObjectId
-            logger.info(f"Recommendations: {json.dumps(recommendations, indent=2, default=str)}")
+        top_products = get_category_top(get_category_top_collection(), products_collection, category)
+        recommendation_cache.put(category, top_products)
+        recommendations = exclude_current_listing(top_products, current_listing_id)
+        logger.debug("Found %d recommendations for category '%s': %s", len(recommendations), category, LazyJson(recommendations))
         return recommendations
 
     except Exception as e:
         logger.error(f"Error fetching recommendations: {e}", exc_info=True)
         return []
 
-# --- The rest of your shopee_processor.py file starts here ---
-# def process_shopee_product(...)
+# --- Helpers shared by the cache-hit and cache-miss paths ---
+
+def finalize_product_response(product: dict, recommendations: list) -> dict:
+    """
+    Turns a product document into the response sent back to the API:
+    recalculates the score, attaches recommendations and strips the fields the
+    frontend does not need.
+    """
+    # Use the stored breakdown to perform a very fast recalculation
+    breakdown = product.get('sustainability_breakdown')
+    if not isinstance(breakdown, Breakdown):
+        breakdown = Breakdown.from_document(breakdown)
+    personalized_score = calculate_weighted_score(breakdown)
+    logger.debug("Personalized score calculated: %s", personalized_score)
+
+    # Update the score in the document we are about to return to the user.
+    # The breakdown goes out without the analysis texts (see get_product_analysis).
+    product['sustainability_score'] = personalized_score
+    product['sustainability_breakdown'] = breakdown.to_document()
+    product['recommendations'] = recommendations
+
+    # Clean up the document before sending it back to the API
+    # The user doesn't need to see the default score or the internal _id
+    if 'default_sustainability_score' in product:
+        del product['default_sustainability_score']
+    if '_id' in product:
+        del product['_id']
+    return product
+
+
+def _prepare_cached_response(product: dict) -> dict:
+    """
+    Builds the API response for a stored product. Shared by the cache-hit,
+    duplicate-key and coalesced-wait paths.
+    """
+    # Get recommendations with error handling
+    try:
+        recommendations = get_recommendations(
+            product.get('category', 'Unknown'),
+            product.get('listing_id', '')
+        )
+    except Exception as rec_error:
+        logger.error(f"Error getting recommendations: {rec_error}")
+        recommendations = []
+    return finalize_product_response(product, recommendations)
+
+
+def compact_product(product: dict) -> dict:
+    """
+    A stored product (read with PRODUCT_RESPONSE_PROJECTION) as it is kept in
+    the hot cache: its breakdown as a compact `Breakdown`.
+    """
+    product['sustainability_breakdown'] = Breakdown.from_document(product.get('sustainability_breakdown'))
+    return product
+
+
+def _find_product(parsed_info: dict) -> dict | None:
+    """Looks up a stored product, serving it from the hot cache when possible."""
+    cache_key = (parsed_info['source_site'], parsed_info['listing_id'])
+    product = product_cache.get(cache_key)
+    if product is not None:
+        return product
+
+    product = get_products_collection().find_one({
+        "source_site": parsed_info['source_site'],
+        "listing_id": parsed_info['listing_id'],
+    }, PRODUCT_RESPONSE_PROJECTION)
+    if product:
+        product_cache.put(cache_key, compact_product(product))
+    return product
+
+
+def get_stored_product_response(source_site: str, listing_id: str) -> dict | None:
+    """
+    The response for a listing that is already stored, or None if it is not.
+    Needs no page text and never calls the LLM (GET /score).
+    """
+    product = _find_product({'source_site': source_site, 'listing_id': listing_id})
+    return _prepare_cached_response(product) if product else None
+
+
+def get_product_analysis(source_site: str, listing_id: str) -> dict | None:
+    """
+    The analysis texts of a stored listing, `{category: analysis}`, or None
+    if it is not stored. Only the details page needs them, so they are read
+    on demand and never cached (GET /score/<source_site>/<listing_id>/analysis).
+    """
+    product = get_products_collection().find_one(
+        {"source_site": source_site, "listing_id": listing_id},
+        {"_id": 0, "sustainability_breakdown": 1},
+    )
+    if product is None:
+        return None
+    return Breakdown.from_document(product.get('sustainability_breakdown'), with_analysis=True).analysis_by_category()
+
+
+def _listings_query(listing_ids_by_site: dict) -> dict:
+    """A query for the given `{source_site: listing_ids}`: one `$in` per site, `$or`-ed if several."""
+    clauses = [
+        {"source_site": source_site, "listing_id": {"$in": sorted(listing_ids)}}
+        for source_site, listing_ids in listing_ids_by_site.items()
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def find_stored_listings(parsed_infos: list) -> set:
+    """
+    The `(source_site, listing_id)` keys of the given listings that are
+    already stored, from one index-only query (no documents are fetched).
+    """
+    listing_ids_by_site = {}
+    for parsed_info in parsed_infos:
+        listing_ids_by_site.setdefault(parsed_info['source_site'], set()).add(parsed_info['listing_id'])
+    if not listing_ids_by_site:
+        return set()
+    projection = {"_id": 0, "source_site": 1, "listing_id": 1}
+    return {
+        (product['source_site'], product['listing_id'])
+        for product in get_products_collection().find(_listings_query(listing_ids_by_site), projection)
+    }
+
+
+def find_products_bulk(parsed_infos: list) -> dict:
+    """
+    Looks up many listings at once: the hot cache first, then a single `$in`
+    query for the rest (an `$or` of one `$in` per site if the batch spans
+    several Shopee domains).
+
+    Returns:
+        A dictionary of `(source_site, listing_id)` -> product document for
+        every listing that is already stored.
+    """
+    found = {}
+    missing_by_site = {}
+    for parsed_info in parsed_infos:
+        cache_key = (parsed_info['source_site'], parsed_info['listing_id'])
+        if cache_key in found:
+            continue
+        product = product_cache.get(cache_key)
+        if product is not None:
+            found[cache_key] = product
+        else:
+            missing_by_site.setdefault(parsed_info['source_site'], set()).add(parsed_info['listing_id'])
+
+    if not missing_by_site:
+        return found
+
+    for product in get_products_collection().find(_listings_query(missing_by_site), PRODUCT_RESPONSE_PROJECTION):
+        cache_key = (product['source_site'], product['listing_id'])
+        product_cache.put(cache_key, compact_product(product))
+        found[cache_key] = product
+    return found
+
+
+def _analyze_with_lease(url: str, raw_text: str, parsed_info: dict, analyze=None) -> dict | None:
+    """
+    Runs the cache-miss pipeline while holding the cross-worker lease for this
+    listing. If another worker already holds it, waits for that worker's
+    document instead of paying for a second LLM analysis.
+    """
+    leases_collection = get_leases_collection()
+    if leases_collection is None:
+        return _analyze_and_store(url, raw_text, parsed_info, analyze)
+
+    lease = MongoLease(leases_collection, ttl_seconds=ANALYSIS_LEASE_TTL_SECONDS)
+    lease_key = f"{parsed_info['source_site']}:{parsed_info['listing_id']}"
+
+    token = lease.acquire(lease_key)
+    if token is None:
+        logger.info(f"Another worker is analyzing {lease_key}. Waiting for its result...")
+        existing_doc = wait_for_result(
+            lambda: _find_product(parsed_info),
+            lease,
+            lease_key,
+            timeout=ANALYSIS_LEASE_TTL_SECONDS,
+            poll_interval=ANALYSIS_LEASE_POLL_SECONDS,
+        )
+        if existing_doc:
+            logger.info("SUCCESS: Process completed (COALESCED -> CACHE HIT)")
+            return _prepare_cached_response(existing_doc)
+        # The other worker failed or timed out; try to run the analysis ourselves.
+        token = lease.acquire(lease_key)
+
+    try:
+        return _analyze_and_store(url, raw_text, parsed_info, analyze)
+    finally:
+        if token is not None:
+            lease.release(lease_key, token)
+
+
+def analysis_from_product(product: dict) -> dict:
+    """
+    Rebuilds the analyzer output a stored product was built from, so another
+    listing of the same product can reuse it instead of calling the LLM.
+    """
+    return {
+        "product_name": product.get('product_name', 'N/A'),
+        "brand": product.get('brand', 'N/A'),
+        "category": product.get('category', 'Unknown'),
+        "sustainability_analysis": {
+            category: {
+                "rating": details.get('value', 'Unknown'),
+                "analysis": details.get('analysis', 'No analysis provided.'),
+            }
+            for category, details in (product.get('sustainability_breakdown') or {}).items()
+        },
+    }
+
+
+# The helpers below are the I/O-free parts of the cache-miss pipeline, shared
+# with async_processor; the database reads and the LLM call stay with each path.
+
+def content_keys(raw_text: str) -> tuple[str | None, list | None]:
+    """
+    The content hash of a page dump and its MinHash signature (None unless
+    near-duplicate reuse is enabled): the keys of the second and third cache
+    layers, stored with the new product document.
+    """
+    signature = near_duplicate_index.signature_for_text(raw_text) if NEAR_DUP_ENABLED else None
+    return compute_content_hash(raw_text), signature
+
+
+def near_duplicate_candidate(signature: list | None, parsed_info: dict) -> tuple[tuple[str, str], float] | None:
+    """
+    The `((source_site, listing_id), similarity)` of the most similar listing
+    in the near-duplicate index, other than this one, at or above
+    NEAR_DUP_THRESHOLD. The caller refreshes the index first if needed.
+    """
+    if not NEAR_DUP_ENABLED or not signature:
+        return None
+    return near_duplicate_index.best_match(
+        signature, exclude=(parsed_info['source_site'], parsed_info['listing_id'])
+    )
+
+
+def log_reuse(event: str, donor: dict | None, **fields) -> None:
+    """Logs that `donor`'s analysis is reused (no-op if there is no donor)."""
+    if donor:
+        log_event(logger, logging.INFO, event, reused_from=f"{donor['source_site']}:{donor['listing_id']}", **fields)
+
+
+def checked_analysis(analysis_json: dict | None) -> dict | None:
+    """The analyzer output, or None (logged) if the analysis failed."""
+    if is_analysis_error(analysis_json):
+        # Never store a failed analysis: it would be served as a real score
+        logger.error("FAILED: LLM analysis returned no data: %s",
+                     (analysis_json or {}).get('details') or (analysis_json or {}).get('error'))
+        return None
+    logger.debug("Analysis result: %s", LazyJson(analysis_json))
+    return analysis_json
+
+
+def publish_stored_product(product_document: dict) -> None:
+    """Drops cached copies of a newly stored product and adds it to the near-duplicate index."""
+    key = (product_document['source_site'], product_document['listing_id'])
+    invalidate_product(*key, product_document.get('category'))
+    near_duplicate_index.add(key, product_document.get('minhash'))
+
+
+def _find_analysis_by_content(content_hash: str | None) -> dict | None:
+    """
+    Second cache layer, behind the listing key: a stored product with the
+    same content hash (same brand, name and specs) under another listing ID.
+    """
+    if not content_hash:
+        return None
+    donor = get_products_collection().find_one({"content_hash": content_hash}, ANALYSIS_PROJECTION)
+    log_reuse("content_cache_hit", donor)
+    return donor
+
+
+def _find_near_duplicate(signature: list | None, parsed_info: dict) -> dict | None:
+    """
+    Third cache layer: the most similar stored product (MinHash over brand,
+    name and specs) at or above NEAR_DUP_THRESHOLD.
+    """
+    if NEAR_DUP_ENABLED and signature and near_duplicate_index.needs_refresh():
+        try:
+            near_duplicate_index.refresh(get_products_collection())
+        except Exception as e:
+            logger.warning(f"Could not refresh the near-duplicate index: {e}")
+
+    match = near_duplicate_candidate(signature, parsed_info)
+    if not match:
+        return None
+    (source_site, listing_id), similarity = match
+    donor = get_products_collection().find_one(
+        {"source_site": source_site, "listing_id": listing_id}, ANALYSIS_PROJECTION
+    )
+    log_reuse("near_duplicate_hit", donor, similarity=round(similarity, 3))
+    return donor
+
+
+def build_product_document(
+    url: str,
+    parsed_info: dict,
+    analysis_json: dict,
+    content_hash: str | None = None,
+    reused_from: dict | None = None,
+    minhash: list | None = None,
+) -> dict:
+    """
+    Converts an LLM analysis into the lean product document stored in MongoDB
+    (steps 4b-4d of the cache-miss pipeline).
+
+    `content_hash` and `minhash` are stored so later listings of the same
+    (or a near-identical) product can find this analysis; `reused_from`
+    records the listing an analysis was copied from.
+    """
+    # 4b. Convert the LLM's text analysis into our rich breakdown object
+    sustainability_breakdown = generate_sustainability_breakdown(analysis_json)
+
+    # 4c. Calculate the default score that will be stored permanently in the database
+    default_score_for_db = calculate_weighted_score(sustainability_breakdown)
+    logger.debug("Default score calculated: %s", default_score_for_db)
+
+    # 4d. Assemble the new, lean document to be inserted into MongoDB
+    product_document = {
+        "listing_id": parsed_info['listing_id'],
+        "source_site": parsed_info['source_site'],
+        "source_url": url,
+        "product_name": analysis_json.get('product_name', 'N/A'),
+        "brand": analysis_json.get('brand', 'N/A'),
+        "category": canonicalize_category(analysis_json.get('category')),
+        "sustainability_breakdown": sustainability_breakdown,
+        "default_sustainability_score": default_score_for_db,
+    }
+    # An empty breakdown means the analysis failed; don't let other listings reuse it
+    if sustainability_breakdown:
+        if content_hash:
+            product_document["content_hash"] = content_hash
+        if minhash:
+            product_document["minhash"] = minhash
+    if reused_from:
+        product_document["analysis_reused_from"] = f"{reused_from['source_site']}:{reused_from['listing_id']}"
+    logger.debug("Document to insert: %s", LazyJson(product_document))
+    return product_document
+
+
+def prepare_product_document(url: str, raw_text: str, parsed_info: dict, analyze=None) -> dict | None:
+    """
+    The cache-miss pipeline up to the insert: LLM analysis (unless the same
+    product text was already analyzed under another listing) and scoring.
+    Returns the new product document, or None if the analysis failed.
+
+    `analyze` replaces `get_full_product_analysis` for the LLM call; batch
+    work passes `analysis_batcher.submit` to share multi-product calls.
+    """
+    # 4a. Reuse the analysis of an identical or near-identical product
+    content_hash, signature = content_keys(raw_text)
+    donor = _find_analysis_by_content(content_hash) or _find_near_duplicate(signature, parsed_info)
+    if donor:
+        analysis_json = analysis_from_product(donor)
+    else:
+        # 4a'. Call the LLM to analyze the raw text
+        log_event(logger, logging.INFO, "llm_analysis_started", listing_id=parsed_info['listing_id'], text_chars=len(raw_text))
+        logger.debug("Raw text preview (first 500 chars): %s", raw_text[:500])
+
+        analysis_json = checked_analysis((analyze or get_full_product_analysis)(raw_text))
+        if analysis_json is None:
+            return None
+
+    return build_product_document(
+        url, parsed_info, analysis_json, content_hash, reused_from=donor, minhash=signature
+    )
+
+
+def _analyze_and_store(url: str, raw_text: str, parsed_info: dict, analyze=None) -> dict | None:
+    """
+    The full cache-miss pipeline: `prepare_product_document` and insertion
+    of the new product document. Returns the response document, or None on failure.
+    """
+    product_document = prepare_product_document(url, raw_text, parsed_info, analyze)
+    if product_document is None:
+        return None
+
+    # 4e. Save the new document to the database
+    try:
+        products_collection = get_products_collection()
+        result = products_collection.insert_one(product_document)
+        log_event(
+            logger, logging.INFO, "product_stored",
+            listing_id=parsed_info['listing_id'],
+            category=product_document['category'],
+            score=product_document['default_sustainability_score'],
+            _id=result.inserted_id,
+        )
+        try:
+            add_to_category_top(get_category_top_collection(), products_collection, product_document)
+        except Exception as top_error:
+            logger.warning(f"Could not update the top list for '{product_document['category']}': {top_error}")
+        publish_stored_product(product_document)
+
+        # Create a new dictionary for the response to the user.
+        # This avoids modifying the original document we want to test.
+        response_document = _prepare_cached_response(product_document.copy())
+        logger.debug("Returning product: %s", LazyJson(response_document))
+        return response_document
+
+    except Exception as e:
+        # Check if this is a duplicate key error
+        if "E11000 duplicate key error" in str(e):
+            logger.warning("DUPLICATE KEY: Product already exists in database. Treating as cache hit.")
+            existing_doc = _find_product(parsed_info)
+
+            if existing_doc:
+                return _prepare_cached_response(existing_doc)
+            else:
+                logger.error("FAILED: Could not fetch existing product after duplicate key error")
+                return None
+        else:
+            # Handle other database errors
+            logger.error(f"FAILED: Could not insert document into MongoDB: {e}")
+            logger.error("Document that failed to insert: %s", LazyJson(product_document, max_chars=2000))
+            return None
+
+
+def store_products_bulk(product_documents: list) -> tuple[list, int]:
+    """
+    Inserts many new product documents with one unordered `insert_many`, for
+    offline jobs (scripts/backfill.py). Listings that a live request stored
+    in the meantime are counted as duplicates, not errors. Afterwards the top
+    list of each affected category is rebuilt once, and this worker's hot
+    cache and near-duplicate index are updated.
+
+    Returns:
+        A `(stored_documents, duplicates)` tuple.
+    """
+    if not product_documents:
+        return [], 0
+    products_collection = get_products_collection()
+
+    failed_indices, duplicates = set(), 0
+    try:
+        products_collection.insert_many(product_documents, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get('writeErrors', []):
+            failed_indices.add(write_error['index'])
+            if write_error.get('code') == 11000:
+                duplicates += 1
+            else:
+                logger.error(f"FAILED: Could not insert document into MongoDB: {write_error.get('errmsg')}")
+    stored = [document for index, document in enumerate(product_documents) if index not in failed_indices]
+
+    top_collection = get_category_top_collection()
+    categories = {document.get('category') for document in stored} - {None, 'Unknown'}
+    if top_collection is not None:
+        for category in sorted(categories):
+            try:
+                rebuild_category_top(top_collection, products_collection, category)
+            except Exception as top_error:
+                logger.warning(f"Could not rebuild the top list for '{category}': {top_error}")
+    for document in stored:
+        publish_stored_product(document)
+
+    log_event(logger, logging.INFO, "products_stored_bulk",
+              stored=len(stored), duplicates=duplicates, failed=len(failed_indices) - duplicates,
+              categories=len(categories))
+    return stored, duplicates
+
 
 # --- Step 2: Define the main processing function ---
 
@@ -95,12 +609,17 @@ def process_shopee_product(url: str, raw_text: str, user_weights: dict | None =
     Workflow:
     1. Parses the URL to get a stable, unique identifier (`listing_id`).
     2. Checks the MongoDB collection (our cache) for this `listing_id`.
-    3. If CACHE HIT:
+    3. If CACHE HIT (same listing):
        - Retrieves the stored `sustainability_breakdown`.
        - Quickly recalculates the score using the new `user_weights`.
        - Returns the complete, personalized product document.
     4. If CACHE MISS:
-       - Calls the LLM (`analyzer`) to get a structured analysis of the raw text.
+       - Coalesces with any in-flight analysis of the same listing, in this
+         process (`SingleFlight`) or in another worker (`MongoLease`).
+       - Reuses the analysis of a stored product with the same content hash
+         (same brand, name and specs under another listing) or, failing that,
+         of a near-duplicate above NEAR_DUP_THRESHOLD, if any.
+       - Otherwise calls the LLM (`analyzer`) to get a structured analysis of the raw text.
        - Calls the `scorer` to generate the `sustainability_breakdown` object.
        - Calculates a `default_sustainability_score` for database storage.
        - Saves the new, lean product document to the database.
@@ -116,233 +635,136 @@ def process_shopee_product(url: str, raw_text: str, user_weights: dict | None =
         personalized score, or None if the process fails at any step.
     """
     
-    logger.info("=== SHOPEE_PROCESSOR: STARTING PROCESSING ===")
-    logger.info(f"Input URL: {url}")
-    logger.info(f"Raw text length: {len(raw_text) if raw_text else 0}")
-    logger.info(f"User weights provided: {user_weights is not None}")
-    logger.info(f"Products collection available: {products_collection is not None}")
-      # --- Guard Clause: Ensure database is connected ---
-    if products_collection is None:
+    logger.debug(
+        "Processing %s (text length: %d, user weights: %s)",
+        url, len(raw_text) if raw_text else 0, user_weights is not None,
+    )
+    # --- Guard Clause: Ensure database is connected ---
+    if get_products_collection() is None:
         logger.error("CRITICAL: Database is not connected. Cannot process URL.")
         return None
 
     # --- Step 2a: Parse URL to get unique identifiers ---
-    logger.info("=== STEP 2A: PARSING URL ===")
     parsed_info = parse_shopee_url(url)
     if not parsed_info:
         logger.error(f"FAILED: Invalid or unparsable Shopee URL: {url}")
         return None
-    
-    logger.info(f"SUCCESS: Parsed URL -> {json.dumps(parsed_info, indent=2)}")
 
     # --- Step 2b: Check the database (cache) for an existing product ---
-    logger.info("=== STEP 2B: CHECKING DATABASE CACHE ===")
-    logger.info(f"Looking for existing product with:")
-    logger.info(f"  source_site: '{parsed_info['source_site']}'")
-    logger.info(f"  listing_id: '{parsed_info['listing_id']}'")
-    
-    existing_product = products_collection.find_one({
-        "source_site": parsed_info['source_site'],
-        "listing_id": parsed_info['listing_id'],
-    })
-    if existing_product:
-        logger.info(f"CACHE HIT: Found existing product with _id: {existing_product.get('_id')}")
-        logger.info(f"Existing product data: {json.dumps({k: v for k, v in existing_product.items() if k != '_id'}, indent=2, default=str)}")
-    else:
-        logger.info("CACHE MISS: No existing product found. Running LLM analysis...")
-        
+    existing_product = _find_product(parsed_info)
+
     # --- Step 3: Handle Cache Hit (The Fast Path) ---
     if existing_product:
-        logger.info("=== STEP 3: CACHE HIT - FAST PATH ===")
-        
-        # Use the stored breakdown to perform a very fast recalculation
-        logger.info("Recalculating score with user weights...")
-        personalized_score = calculate_weighted_score(
-            existing_product['sustainability_breakdown']
+        log_event(
+            logger, logging.INFO, "cache_hit",
+            source_site=parsed_info['source_site'],
+            listing_id=parsed_info['listing_id'],
         )
-        logger.info(f"Personalized score calculated: {personalized_score}")
-        
-        # Update the score in the document we are about to return to the user        existing_product['sustainability_score'] = personalized_score
+        response_document = _prepare_cached_response(existing_product)
+        logger.debug("Returning product: %s", LazyJson(response_document))
+        return response_document
 
-        # Get recommendations with error handling
-        try:
-            logger.info("Getting recommendations for cached product...")
-            recommendations = get_recommendations(
-                existing_product.get('category', 'Unknown'),
-                existing_product.get('listing_id', '')
-            )
-            logger.info(f"Retrieved {len(recommendations)} recommendations")
-            existing_product['recommendations'] = recommendations
-        except Exception as rec_error:
-            logger.error(f"Error getting recommendations: {rec_error}")
-            existing_product['recommendations'] = []
-          # Clean up the document before sending it back to the API
-        # The user doesn't need to see the default score or the internal _id
-        if 'default_sustainability_score' in existing_product:
-            del existing_product['default_sustainability_score']
-        if '_id' in existing_product:
-            del existing_product['_id']
-        
-        logger.info("SUCCESS: Process completed (✅ CACHE HIT)")
-        logger.info(f"Returning product: {json.dumps(existing_product, indent=2, default=str)}")
-        return existing_product
-
-    # --- Step 4: Handle Cache Miss (The Full Pipeline) ---
-    logger.info("=== STEP 4: CACHE MISS - FULL ANALYSIS PIPELINE ===")
-
-    # 4a. Call the LLM to analyze the raw text
-    logger.info("=== STEP 4A: CALLING LLM ANALYZER ===")
-    logger.info(f"Sending raw text to analyzer (length: {len(raw_text)})")
-    logger.info(f"Raw text preview (first 500 chars): {raw_text[:500]}...")
-    
-    analysis_json = get_full_product_analysis(raw_text)
-    if not analysis_json:
-        logger.error("FAILED: LLM analysis returned no data")
-        return None
+    # --- Step 4: Handle Cache Miss, one analysis per listing at a time ---
+    log_event(
+        logger, logging.INFO, "cache_miss",
+        source_site=parsed_info['source_site'],
+        listing_id=parsed_info['listing_id'],
+    )
+    flight_key = (parsed_info['source_site'], parsed_info['listing_id'])
+    return _inflight_analyses.do(
+        flight_key,
+        lambda: _analyze_with_lease(url, raw_text, parsed_info),
+    )
 
-    logger.info("SUCCESS: LLM analysis completed")
-    # Safe logging with error handling for non-serializable objects
-    try:
-        logger.info(f"Analysis result: {json.dumps(analysis_json, indent=2)}")
-    except (TypeError, ValueError) as e:
-        logger.warning(f"Could not serialize analysis_json for logging: {e}")
-        logger.info(f"Analysis result keys: {list(analysis_json.keys()) if isinstance(analysis_json, dict) else 'Not a dict'}")
-        logger.info(f"Analysis result type: {type(analysis_json)}")
 
-    # 4b. Convert the LLM's text analysis into our rich breakdown object    logger.info("=== STEP 4B: GENERATING SUSTAINABILITY BREAKDOWN ===")
-    sustainability_breakdown = generate_sustainability_breakdown(analysis_json)
-    # Safe logging with error handling for non-serializable objects
-    try:
-        logger.info(f"Sustainability breakdown: {json.dumps(sustainability_breakdown, indent=2)}")
-    except (TypeError, ValueError) as e:
-        logger.warning(f"Could not serialize sustainability_breakdown for logging: {e}")
-        logger.info(f"Sustainability breakdown keys: {list(sustainability_breakdown.keys()) if isinstance(sustainability_breakdown, dict) else 'Not a dict'}")
-        logger.info(f"Sustainability breakdown type: {type(sustainability_breakdown)}")
+def process_shopee_products_batch(items: list, max_concurrency: int | None = None, lane: str = LANE_INTERACTIVE):
+    """
+    Scores many products in one go, e.g. a whole search results page.
 
-    # 4c. Calculate the default score that will be stored permanently in the database
-    logger.info("=== STEP 4C: CALCULATING DEFAULT SCORE ===")
-    default_score_for_db = calculate_weighted_score(sustainability_breakdown)
-    logger.info(f"Default score calculated: {default_score_for_db}")
-    
-    # 4d. Assemble the new, lean document to be inserted into MongoDB
-    logger.info("=== STEP 4D: ASSEMBLING DOCUMENT FOR DATABASE ===")
-    product_document = {
-        "listing_id": parsed_info['listing_id'],
-        "source_site": parsed_info['source_site'],
-        "source_url": url,
-        "product_name": analysis_json.get('product_name', 'N/A'),
-        "brand": analysis_json.get('brand', 'N/A'),
-        "category": analysis_json.get('category', 'Unknown'),
-        "sustainability_breakdown": sustainability_breakdown,
-        "default_sustainability_score": default_score_for_db,    }
-    # Safe logging with error handling for non-serializable objects
-    try:
-        logger.info(f"Document to insert: {json.dumps(product_document, indent=2)}")
-    except (TypeError, ValueError) as e:
-        logger.warning(f"Could not serialize product_document for logging: {e}")
-        logger.info(f"Document keys: {list(product_document.keys()) if isinstance(product_document, dict) else 'Not a dict'}")
-        logger.info(f"Document type: {type(product_document)}")
+    Listing IDs are resolved up front and all stored products are fetched with
+    one query (`find_products_bulk`). Only the misses are sent to the LLM,
+    through a pool of at most `max_concurrency` threads (and never more than
+    BATCH_LLM_CONCURRENCY analyses per process across all batches). Repeated
+    listings in a batch are analyzed once. With ANALYZER_BATCH_SIZE > 1,
+    concurrent misses share multi-product LLM calls (`analysis_batcher`),
+    so the pool runs up to ANALYZER_BATCH_SIZE listings per allowed call.
 
-    # 4e. Save the new document to the database
-    logger.info("=== STEP 4E: SAVING TO DATABASE ===")
-    try:
-        logger.info("Attempting to insert document into MongoDB...")
-        result = products_collection.insert_one(product_document)
-        logger.info(f"SUCCESS: Document inserted with _id: {result.inserted_id}")
-        
-        # Create a new dictionary for the response to the user.
-        # This avoids modifying the original document we want to test.
-        response_document = product_document.copy()
-        
-        # Add the new _id from the database result
-        response_document['_id'] = result.inserted_id
-        
-        # Calculate the personalized score for the user
-        logger.info("Calculating personalized score for response...")
-        personalized_score = calculate_weighted_score(sustainability_breakdown)
-        response_document['sustainability_score'] = personalized_score
-        logger.info(f"Personalized score: {personalized_score}")
-
-        # Get recommendations with error handling
-        try:
-            logger.info("Getting recommendations...")
-            recommendations = get_recommendations(
-                response_document.get('category', 'Unknown'),
-                response_document.get('listing_id', '')
+    Args:
+        items: A list of `(url, raw_text)` tuples.
+        max_concurrency: LLM calls for this batch; defaults to BATCH_LLM_CONCURRENCY.
+        lane: The LLM scheduler lane; LANE_BACKGROUND for backfills, so they
+            yield the quota to users waiting on the extension.
+
+    Yields:
+        `(index, result)` pairs as soon as each result is ready, where
+        `result` is what `process_shopee_product` would return for
+        `items[index]` (None on failure). Stored products come first, then
+        LLM analyses in completion order.
+    """
+    if get_products_collection() is None:
+        logger.error("CRITICAL: Database is not connected. Cannot process batch.")
+        for index in range(len(items)):
+            yield index, None
+        return
+
+    # --- Resolve listing IDs and group duplicate listings ---
+    indices_by_key = {}
+    inputs_by_key = {}
+    for index, (url, raw_text) in enumerate(items):
+        parsed_info = parse_shopee_url(url) if url else None
+        if not parsed_info:
+            yield index, None
+            continue
+        key = (parsed_info['source_site'], parsed_info['listing_id'])
+        if key not in indices_by_key:
+            indices_by_key[key] = []
+            inputs_by_key[key] = (url, raw_text, parsed_info)
+        indices_by_key[key].append(index)
+
+    # --- One round trip for everything that is already stored ---
+    stored = find_products_bulk([parsed_info for _, _, parsed_info in inputs_by_key.values()])
+    misses = [key for key in indices_by_key if key not in stored]
+    log_event(
+        logger, logging.INFO, "batch_lookup",
+        items=len(items), listings=len(indices_by_key), hits=len(stored), misses=len(misses),
+    )
+    for key, product in stored.items():
+        response_document = _prepare_cached_response(product)
+        for index in indices_by_key[key]:
+            yield index, response_document
+
+    if not misses:
+        return
+
+    # --- Misses go to the LLM through a bounded pool ---
+    batched_analyze = None
+    if ANALYZER_BATCH_SIZE > 1:
+        batched_analyze = (background_analysis_batcher if lane == LANE_BACKGROUND else analysis_batcher).submit
+    elif lane != LANE_INTERACTIVE:
+        batched_analyze = functools.partial(get_full_product_analysis, lane=lane)
+
+    def analyze(key):
+        url, raw_text, parsed_info = inputs_by_key[key]
+        with _batch_llm_slots:
+            return _inflight_analyses.do(
+                key, lambda: _analyze_with_lease(url, raw_text, parsed_info, batched_analyze)
             )
-            logger.info(f"Retrieved {len(recommendations)} recommendations")
-            response_document['recommendations'] = recommendations
-        except Exception as rec_error:
-            logger.error(f"Error getting recommendations: {rec_error}")
-            response_document['recommendations'] = []
-        
-        # Clean up the response document by removing fields not needed by frontend
-        del response_document['default_sustainability_score']
-        # Remove _id as it's not JSON serializable and not needed by frontend
-        if '_id' in response_document:
-            del response_document['_id']
-        logger.info("SUCCESS: Process completed ❌(CACHE MISS)")
-        # Safe logging with proper serialization
-        try:
-            # Create a copy for logging without the ObjectId
-            log_document = {k: v for k, v in response_document.items() if k != '_id'}
-            logger.info(f"Returning product: {json.dumps(log_document, indent=2, default=str)}")
-        except (TypeError, ValueError) as e:
-            logger.warning(f"Could not serialize response_document for logging: {e}")
-            logger.info(f"Response document keys: {list(response_document.keys())}")
-        return response_document
-    
-    except Exception as e:
-        # Check if this is a duplicate key error
-        if "E11000 duplicate key error" in str(e):
-            logger.warning(f"DUPLICATE KEY: Product already exists in database. Treating as cache hit.")
-            logger.info("Fetching existing product from database...")
-              # Extract the duplicate key information and fetch the existing document
-            existing_doc = products_collection.find_one({
-                "source_site": parsed_info['source_site'],
-                "listing_id": parsed_info['listing_id']
-            })
-            
-            if existing_doc:
-                # Calculate personalized score using the existing sustainability breakdown
-                logger.info("Calculating personalized score for existing product...")
-                personalized_score = calculate_weighted_score(
-                    existing_doc['sustainability_breakdown']
-                )
-                # Prepare response document
-                existing_doc['sustainability_score'] = personalized_score                # Clean up the document before returning
-                if 'default_sustainability_score' in existing_doc:
-                    del existing_doc['default_sustainability_score']
-                if '_id' in existing_doc:
-                    del existing_doc['_id']
-                
-                # Add recommendations with error handling
-                try:
-                    logger.info("Getting recommendations for duplicate product...")
-                    recommendations = get_recommendations(
-                        existing_doc.get('category', 'Unknown'),
-                        existing_doc.get('listing_id', '')
-                    )
-                    logger.info(f"Retrieved {len(recommendations)} recommendations")
-                    existing_doc['recommendations'] = recommendations
-                except Exception as rec_error:
-                    logger.error(f"Error getting recommendations: {rec_error}")
-                    existing_doc['recommendations'] = []
-                
-                logger.info("SUCCESS: Process completed (DUPLICATE -> CACHE HIT)")
-                logger.info(f"Returning existing product with personalized score: {personalized_score}")
-                return existing_doc
-            else:
-                logger.error("FAILED: Could not fetch existing product after duplicate key error")
-                return None
-        else:
-            # Handle other database errors
-            logger.error(f"FAILED: Could not insert document into MongoDB: {e}")
-            # Safe logging with error handling for non-serializable objects
+
+    pool = ThreadPoolExecutor(
+        max_workers=min(len(misses), (max_concurrency or BATCH_LLM_CONCURRENCY) * max(1, ANALYZER_BATCH_SIZE)),
+        thread_name_prefix='batch-analysis',
+    )
+    try:
+        futures = {pool.submit(analyze, key): key for key in misses}
+        for future in as_completed(futures):
+            key = futures[future]
             try:
-                logger.error(f"Document that failed to insert: {json.dumps(product_document, indent=2)}")
-            except (TypeError, ValueError) as json_error:
-                logger.warning(f"Could not serialize product_document for logging: {json_error}")
-                logger.error(f"Document keys: {list(product_document.keys()) if isinstance(product_document, dict) else 'Not a dict'}")
-                logger.error(f"Document type: {type(product_document)}")
-            return None
\ No newline at end of file
+                response_document = future.result()
+            except Exception as e:
+                logger.error(f"Batch analysis failed for {key}: {e}", exc_info=True)
+                response_document = None
+            for index in indices_by_key[key]:
+                yield index, response_document
+    finally:
+        # If the client went away, don't start the analyses that are still queued
+        pool.shutdown(wait=False, cancel_futures=True)
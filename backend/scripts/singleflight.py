@@ -0,0 +1,252 @@
+# scripts/singleflight.py
+# ==============================================================================
+# Request coalescing for concurrent cache misses.
+#
+# When many shoppers open the same listing at once, every request misses the
+# database cache at the same moment. Without coordination each of them would
+# run its own LLM analysis. This module makes sure only one analysis runs per
+# `(source_site, listing_id)`:
+#
+#   - `SingleFlight` coalesces callers inside one process (threads).
+#   - `MongoLease` coalesces gunicorn workers through a lease document.
+# ==============================================================================
+
+import asyncio
+import copy
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('singleflight')
+
+
+class _Call:
+    """Bookkeeping for one in-flight call that other threads can wait on."""
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time within this process.
+
+    The first caller for a key (the "leader") executes the function. Callers
+    arriving while it runs block until it finishes and receive the same
+    result. Every caller gets its own deep copy, because the processor mutates
+    the returned document before handing it to the API.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not is_leader:
+            logger.info(f"Coalescing request for {key} onto in-flight analysis.")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+            if call.waiters:
+                logger.info(f"In-flight analysis for {key} served {call.waiters} waiting request(s).")
+
+        return copy.deepcopy(call.result)
+
+
+class MongoLease:
+    """
+    A short-lived, exclusive lease stored as a MongoDB document.
+
+    The lease `_id` is the listing key, so the collection's built-in unique
+    `_id` index guarantees that only one worker can hold it. A lease that is
+    past its `expiresAt` (e.g. its worker crashed mid-analysis) can be taken
+    over by the next worker.
+    """
+
+    def __init__(self, collection, ttl_seconds: float = 90):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.owner_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def acquire(self, key: str) -> str | None:
+        """Tries to take the lease. Returns an owner token on success, otherwise None."""
+        token = f"{self.owner_prefix}:{uuid.uuid4().hex}"
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        try:
+            self.collection.insert_one({'_id': key, 'owner': token, 'expiresAt': expires_at})
+            return token
+        except DuplicateKeyError:
+            pass
+
+        # The lease exists; take it over only if its holder let it expire.
+        taken = self.collection.find_one_and_update(
+            {'_id': key, 'expiresAt': {'$lt': now}},
+            {'$set': {'owner': token, 'expiresAt': expires_at}},
+        )
+        if taken:
+            logger.warning(f"Took over expired lease for {key} from {taken.get('owner')}.")
+            return token
+        return None
+
+    def release(self, key: str, token: str) -> None:
+        try:
+            self.collection.delete_one({'_id': key, 'owner': token})
+        except Exception as e:
+            # Not fatal: the lease simply expires after `ttl_seconds`.
+            logger.error(f"Could not release lease for {key}: {e}")
+
+    def is_held(self, key: str) -> bool:
+        return self.collection.count_documents(
+            {'_id': key, 'expiresAt': {'$gt': datetime.now(timezone.utc)}},
+            limit=1,
+        ) > 0
+
+
+def wait_for_result(fetch, lease: MongoLease, key: str, timeout: float, poll_interval: float = 0.5):
+    """
+    Polls `fetch()` while another worker holds the lease for `key`.
+
+    Returns whatever `fetch()` returned once it is truthy, or None if the lease
+    was released (or expired) without a result, or `timeout` elapsed. In the
+    None case the caller should run the analysis itself.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = fetch()
+        if result:
+            return result
+        if not lease.is_held(key):
+            # Holder finished; check once more in case it wrote just before releasing.
+            return fetch()
+        time.sleep(poll_interval)
+    logger.warning(f"Timed out after {timeout}s waiting for lease holder of {key}.")
+    return None
+
+
+# ==============================================================================
+# asyncio counterparts, used by the ASGI server (asgi.py)
+# ==============================================================================
+
+class _LeaderCancelled(Exception):
+    """Set on an `AsyncSingleFlight` call whose leader was cancelled; its waiters retry."""
+
+
+class AsyncSingleFlight:
+    """
+    `SingleFlight` for coroutines running on one event loop.
+
+    If the leader is cancelled (its client disconnected), the waiters belong
+    to other requests and are not cancelled with it: the first of them to
+    resume becomes the new leader and the others wait on it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, coro_fn):
+        while (future := self._calls.get(key)) is not None:
+            logger.info(f"Coalescing request for {key} onto in-flight analysis.")
+            try:
+                return copy.deepcopy(await asyncio.shield(future))
+            except _LeaderCancelled:
+                logger.info(f"Leader for {key} was cancelled; retrying.")
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await coro_fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[key]
+        return copy.deepcopy(result)
+
+
+class AsyncMongoLease(MongoLease):
+    """`MongoLease` over a motor (async) collection."""
+
+    async def acquire(self, key: str) -> str | None:
+        token = f"{self.owner_prefix}:{uuid.uuid4().hex}"
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        try:
+            await self.collection.insert_one({'_id': key, 'owner': token, 'expiresAt': expires_at})
+            return token
+        except DuplicateKeyError:
+            pass
+
+        taken = await self.collection.find_one_and_update(
+            {'_id': key, 'expiresAt': {'$lt': now}},
+            {'$set': {'owner': token, 'expiresAt': expires_at}},
+        )
+        if taken:
+            logger.warning(f"Took over expired lease for {key} from {taken.get('owner')}.")
+            return token
+        return None
+
+    async def release(self, key: str, token: str) -> None:
+        try:
+            await self.collection.delete_one({'_id': key, 'owner': token})
+        except Exception as e:
+            logger.error(f"Could not release lease for {key}: {e}")
+
+    async def is_held(self, key: str) -> bool:
+        return await self.collection.count_documents(
+            {'_id': key, 'expiresAt': {'$gt': datetime.now(timezone.utc)}},
+            limit=1,
+        ) > 0
+
+
+async def wait_for_result_async(fetch, lease: AsyncMongoLease, key: str, timeout: float, poll_interval: float = 0.5):
+    """Async version of `wait_for_result`; `fetch` is a coroutine function."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = await fetch()
+        if result:
+            return result
+        if not await lease.is_held(key):
+            return await fetch()
+        await asyncio.sleep(poll_interval)
+    logger.warning(f"Timed out after {timeout}s waiting for lease holder of {key}.")
+    return None
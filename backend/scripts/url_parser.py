@@ -1,96 +1,101 @@
-# scripts/url_parser.py (Robust, re-based Version)
+# scripts/url_parser.py (Compiled, memoized version)
 
+import functools
 import re
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('url_parser')
 
+try:
+    from config import URL_PARSE_CACHE_SIZE
+except ImportError:
+    URL_PARSE_CACHE_SIZE = 16384
+
+# Shopee storefront domains: shopee.sg, shopee.com.my, shopee.co.id, shopee.co.th,
+# shopee.vn, shopee.ph, shopee.tw, shopee.com.br, shopee.com.mx, shopee.com.co,
+# shopee.cl and shopee.com, with or without subdomains (e.g. "mall.shopee.sg").
+# Case-sensitive: browsers send lowercase hosts, other URLs are retried lowercased.
+SHOPEE_HOST_PATTERN = re.compile(
+    r"\s*https?://((?:[a-z0-9-]+\.)*?shopee\.(?:sg|ph|vn|tw|cl|co\.id|co\.th|com(?:\.(?:my|br|mx|co))?))"
+    r"(?::\d+)?(?=[/?#])"
+)
+# The two listing ID forms, searched for after the host:
+#   ".../<slug>-i.<shopId>.<itemId>..."  and  ".../product/<shopId>/<itemId>..."
+# Each starts with a literal, which the regex engine scans for in C; one
+# pattern with both alternatives is about twice as slow.
+SLUG_ID_PATTERN = re.compile(r"i\.(\d+)\.(\d+)")
+PRODUCT_PATH_ID_PATTERN = re.compile(r"/product/(\d+)/(\d+)")
+
+
+@functools.lru_cache(maxsize=URL_PARSE_CACHE_SIZE)
+def _parse(url: str) -> tuple[str, str] | None:
+    host = SHOPEE_HOST_PATTERN.match(url)
+    if host is None:
+        url = url.lower()
+        host = SHOPEE_HOST_PATTERN.match(url)
+        if host is None:
+            return None
+    ids = SLUG_ID_PATTERN.search(url, host.end()) or PRODUCT_PATH_ID_PATTERN.search(url, host.end())
+    if ids is None:
+        return None
+    return host[1], f"{ids[1]}_{ids[2]}"
+
+
 def parse_shopee_url(url: str) -> dict | None:
     """
-    Parses a Shopee product URL robustly using regular expressions.
+    Parses a Shopee product URL with precompiled regular expressions: one
+    anchored match for the host, one search for the listing ID after it.
 
-    This method is not "hardcoded" to a specific URL structure because it
-    searches for the unique ID pattern (`i.shopId.itemId`) anywhere in the URL string.
+    Both URL forms are recognized, `.../<slug>-i.<shopId>.<itemId>` and
+    `.../product/<shopId>/<itemId>`, on every regional Shopee domain.
+    Results are memoized (URL_PARSE_CACHE_SIZE URLs), so the listings of a
+    batch or backfill that repeat cost a dictionary lookup.
 
     Args:
         url: The full Shopee product URL.
 
     Returns:
-        A dictionary with parsed components:
+        A new dictionary with parsed components:
         {
             "source_site": "shopee.sg",
             "listing_id": "shopId_itemId",
         }
         Returns None if the URL is not a valid or recognizable Shopee product URL.
     """
-    if not url:
-        logger.warning("No URL provided to parse_shopee_url.")
+    if not url or not isinstance(url, str):
+        logger.debug("No URL provided to parse_shopee_url.")
         return None
 
-    try:
-        # --- 1. Extract the hostname (e.g., 'shopee.sg') using string splitting ---
-        # This part is simple enough that a regex is overkill.
-        # It handles 'http://' and 'https://'
-        domain_part = url.split('//')[1]
-        source_site = domain_part.split('/')[0]
-
-        # Ensure it's a valid Shopee domain
-        if 'shopee' not in source_site:
-            logger.warning(f"URL does not contain a valid Shopee domain: {url}")
-            return None
-
-        # --- 2. Define a regular expression to find the Shopee ID pattern ---
-        # Pattern Breakdown:
-        #   i\.          - Matches the literal characters "i."
-        #   (\d+)        - This is a "capturing group" that matches one or more digits (the shopId)
-        #   \.           - Matches the literal "."
-        #   (\d+)        - A second capturing group for one or more digits (the itemId)
-        pattern = r"i\.(\d+)\.(\d+)"
-
-        # --- 3. Search for the pattern in the entire URL string ---
-        match = re.search(pattern, url)
-
-        # --- 4. If a match is found, extract the captured groups ---
-        if match:
-            shop_id = match.group(1)  # The first captured group (shopId)
-            item_id = match.group(2)  # The second captured group (itemId)
-            
-            # Create our clean, composite ID for the database
-            composite_listing_id = f"{shop_id}_{item_id}"
-            
-            logger.info(f"Parsed Shopee URL: source_site={source_site}, listing_id={composite_listing_id}")
-            return {
-                "source_site": source_site,
-                "listing_id": composite_listing_id,
-            }
-        
-        logger.warning(f"No valid Shopee ID pattern found in URL: {url}")
+    parsed = _parse(url)
+    if parsed is None:
+        logger.debug("Not a Shopee product URL: %s", url)
         return None
+    # A fresh dict per call: callers may modify it without touching the cache
+    return {"source_site": parsed[0], "listing_id": parsed[1]}
 
-    except Exception as e:
-        logger.error(f"Error parsing Shopee URL: {e}")
-        return None
 
 # This block allows you to test the file directly by running `python url_parser.py`
 if __name__ == '__main__':
-    print("--- Testing robust url_parser.py (re version) ---")
-    
+    print("--- Testing url_parser.py (compiled version) ---")
+
     test_urls = [
         # Standard URL with query parameters
         "https://shopee.sg/-NEW-PUMA-Unisex-Shuffle-Shoes-(White)-i.341363989.24033132727?sp_atk=123",
         # URL where the ID is NOT at the end (proves robustness)
         "https://shopee.co.id/Some-Product-Name-i.987654321.1234567890/similar?from=ads",
-        # Invalid Shopee URL format
+        # The /product/<shopId>/<itemId> form
         "https://shopee.ph/product/12345/67890",
+        # Not a product URL
+        "https://shopee.com.my/search?keyword=tumbler",
         # Not a Shopee URL
         "https://www.google.com"
     ]
-    
+
     for url in test_urls:
         print(f"\nParsing URL: {url}")
         result = parse_shopee_url(url)
         if result:
             print(f"  ✅ Success: {result}")
         else:
-            print("  ❌ Failed or Invalid Format")
\ No newline at end of file
+            print("  ❌ Failed or Invalid Format")
@@ -12,7 +12,7 @@ def clean_specifications(specs):
         for k, v in specs.items():
             # Remove keys that are obviously reviews/ratings
             if any(word in k.lower() for word in ["review", "rating", "comment", "report abuse", "5.0 out of 5", "star", "media", "helpful?"]):
-                logger.info(f"Removed key from specs: {k}")
+                logger.debug(f"Removed key from specs: {k}")
                 continue
             # Remove values that contain review/rating patterns
             if isinstance(v, str):
@@ -21,7 +21,7 @@ def clean_specifications(specs):
                     for word in ["review", "ratings", "comments", "report abuse", "5.0 out of 5", "star", "media", "helpful?"]:
                         idx = lower_v.find(word)
                         if idx != -1:
-                            logger.info(f"Truncated value for key {k} at word '{word}'")
+                            logger.debug(f"Truncated value for key {k} at word '{word}'")
                             v = v[:idx]
                             break
                 cleaned[k] = v.strip()
@@ -34,7 +34,7 @@ def clean_specifications(specs):
         for word in ["review", "ratings", "comments", "report abuse", "5.0 out of 5", "star", "media", "helpful?"]:
             idx = lower_s.find(word)
             if idx != -1:
-                logger.info(f"Truncated string specs at word '{word}'")
+                logger.debug(f"Truncated string specs at word '{word}'")
                 return specs[:idx].strip()
         return specs
     return specs
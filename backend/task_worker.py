@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Background worker pool for asynchronous analysis tasks.
+
+POST /tasks inserts a task document with `status: new` and returns right
+away. The threads in this pool claim new tasks, run the analysis, and write
+the result back to the task document, where GET /watch/<task_id> picks it up
+through MongoDB Change Streams.
+"""
+
+import os
+import socket
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+
+from scripts.logging_utils import set_request_id
+from watch import update_task_status
+
+logger = logging.getLogger(__name__)
+
+
+class TaskWorkerPool:
+    """
+    A fixed number of daemon threads that drain `status: new` tasks.
+
+    Tasks are claimed atomically with `find_one_and_update`, so several
+    gunicorn workers can run a pool against the same collection without
+    processing a task twice. A task stuck in `processing` for longer than
+    `stale_after_seconds` (its worker died) is claimed again.
+    """
+
+    def __init__(
+        self,
+        tasks_collection: Collection,
+        handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+        num_workers: int = 4,
+        poll_interval_seconds: float = 1.0,
+        stale_after_seconds: float = 300,
+    ):
+        self.collection = tasks_collection
+        self.handler = handler
+        self.num_workers = num_workers
+        self.poll_interval_seconds = poll_interval_seconds
+        self.stale_after_seconds = stale_after_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Starts the worker threads. Safe to call more than once."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.num_workers):
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f"task-worker-{i}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Started {self.num_workers} task worker thread(s) in {self.worker_id}")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def notify(self) -> None:
+        """Wakes an idle worker; called after a task is inserted in this process."""
+        self._wakeup.set()
+
+    def _claim_next_task(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        return self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "new"},
+                    {"status": "processing", "updatedAt": {"$lt": now - self.stale_after_seconds}},
+                ]
+            },
+            {"$set": {"status": "processing", "updatedAt": now, "workerId": self.worker_id}},
+            sort=[("createdAt", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                task = self._claim_next_task()
+            except Exception as e:
+                logger.error(f"Error claiming task: {str(e)}")
+                task = None
+
+            if task is None:
+                # Idle: sleep until notified or until the next poll, which picks
+                # up tasks inserted by other processes.
+                self._wakeup.wait(self.poll_interval_seconds)
+                self._wakeup.clear()
+                continue
+
+            self._process(task)
+
+    def _process(self, task: Dict[str, Any]) -> None:
+        task_id = str(task["_id"])
+        database = self.collection.database
+        # Tag this task's log lines the way /extract_and_rate tags a request
+        set_request_id(f"task-{task_id}")
+        logger.info(f"Processing task {task_id}")
+        try:
+            data = self.handler(task)
+        except Exception as e:
+            logger.error(f"Task {task_id} failed: {str(e)}", exc_info=True)
+            update_task_status(
+                database.client, database.name, self.collection.name,
+                task_id, "error", error=str(e),
+            )
+            return
+
+        update_task_status(
+            database.client, database.name, self.collection.name,
+            task_id, "done", score=data.get("score"), data=data,
+        )
+        logger.info(f"Task {task_id} done with score {data.get('score')}")
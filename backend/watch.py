@@ -4,33 +4,205 @@ MongoDB Change Streams helper for real-time task monitoring.
 Replaces polling with efficient push-based updates.
 """
 
+import os
 import json
+import queue
+import threading
 import time
 import logging
-from typing import Generator, Optional, Dict, Any
+from typing import Generator, Optional, Dict, Any, Set, Tuple
 from bson import ObjectId
 from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure, PyMongoError
 
 logger = logging.getLogger(__name__)
 
 
+# Fields that can be large and that SSE clients never need
+_HIDDEN_TASK_FIELDS = {"rawHtml": 0, "metadata": 0}
+
+
+class TaskChangeHub:
+    """
+    One change stream per process, shared by every SSE client.
+
+    A single background thread keeps a `collection.watch()` cursor open and
+    blocks on the server for up to `max_await_time_ms` per getMore instead of
+    sleeping between polls. Each change is dispatched to the queues of the
+    clients subscribed to that task. If the stream breaks, it is reopened
+    from the last resume token so no update is lost. The thread exits once
+    the last subscriber leaves and is restarted by the next one.
+
+    `subscribe` returns once the stream is open (or after `open_timeout`), so
+    a caller that reads the task's current state afterwards cannot miss a
+    change made in between: the stream started before the read.
+    """
+
+    def __init__(self, collection: Collection, max_await_time_ms: int = 1000, open_timeout: float = 5.0):
+        self.collection = collection
+        self.max_await_time_ms = max_await_time_ms
+        self.open_timeout = open_timeout
+        # Set while a stream is open; changes made after that reach subscribers
+        self._stream_open = threading.Event()
+        self._subscribers: Dict[str, Set[queue.Queue]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._resume_token = None
+
+    def subscribe(self, task_id: str) -> Tuple[queue.Queue, bool]:
+        """
+        Registers a queue for the task's changes and waits for the stream to
+        be open. Returns the queue and whether the stream opened within
+        `open_timeout`; if it did not, changes made before it opens are lost
+        and the caller has to re-read the task itself.
+        """
+        subscriber: queue.Queue = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(subscriber)
+            if self._thread is None:
+                # Start from "now"; anything older is covered by the caller's find_one
+                self._resume_token = None
+                self._stream_open.clear()
+                self._thread = threading.Thread(target=self._run, name="task-change-hub", daemon=True)
+                self._thread.start()
+        return subscriber, self._stream_open.wait(self.open_timeout)
+
+    def unsubscribe(self, task_id: str, subscriber: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[task_id]
+
+    def is_stream_open(self) -> bool:
+        return self._stream_open.is_set()
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _dispatch(self, change: Dict[str, Any]) -> None:
+        document = change.get("fullDocument")
+        if document is None:
+            return
+        task_id = str(change["documentKey"]["_id"])
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(document)
+            except queue.Full:
+                logger.warning(f"Dropping update for slow subscriber of task {task_id}")
+
+    def _should_stop(self) -> bool:
+        with self._lock:
+            if not self._subscribers:
+                self._stream_open.clear()
+                self._thread = None
+                return True
+            return False
+
+    def _run(self) -> None:
+        try:
+            self._watch()
+        except Exception:
+            logger.exception("Shared task change stream thread failed")
+        finally:
+            # However the thread ends, the next subscribe() must start a new one
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._stream_open.clear()
+                    self._thread = None
+
+    def _watch(self) -> None:
+        pipeline = [
+            {'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}},
+            {'$project': {f'fullDocument.{field}': 0 for field in _HIDDEN_TASK_FIELDS}},
+        ]
+        retry_delay = 1.0
+        while True:
+            try:
+                with self.collection.watch(
+                    pipeline,
+                    full_document='updateLookup',
+                    max_await_time_ms=self.max_await_time_ms,
+                    resume_after=self._resume_token,
+                ) as stream:
+                    logger.info("Opened shared task change stream")
+                    self._stream_open.set()
+                    retry_delay = 1.0
+                    while stream.alive:
+                        # Blocks server-side for up to max_await_time_ms
+                        change = stream.try_next()
+                        self._resume_token = stream.resume_token
+                        if change is not None:
+                            self._dispatch(change)
+                        elif self._should_stop():
+                            logger.info("No subscribers left; closing shared task change stream")
+                            return
+            except PyMongoError as e:
+                self._stream_open.clear()
+                logger.error(f"Shared task change stream failed, reopening in {retry_delay:.0f}s: {str(e)}")
+                if isinstance(e, OperationFailure):
+                    # e.g. the resume point fell off the oplog; start from "now"
+                    self._resume_token = None
+                if self._should_stop():
+                    return
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30.0)
+
+
+_hubs: Dict[Tuple[int, int, str, str], TaskChangeHub] = {}
+_hubs_lock = threading.Lock()
+
+
+def get_task_change_hub(mongo_client: MongoClient, db_name: str, collection_name: str) -> TaskChangeHub:
+    """Returns this process's hub for a collection (a forked worker gets its own)."""
+    key = (os.getpid(), id(mongo_client), db_name, collection_name)
+    with _hubs_lock:
+        hub = _hubs.get(key)
+        if hub is None:
+            hub = TaskChangeHub(mongo_client[db_name][collection_name])
+            _hubs[key] = hub
+        return hub
+
+
+def _shared_tasks_collection_args(
+    mongo_client: Optional[MongoClient], db_name: Optional[str], collection_name: Optional[str]
+) -> Tuple[MongoClient, str, str]:
+    """Fills in the process's shared client and the configured tasks collection."""
+    from scripts import db
+    return (
+        mongo_client if mongo_client is not None else db.get_mongo_client(),
+        db_name or db.MONGO_DB,
+        collection_name or db.MONGO_TASKS_COLLECTION,
+    )
+
+
 def stream_task_changes(
-    mongo_client: MongoClient, 
-    db_name: str, 
-    collection_name: str, 
+    mongo_client: Optional[MongoClient], 
+    db_name: Optional[str], 
+    collection_name: Optional[str], 
     task_id: str,
-    timeout_seconds: int = 300
+    timeout_seconds: int = 300,
+    ping_interval_seconds: int = 15
 ) -> Generator[str, None, None]:
     """
     Stream changes for a specific task using MongoDB Change Streams.
+
+    Updates arrive through the process-wide `TaskChangeHub`, so an open SSE
+    client costs a queue, not a cursor. The generator blocks on its queue
+    and only wakes up for an update or a keep-alive ping.
     
     Args:
-        mongo_client: MongoDB client instance
-        db_name: Database name
-        collection_name: Collection name (e.g., 'tasks')
+        mongo_client: MongoDB client instance; None for the shared client (scripts/db.py)
+        db_name: Database name; None for the configured database
+        collection_name: Collection name (e.g., 'tasks'); None for the configured one
         task_id: Task ID to monitor
         timeout_seconds: Maximum time to keep stream open
+        ping_interval_seconds: Interval between keep-alive pings
         
     Yields:
         SSE-formatted strings for client consumption
@@ -40,76 +212,71 @@ def stream_task_changes(
         # Convert string ID to ObjectId
         try:
             object_id = ObjectId(task_id)
-        except Exception as e:
+        except Exception:
             logger.error(f"Invalid task ID: {task_id}")
             yield f"event: error\ndata: {json.dumps({'error': 'Invalid task ID'})}\n\n"
             return
         
-        db = mongo_client[db_name]
-        collection = db[collection_name]
-        
-        # Check if task exists
-        task = collection.find_one({"_id": object_id})
-        if not task:
-            logger.warning(f"Task not found: {task_id}")
-            yield f"event: error\ndata: {json.dumps({'error': 'Task not found'})}\n\n"
-            return
-        
-        # If task is already done, send immediate completion
-        if task.get('status') in ['done', 'error']:
-            logger.info(f"Task {task_id} already completed with status: {task.get('status')}")
-            yield f"event: done\ndata: {json.dumps(task, default=str)}\n\n"
-            return
-        
-        # Send initial state
-        logger.info(f"Sending initial state for task {task_id}")
-        yield f"event: status\ndata: {json.dumps(task, default=str)}\n\n"
-        
-        # Create change stream pipeline to watch this specific task
-        pipeline = [
-            {
-                '$match': {
-                    'fullDocument._id': object_id,
-                    'operationType': {'$in': ['insert', 'update', 'replace']}
-                }
-            }
-        ]
-        
-        start_time = time.time()
-        last_ping = time.time()
-        
-        with collection.watch(pipeline, full_document='updateLookup') as stream:
-            logger.info(f"Started change stream for task {task_id}")
+        mongo_client, db_name, collection_name = _shared_tasks_collection_args(
+            mongo_client, db_name, collection_name
+        )
+        collection = mongo_client[db_name][collection_name]
+        hub = get_task_change_hub(mongo_client, db_name, collection_name)
+
+        # Subscribe (which returns once the change stream is open) before
+        # reading the current state, so no update can slip in between the two
+        subscriber, stream_open = hub.subscribe(str(object_id))
+        if not stream_open:
+            logger.warning(f"Task change stream not open yet; re-reading task {task_id} at every ping")
+        try:
+            # Check if task exists
+            task = collection.find_one({"_id": object_id}, _HIDDEN_TASK_FIELDS)
+            if not task:
+                logger.warning(f"Task not found: {task_id}")
+                yield f"event: error\ndata: {json.dumps({'error': 'Task not found'})}\n\n"
+                return
+            
+            # If task is already done, send immediate completion
+            if task.get('status') in ['done', 'error']:
+                logger.info(f"Task {task_id} already completed with status: {task.get('status')}")
+                yield f"event: done\ndata: {json.dumps(task, default=str)}\n\n"
+                return
             
-            while stream.alive and (time.time() - start_time) < timeout_seconds:
+            # Send initial state
+            logger.info(f"Sending initial state for task {task_id}")
+            yield f"event: status\ndata: {json.dumps(task, default=str)}\n\n"
+            
+            deadline = time.monotonic() + timeout_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
                 try:
-                    # Non-blocking check for changes
-                    change = stream.try_next()
-                    
-                    if change is not None:
-                        document = change['fullDocument']
-                        logger.info(f"Change detected for task {task_id}: {document.get('status')}")
-                        
-                        # Send the updated document
-                        yield f"event: update\ndata: {json.dumps(document, default=str)}\n\n"
-                        
-                        # If task is complete, send done event and exit
-                        if document.get('status') in ['done', 'error']:
-                            yield f"event: done\ndata: {json.dumps(document, default=str)}\n\n"
+                    document = subscriber.get(timeout=min(ping_interval_seconds, remaining))
+                except queue.Empty:
+                    if not stream_open:
+                        # Changes made before the stream opened were never dispatched.
+                        # Once it is open (checked before the read), one last read suffices.
+                        stream_open = hub.is_stream_open()
+                        task = collection.find_one({"_id": object_id}, _HIDDEN_TASK_FIELDS)
+                        if task and task.get('status') in ['done', 'error']:
+                            yield f"event: done\ndata: {json.dumps(task, default=str)}\n\n"
                             break
-                    
-                    # Send keep-alive ping every 15 seconds
-                    if time.time() - last_ping > 15:
-                        yield f"event: ping\ndata: {json.dumps({'timestamp': int(time.time())})}\n\n"
-                        last_ping = time.time()
-                    
-                    # Small sleep to prevent tight loop
-                    time.sleep(0.5)
-                    
-                except Exception as e:
-                    logger.error(f"Error in change stream: {str(e)}")
-                    yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+                    # Send keep-alive ping
+                    yield f"event: ping\ndata: {json.dumps({'timestamp': int(time.time())})}\n\n"
+                    continue
+
+                logger.info(f"Change detected for task {task_id}: {document.get('status')}")
+                
+                # Send the updated document
+                yield f"event: update\ndata: {json.dumps(document, default=str)}\n\n"
+                
+                # If task is complete, send done event and exit
+                if document.get('status') in ['done', 'error']:
+                    yield f"event: done\ndata: {json.dumps(document, default=str)}\n\n"
                     break
+        finally:
+            hub.unsubscribe(str(object_id), subscriber)
         
         logger.info(f"Change stream ended for task {task_id}")
         
@@ -6,6 +6,11 @@
   let hasRequestedData = false;
   // Track extracted product to prevent repeated extraction
   let lastExtractedProduct = null;
+  // Version of the structured request payload sent to the backend
+  const PAYLOAD_VERSION = 1;
+  // The backend keeps ~400 tokens (~1600 characters) of the description for
+  // the LLM once boilerplate is dropped, so longer descriptions are cut here
+  const DESCRIPTION_MAX_CHARS = 4000;
     // Reset flag when page URL changes (for single-page apps)
   let currentUrl = window.location.href;
   setInterval(() => {
@@ -204,41 +209,29 @@
       console.log("EcoShop: Raw extracted product info:", JSON.stringify(productInfo, null, 2));
     }
     
-    // Helper to format product info as plain text for LLM and backend
-    function formatAsPlainText(info) {
-      let lines = [];
-      lines.push(`URL: ${info.url || ''}`);
-      lines.push(`Product Brand: ${info.brand || ''}`);
-      lines.push(`Product Name: ${info.name || ''}`);
-      
-      // Product Specifications - format as new lines for better readability
-      let specLines = [];
+    // Helper to build the structured request payload for the backend
+    // (see backend/scripts/payload.py for the format)
+    function buildRequestPayload(info) {
+      // Product Specifications as [header, text] pairs, Category first
+      let specs = [];
       if (Array.isArray(info.specifications) && info.specifications.length > 0) {
-        // First check if there's a Category spec and put it first
         const categorySpec = info.specifications.find(spec => 
           spec && spec.header && spec.header.toLowerCase() === 'category');
         
         if (categorySpec) {
-          specLines.push(`Category: ${categorySpec.text}`);
+          specs.push(['Category', categorySpec.text]);
         }
         
-        // Then add all other specs
+        // Then add all other specs (headerless ones with an empty header)
         info.specifications.forEach(spec => {
           if (spec && spec.header && spec.header.toLowerCase() !== 'category' && spec.text) {
-            specLines.push(`${spec.header}: ${spec.text}`);
+            specs.push([spec.header, spec.text]);
           } else if (spec && spec.text && !spec.header) {
-            specLines.push(spec.text);
+            specs.push(['', spec.text]);
           }
         });
       }
       
-      // Join specs with newlines for better structure
-      if (specLines.length > 0) {
-        lines.push(`Product Specifications:\n${specLines.join('\n')}`);
-      } else {
-        lines.push('Product Specifications:');
-      }
-      
       // Product Description
       let desc = '';
       if (Array.isArray(info.description) && info.description.length > 0) {
@@ -252,24 +245,27 @@
         desc = info.description;
       }
       
-      // Clean up description
+      // Clean up and cap the description
       if (desc) {
         desc = desc.replace(/\xa0/g, ' ')
                    .replace(/\s+/g, ' ')
                    .replace(/\n\s*\n/g, '\n')
-                   .trim();
+                   .trim()
+                   .slice(0, DESCRIPTION_MAX_CHARS);
       }
       
-      lines.push(`Product Description: ${desc || 'No description available'}`);
-      
-      // Log what we're generating
-      console.log("EcoShop: formatAsPlainText generated:", lines);
-      
-      return lines.join('\n');
+      return {
+        v: PAYLOAD_VERSION,
+        url: info.url || '',
+        brand: info.brand || '',
+        name: info.name || '',
+        specs: specs,
+        desc: desc
+      };
     }
     
-    productInfo.plainText = formatAsPlainText(productInfo);
-    console.log("EcoShop: Generated plainText:", productInfo.plainText);
+    productInfo.payload = buildRequestPayload(productInfo);
+    console.log("EcoShop: Generated request payload:", productInfo.payload);
     
     console.log("EcoShop extracted product info:", productInfo);
     return productInfo;
@@ -14,6 +14,22 @@ document.addEventListener('DOMContentLoaded', function () {
         };
         let totalWeights = fieldWeightMap.production_and_brand + fieldWeightMap.circularity_and_end_of_life + fieldWeightMap.material_composition;
         const allFields = result.sustainabilityDetails.allFields;
+        // Score responses leave the analysis texts out; fetch them now that they are needed
+        const needsAnalysis = allFields.some(field => field.analysis === undefined) && result.sustainabilityDetails.url;
+        if (needsAnalysis) {
+          chrome.runtime.sendMessage({ action: "getAnalysis", url: result.sustainabilityDetails.url }, (response) => {
+            const analysis = (response && response.success && response.analysis) || {};
+            renderFields(allFields.map(field => ({ ...field, analysis: field.analysis ?? analysis[field.key] })));
+          });
+        } else {
+          renderFields(allFields);
+        }
+      });
+    } else {
+      detailsContentElement.innerHTML = '<p>Could not load sustainability details. Please try again.</p>';
+    }
+
+    function renderFields(allFields) {
         let html = '';        allFields.forEach(field => {
           // Display raw score from field.score, not weighted
           let displayScore = field.score;
@@ -22,14 +38,11 @@ document.addEventListener('DOMContentLoaded', function () {
           html += `<div class="details-section">
             <h2>${field.title}</h2>
             <div><strong>Rating:</strong> ${field.value} (${scoreText}/10)</div>
-            <div><strong>Details:</strong> <p>${field.analysis.replace(/\n/g, '<br>')}</p></div>
+            <div><strong>Details:</strong> <p>${(field.analysis || "We could not find data").replace(/\n/g, '<br>')}</p></div>
           </div><hr>`;
         });
         detailsContentElement.innerHTML = html;
         chrome.storage.local.remove(['sustainabilityDetails']);
-      });
-    } else {
-      detailsContentElement.innerHTML = '<p>Could not load sustainability details. Please try again.</p>';
     }
   });
 
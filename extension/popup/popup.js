@@ -223,10 +223,12 @@ document.addEventListener('DOMContentLoaded', function() {
         }
         
         detailsData.push({
+          key: field.key,
           title: field.label,
           value: valueText,
           score: displayFieldScore,
-          analysis: metricData.analysis || "We could not find data"
+          // Score responses leave the analysis out; the details page fetches it
+          analysis: metricData.analysis
         });
         
         const metricElement = document.createElement('div');
@@ -266,7 +268,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const showDetailsButton = document.getElementById('show-details');
     showDetailsButton.disabled = false;
     showDetailsButton.onclick = function() {
-      chrome.storage.local.set({ sustainabilityDetails: { allFields: detailsData } }, function() {
+      chrome.storage.local.set({ sustainabilityDetails: { allFields: detailsData, url: data.url } }, function() {
         window.location.href = 'details.html';
       });
     }    // Show Recommendations button logic
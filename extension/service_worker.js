@@ -166,6 +166,34 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
       }
       sendResponse && sendResponse({ success: true });
       return true;
+    } else if (message.action === "getAnalysis" && message.url) {
+      // The details page asks for the analysis texts, which score responses leave out
+      const listingKey = shopeeListingKey(message.url);
+      if (!listingKey) {
+        sendResponse({ success: false, error: "Not a Shopee product URL" });
+        return false;
+      }
+      fetchStoredAnalysis(listingKey)
+        .then((analysis) => sendResponse(analysis ? { success: true, analysis } : { success: false, error: "No analysis found" }))
+        .catch((error) => {
+          console.error("Fetching the analysis failed:", error);
+          sendResponse({ success: false, error: error.message });
+        });
+      return true;
+    } else if (message.action === "batchRate" && Array.isArray(message.items)) {
+      // Score a whole results page: each result is forwarded to the tab as it arrives
+      const tabId = sender && sender.tab && sender.tab.id;
+      rateProductsBatch(message.items, (result) => {
+        if (tabId) {
+          chrome.tabs.sendMessage(tabId, { action: "batchRateResult", result });
+        }
+      })
+        .then((summary) => sendResponse(summary))
+        .catch((error) => {
+          console.error("Batch rating failed:", error);
+          sendResponse({ success: false, error: error.message });
+        });
+      return true;
     }
   } catch (err) {
     console.error("Service worker error:", err);
@@ -248,6 +276,56 @@ async function createAnalysisTask(productInfo) {
   }
 }
 
+// Score many products with one request. Each item is sent as its structured
+// payload when the content script built one ({url, plainText} otherwise), and
+// the body is gzip-compressed like /extract_and_rate's. The backend streams
+// one NDJSON line per item ({index, url, success, data|error}) as soon as it
+// is ready; if it fails part-way, the last line has index null and says how
+// many were sent.
+async function rateProductsBatch(items, onResult) {
+  const { body, headers } = await encodeJsonBody({
+    items: items.map((item) => item.payload || { url: item.url, plainText: item.plainText || '' })
+  });
+  const response = await fetch(`${API_BASE_URL}/batch_rate`, {
+    method: 'POST',
+    headers,
+    body
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Batch request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let received = 0;
+  let failure = null;
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const result = JSON.parse(line);
+    if (result.index === null) {
+      failure = result;
+      return;
+    }
+    received++;
+    onResult(result);
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer + decoder.decode());
+  if (failure) {
+    return { success: false, error: failure.error, received };
+  }
+  return { success: true, received };
+}
+
 // Monitor task progress using Server-Sent Events
 function monitorTaskWithSSE(taskId, productInfo, sender, sendResponse) {
   console.log(`Starting SSE monitoring for task ${taskId}`);
@@ -261,9 +339,14 @@ function monitorTaskWithSSE(taskId, productInfo, sender, sendResponse) {
   const eventSource = new EventSource(`${API_BASE_URL}/watch/${taskId}`);
   activeConnections.set(taskId, eventSource);
 
-  eventSource.onmessage = function(event) {
+  // The backend sends named events (status, update, done, error, ping) using the
+  // task document's status values: new, processing, done, error.
+  const handleTaskEvent = function(event) {
     try {
       const update = JSON.parse(event.data);
+      if (event.type === 'ping') {
+        return;
+      }
       console.log(`SSE update for task ${taskId}:`, update);
 
       if (update.error) {
@@ -277,14 +360,8 @@ function monitorTaskWithSSE(taskId, productInfo, sender, sendResponse) {
       }
 
       // Handle different update types
-      if (update.status === 'completed' && update.data) {
+      if ((update.status === 'done' || update.status === 'completed') && update.data) {
         console.log(`Task ${taskId} completed successfully`);
-        
-        // Cache the result
-        const cacheKey = productInfo.brand?.toLowerCase();
-        if (cacheKey) {
-          sustainabilityCache[cacheKey] = update.data;
-        }
 
         // Update UI
         if (sender && sender.tab && sender.tab.id) {
@@ -308,7 +385,7 @@ function monitorTaskWithSSE(taskId, productInfo, sender, sendResponse) {
           sendToastToTab(sender.tab.id, `EcoShop: ${update.message || 'Processing...'}`);
         }
         
-      } else if (update.status === 'failed') {
+      } else if (update.status === 'error' || update.status === 'failed') {
         console.error(`Task ${taskId} failed:`, update.error);
         if (sender && sender.tab && sender.tab.id) {
           sendToastToTab(sender.tab.id, `EcoShop: Analysis failed: ${update.error || 'Unknown error'}`);
@@ -322,7 +399,16 @@ function monitorTaskWithSSE(taskId, productInfo, sender, sendResponse) {
     }
   };
 
+  eventSource.onmessage = handleTaskEvent;
+  ['status', 'update', 'done', 'error', 'ping'].forEach(type => {
+    eventSource.addEventListener(type, handleTaskEvent);
+  });
+
   eventSource.onerror = function(error) {
+    if (error && error.data) {
+      // A server-sent `event: error` message, already handled by handleTaskEvent
+      return;
+    }
     console.error(`SSE connection error for task ${taskId}:`, error);
     if (sender && sender.tab && sender.tab.id) {
       sendToastToTab(sender.tab.id, `EcoShop: Connection error during analysis`);
@@ -349,13 +435,14 @@ async function handleSustainabilityCheck(productInfo, sendResponse, sender) {
   console.log("=== Starting handleSustainabilityCheck (API-first) ===");
   console.log("Product info (raw):", productInfo);
   try {
-    // Use plainText if available, else fallback to formatting
-    const plainText = productInfo.plainText || (typeof formatAsPlainText === 'function' ? formatAsPlainText(productInfo) : '');
-    console.log("Using plainText:", plainText);
-    const transformed = { text: plainText };
+    // The structured payload built by content.js; older content scripts send plainText
+    const transformed = productInfo.payload
+      ? { payload: productInfo.payload }
+      : { text: productInfo.plainText || '' };
+    console.log("Using request payload:", transformed);
     
     // Add to history
-    if (transformed.text) {
+    if (transformed.payload || transformed.text) {
       const productWithTimestamp = {
         ...transformed,
         timestamp: new Date().toISOString()
@@ -369,8 +456,21 @@ async function handleSustainabilityCheck(productInfo, sendResponse, sender) {
 
     // 1. Try backend API - ALWAYS call database for most accurate info
     try {
-      console.log("Service worker: Calling backend API for fresh database data...");
-      const apiData = await fetchFromApi(transformed, productInfo.brand);
+      // A listing that is already scored only needs a conditional GET;
+      // the page itself is posted on a miss
+      let apiData = null;
+      const listingKey = shopeeListingKey(productInfo.url);
+      if (listingKey) {
+        try {
+          apiData = await fetchStoredScore(listingKey);
+        } catch (scoreError) {
+          console.warn("Service worker: Stored score lookup failed, posting the page instead:", scoreError);
+        }
+      }
+      if (!apiData) {
+        console.log("Service worker: Calling backend API for fresh database data...");
+        apiData = await fetchFromApi(transformed, productInfo.brand);
+      }
       const processingTime = Date.now() - startTime;
       
       if (apiData && typeof apiData.score === 'number' && !isNaN(apiData.score)) {
@@ -421,10 +521,129 @@ async function handleSustainabilityCheck(productInfo, sendResponse, sender) {
   console.log("=== Completed handleSustainabilityCheck ===");
 }
 
+// Stored scores and their ETags, for revalidation with GET /score. Kept in
+// session storage so they survive the service worker being stopped.
+const SCORE_CACHE_PREFIX = 'score:';
+const scoreCacheFallback = new Map();
+
+async function getCachedScore(key) {
+  if (!chrome.storage.session) return scoreCacheFallback.get(key);
+  return (await chrome.storage.session.get(key))[key];
+}
+
+async function setCachedScore(key, entry) {
+  if (!chrome.storage.session) {
+    scoreCacheFallback.set(key, entry);
+    return;
+  }
+  try {
+    await chrome.storage.session.set({ [key]: entry });
+  } catch (error) {
+    // Session storage is full: revalidation just starts from a plain GET
+    console.warn("Could not cache score:", error);
+  }
+}
+
+// The backend's key for a Shopee product URL (see backend/scripts/url_parser.py)
+function shopeeListingKey(productUrl) {
+  try {
+    const url = new URL(productUrl);
+    const match = url.pathname.match(/i\.(\d+)\.(\d+)/) || url.pathname.match(/\/product\/(\d+)\/(\d+)/);
+    if (!url.hostname.includes('shopee') || !match) return null;
+    return { sourceSite: url.hostname, listingId: `${match[1]}_${match[2]}` };
+  } catch (error) {
+    return null;
+  }
+}
+
+// The stored result for a listing, revalidated with If-None-Match: a 304
+// reuses the cached copy, a 404 (not scored yet) returns null
+async function fetchStoredScore(listingKey) {
+  const path = `/score/${encodeURIComponent(listingKey.sourceSite)}/${encodeURIComponent(listingKey.listingId)}`;
+  const cacheKey = SCORE_CACHE_PREFIX + path;
+  const cached = await getCachedScore(cacheKey);
+  const response = await fetch(API_BASE_URL + path, {
+    method: 'GET',
+    mode: 'cors',
+    cache: 'no-store', // revalidated here, not by the HTTP cache
+    headers: cached ? { 'If-None-Match': cached.etag } : {}
+  });
+  if (response.status === 304 && cached) {
+    console.log("Service worker: Stored score unchanged (304)");
+    return cached.data;
+  }
+  if (!response.ok) {
+    return null;
+  }
+  const responseData = await response.json();
+  if (!responseData || !responseData.success || !responseData.data) {
+    return null;
+  }
+  const etag = response.headers.get('ETag');
+  if (etag) {
+    await setCachedScore(cacheKey, { etag, data: responseData.data });
+  }
+  return responseData.data;
+}
+
+// The analysis texts of a stored listing ({category: analysis}) for the
+// details page, revalidated like fetchStoredScore; null if not stored
+async function fetchStoredAnalysis(listingKey) {
+  const path = `/score/${encodeURIComponent(listingKey.sourceSite)}/${encodeURIComponent(listingKey.listingId)}/analysis`;
+  const cacheKey = SCORE_CACHE_PREFIX + path;
+  const cached = await getCachedScore(cacheKey);
+  const response = await fetch(API_BASE_URL + path, {
+    method: 'GET',
+    mode: 'cors',
+    cache: 'no-store',
+    headers: cached ? { 'If-None-Match': cached.etag } : {}
+  });
+  if (response.status === 304 && cached) {
+    return cached.data.analysis;
+  }
+  if (!response.ok) {
+    return null;
+  }
+  const responseData = await response.json();
+  if (!responseData || !responseData.success || !responseData.data) {
+    return null;
+  }
+  const etag = response.headers.get('ETag');
+  if (etag) {
+    await setCachedScore(cacheKey, { etag, data: responseData.data });
+  }
+  return responseData.data.analysis;
+}
+
+// Structured payloads at least this large are sent gzip-compressed
+const GZIP_MIN_BYTES = 1024;
+
+// Body and headers for /extract_and_rate: the structured payload as JSON,
+// gzip-compressed with CompressionStream when worthwhile, or the plain-text
+// dump of an older content script
+async function buildRequestBody(transformedPayload) {
+  if (!transformedPayload.payload) {
+    return { body: transformedPayload.text, headers: { 'Content-Type': 'text/plain' } };
+  }
+  return encodeJsonBody(transformedPayload.payload);
+}
+
+// `value` as a JSON request body, gzip-compressed when it is large enough to gain
+async function encodeJsonBody(value) {
+  const json = JSON.stringify(value);
+  const headers = { 'Content-Type': 'application/json' };
+  if (typeof CompressionStream === 'undefined' || json.length < GZIP_MIN_BYTES) {
+    return { body: json, headers };
+  }
+  const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+  const body = await new Response(stream).arrayBuffer();
+  return { body, headers: { ...headers, 'Content-Encoding': 'gzip' } };
+}
+
 // Update fetchFromApi to use new structure
-async function fetchFromApi(transformedTextPayload, brandForFallback) {
+async function fetchFromApi(transformedPayload, brandForFallback) {
   try {
-    if (!transformedTextPayload || !transformedTextPayload.text) {
+    if (!transformedPayload || !(transformedPayload.payload || transformedPayload.text)) {
       throw new Error("Missing product information");
     }
 
@@ -457,8 +676,9 @@ async function fetchFromApi(transformedTextPayload, brandForFallback) {
     const postApiUrl = cleanApiBaseUrl + '/extract_and_rate';
     
     console.log("Using API endpoint for POST:", postApiUrl);
-    console.log("Sending product text:", transformedTextPayload.text);
-    console.log("Text length:", transformedTextPayload.text?.length);
+    const { body: requestBody, headers: requestHeaders } = await buildRequestBody(transformedPayload);
+    console.log("Sending product payload:", transformedPayload.payload || transformedPayload.text);
+    console.log("Request body size:", requestBody.byteLength ?? requestBody.length);
       const controller = new AbortController();
     const timeoutId = setTimeout(() => controller.abort(), 30000); // Increased to 30 seconds
     
@@ -469,10 +689,8 @@ async function fetchFromApi(transformedTextPayload, brandForFallback) {
         mode: 'cors',
         cache: 'no-cache',
         signal: controller.signal,
-        headers: {
-          'Content-Type': 'text/plain'
-        },
-        body: transformedTextPayload.text
+        headers: requestHeaders,
+        body: requestBody
       });
       
       console.log("API response status:", response.status);